@@ -0,0 +1,104 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Export and restore the BGPVPN topology
+
+    networking-bgpvpn-topology --config-file /etc/neutron/neutron.conf \\
+        export --file bgpvpns.json
+    networking-bgpvpn-topology --config-file /etc/neutron/neutron.conf \\
+        import --file bgpvpns.json
+
+The dump is newline-delimited JSON, one record per line, see
+BGPVPNPluginDb.export_topology. Both commands use a constant amount of
+memory. The import expects the networks, routers and ports of the
+associations to exist, and the BGPVPNs not to.
+"""
+
+import contextlib
+import sys
+
+from neutron_lib import context
+from oslo_config import cfg
+from oslo_db import options as db_options
+from oslo_log import log as logging
+from oslo_serialization import jsonutils
+
+from neutron.common import config as common_config  # noqa
+
+from networking_bgpvpn._i18n import _
+from networking_bgpvpn.neutron.db import bgpvpn_db
+
+LOG = logging.getLogger(__name__)
+
+
+def export_topology(conf, plugin_db, ctx):
+    with _open(conf.command.file, 'w', sys.stdout) as dump:
+        count = 0
+        for record in plugin_db.export_topology(ctx, conf.command.batch_size):
+            dump.write(jsonutils.dumps(record) + '\n')
+            count += 1
+    LOG.info("Exported %d BGPVPN topology records", count)
+
+
+def import_topology(conf, plugin_db, ctx):
+    with _open(conf.command.file, 'r', sys.stdin) as dump:
+        records = (jsonutils.loads(line) for line in dump if line.strip())
+        counts = plugin_db.import_topology(ctx, records,
+                                           conf.command.batch_size)
+    LOG.info("Imported BGPVPN topology records: %s", counts)
+
+
+@contextlib.contextmanager
+def _open(path, mode, default):
+    if not path or path == '-':
+        yield default
+        return
+    with open(path, mode) as f:
+        yield f
+
+
+def add_command_parsers(subparsers):
+    for name, func, help in (
+            ('export', export_topology,
+             _('Dump the BGPVPN topology as newline-delimited JSON')),
+            ('import', import_topology,
+             _('Restore a BGPVPN topology dump'))):
+        parser = subparsers.add_parser(name, help=help)
+        parser.add_argument('--file', default='-',
+                            help=_('The dump file, "-" (the default) for '
+                                   'the standard output or input'))
+        parser.add_argument('--batch-size', type=int,
+                            default=bgpvpn_db.TOPOLOGY_BATCH_SIZE,
+                            help=_('The number of records read, or written '
+                                   'in a transaction, at once'))
+        parser.set_defaults(func=func)
+
+
+command_opt = cfg.SubCommandOpt('command',
+                                title='Command',
+                                help=_('Available commands'),
+                                handler=add_command_parsers)
+
+
+def setup_conf(conf, args=None):
+    db_group, neutron_db_opts = db_options.list_opts()[0]
+    conf.register_cli_opts(neutron_db_opts, db_group)
+    conf.register_cli_opt(command_opt)
+    conf(args, project='neutron')
+
+
+def main(args=None):
+    conf = cfg.CONF
+    setup_conf(conf, args)
+    logging.setup(conf, 'networking-bgpvpn-topology')
+    conf.command.func(conf, bgpvpn_db.BGPVPNPluginDb(),
+                      context.get_admin_context())
@@ -0,0 +1,120 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import copy
+import threading
+
+from neutron_lib.callbacks import events
+from neutron_lib.callbacks import registry
+from neutron_lib.callbacks import resources
+from oslo_config import cfg
+from oslo_log import log
+
+from networking_bgpvpn.neutron.services.common import utils
+
+LOG = log.getLogger(__name__)
+
+# the associated resources whose deletion removes associations from the
+# cached BGPVPNs
+DELETED_RESOURCE_FIELDS = ((resources.NETWORK, 'networks'),
+                           (resources.ROUTER, 'routers'),
+                           (resources.PORT, 'ports'))
+
+_cache = None
+
+
+class BGPVPNCache(object):
+    """Least recently used cache of BGPVPN representations
+
+    The cache is local to the worker process. An entry is only valid for the
+    revision number of the BGPVPN it was built from: the revision is bumped
+    by any change of the BGPVPN or of its associations, by any worker, so
+    the callers look it up in the database and pass it to 'get'.
+
+    Entries are also dropped as soon as this worker changes a BGPVPN or
+    deletes an associated network, router or port, so that they don't take
+    the place of valid entries.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        # id -> (revision number, BGPVPN dict), least recently used first
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        for resource, _field in DELETED_RESOURCE_FIELDS:
+            registry.subscribe(self._resource_deleted, resource,
+                               events.AFTER_DELETE)
+
+    def get(self, id, revision_number):
+        """Return a copy of the cached BGPVPN, None if not cached"""
+        with self._lock:
+            entry = self._entries.get(id)
+            if entry is None or entry[0] != revision_number:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(id)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+
+    def set(self, id, revision_number, bgpvpn):
+        with self._lock:
+            self._entries[id] = (revision_number, copy.deepcopy(bgpvpn))
+            self._entries.move_to_end(id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *ids):
+        with self._lock:
+            for id in ids:
+                self._entries.pop(id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self):
+        return {'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses}
+
+    def _resource_deleted(self, resource, event, trigger, payload):
+        field = dict(DELETED_RESOURCE_FIELDS)[resource]
+        with self._lock:
+            ids = [id for id, (_revision, bgpvpn) in self._entries.items()
+                   if payload.resource_id in bgpvpn.get(field, ())]
+        if ids:
+            LOG.debug("%(resource)s %(id)s deleted, dropping BGPVPNs %(ids)s "
+                      "from the cache", {'resource': resource,
+                                         'id': payload.resource_id,
+                                         'ids': ids})
+            self.invalidate(*ids)
+
+
+def get_cache():
+    """Return the BGPVPN cache of this worker, None if it is disabled"""
+    global _cache
+    size = cfg.CONF.bgpvpn.bgpvpn_cache_size
+    if not size or not utils.revision_numbers_maintained():
+        return None
+    if _cache is None or _cache.size != size:
+        _cache = BGPVPNCache(size)
+    return _cache
+
+
+def invalidate(*ids):
+    """Drop BGPVPNs from the cache of this worker, if it is enabled"""
+    if _cache is not None:
+        _cache.invalidate(*ids)
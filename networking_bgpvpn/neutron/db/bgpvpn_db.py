@@ -13,14 +13,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
 from oslo_db import exception as db_exc
 from oslo_log import log
 from oslo_utils import uuidutils
 import sqlalchemy as sa
 from sqlalchemy import and_
-from sqlalchemy import or_
+from sqlalchemy.ext import hybrid
 from sqlalchemy import orm
 from sqlalchemy.orm import exc
+from sqlalchemy.sql import operators
 
 from neutron_lib.api.definitions import bgpvpn as bgpvpn_def
 from neutron_lib.api.definitions import bgpvpn_routes_control as bgpvpn_rc_def
@@ -31,10 +34,13 @@ from neutron_lib.db import model_base
 from neutron_lib.db import model_query
 from neutron_lib.db import standard_attr
 from neutron_lib.db import utils as db_utils
-from neutron_lib.plugins import directory
 
+from neutron.db.models import l3
+from neutron.db import models_v2
 from neutron.db import rbac_db_models
 
+from networking_bgpvpn._i18n import _
+from networking_bgpvpn.neutron.db import bgpvpn_cache
 from networking_bgpvpn.neutron.extensions import bgpvpn as bgpvpn_ext
 from networking_bgpvpn.neutron.extensions\
     import bgpvpn_routes_control as bgpvpn_rc_ext
@@ -42,6 +48,13 @@ from networking_bgpvpn.neutron.services.common import utils
 
 LOG = log.getLogger(__name__)
 
+MAX_SYNC_CHUNK_SIZE = 500
+MAX_TARGET_ALLOCATION_ATTEMPTS = 10
+
+
+class _TargetAllocationConflict(Exception):
+    """Some target IDs were reserved concurrently by another server"""
+
 
 class HasProjectNotNullable(model_base.HasProject):
 
@@ -57,6 +70,7 @@ class BGPVPNRBAC(rbac_db_models.RBACColumns, model_base.BASEV2):
                           sa.ForeignKey('bgpvpns.id', ondelete="CASCADE"),
                           nullable=False)
     object_type = 'bgpvpn'
+    revises_on_change = ('bgpvpn', )
 
     @staticmethod
     def get_valid_actions():
@@ -68,14 +82,19 @@ class BGPVPNNetAssociation(standard_attr.HasStandardAttributes,
                            HasProjectNotNullable):
     """Represents the association between a bgpvpn and a network."""
     __tablename__ = 'bgpvpn_network_associations'
+    __table_args__ = (
+        sa.UniqueConstraint('bgpvpn_id', 'network_id'),
+        sa.Index('ix_bgpvpn_network_associations_bgpvpn_id_id',
+                 'bgpvpn_id', 'id'),
+        model_base.BASEV2.__table_args__
+    )
 
     bgpvpn_id = sa.Column(sa.String(36),
                           sa.ForeignKey('bgpvpns.id', ondelete='CASCADE'),
                           nullable=False)
     network_id = sa.Column(sa.String(36),
                            sa.ForeignKey('networks.id', ondelete='CASCADE'),
-                           nullable=False)
-    sa.UniqueConstraint(bgpvpn_id, network_id)
+                           nullable=False, index=True)
     network = orm.relationship("Network",
                                backref=orm.backref('bgpvpn_associations',
                                                    cascade='all'),
@@ -87,20 +106,28 @@ class BGPVPNNetAssociation(standard_attr.HasStandardAttributes,
     collection_resource_map = {bgpvpn_def.NETWORK_ASSOCIATIONS:
                                bgpvpn_def.NETWORK_ASSOCIATION}
 
+    # the associations are part of the BGPVPN representation
+    revises_on_change = ('bgpvpn', )
+
 
 class BGPVPNRouterAssociation(standard_attr.HasStandardAttributes,
                               model_base.BASEV2, model_base.HasId,
                               HasProjectNotNullable):
     """Represents the association between a bgpvpn and a router."""
     __tablename__ = 'bgpvpn_router_associations'
+    __table_args__ = (
+        sa.UniqueConstraint('bgpvpn_id', 'router_id'),
+        sa.Index('ix_bgpvpn_router_associations_bgpvpn_id_id',
+                 'bgpvpn_id', 'id'),
+        model_base.BASEV2.__table_args__
+    )
 
     bgpvpn_id = sa.Column(sa.String(36),
                           sa.ForeignKey('bgpvpns.id', ondelete='CASCADE'),
                           nullable=False)
     router_id = sa.Column(sa.String(36),
                           sa.ForeignKey('routers.id', ondelete='CASCADE'),
-                          nullable=False)
-    sa.UniqueConstraint(bgpvpn_id, router_id)
+                          nullable=False, index=True)
     advertise_extra_routes = sa.Column(sa.Boolean(), nullable=False,
                                        server_default=sa.true())
     router = orm.relationship("Router",
@@ -114,20 +141,27 @@ class BGPVPNRouterAssociation(standard_attr.HasStandardAttributes,
     collection_resource_map = {bgpvpn_def.ROUTER_ASSOCIATIONS:
                                bgpvpn_def.ROUTER_ASSOCIATION}
 
+    revises_on_change = ('bgpvpn', )
+
 
 class BGPVPNPortAssociation(standard_attr.HasStandardAttributes,
                             model_base.BASEV2, model_base.HasId,
                             HasProjectNotNullable):
     """Represents the association between a bgpvpn and a port."""
     __tablename__ = 'bgpvpn_port_associations'
+    __table_args__ = (
+        sa.UniqueConstraint('bgpvpn_id', 'port_id'),
+        sa.Index('ix_bgpvpn_port_associations_bgpvpn_id_id',
+                 'bgpvpn_id', 'id'),
+        model_base.BASEV2.__table_args__
+    )
 
     bgpvpn_id = sa.Column(sa.String(36),
                           sa.ForeignKey('bgpvpns.id', ondelete='CASCADE'),
                           nullable=False)
     port_id = sa.Column(sa.String(36),
                         sa.ForeignKey('ports.id', ondelete='CASCADE'),
-                        nullable=False)
-    sa.UniqueConstraint(bgpvpn_id, port_id)
+                        nullable=False, index=True)
     advertise_fixed_ips = sa.Column(sa.Boolean(), nullable=False,
                                     server_default=sa.true())
     port = orm.relationship("Port",
@@ -141,42 +175,188 @@ class BGPVPNPortAssociation(standard_attr.HasStandardAttributes,
     collection_resource_map = {bgpvpn_rc_def.PORT_ASSOCIATIONS:
                                bgpvpn_rc_def.PORT_ASSOCIATION}
 
+    revises_on_change = ('bgpvpn', )
+
+
+ROUTE_TARGET = 'route_target'
+IMPORT_TARGET = 'import_target'
+EXPORT_TARGET = 'export_target'
+ROUTE_DISTINGUISHER = 'route_distinguisher'
+TARGET_KINDS = (ROUTE_TARGET, IMPORT_TARGET, EXPORT_TARGET,
+                ROUTE_DISTINGUISHER)
+
+# BGPVPN fields built from the targets of each kind
+TARGET_FIELD_KINDS = (('route_targets', ROUTE_TARGET),
+                      ('import_targets', IMPORT_TARGET),
+                      ('export_targets', EXPORT_TARGET),
+                      ('route_distinguishers', ROUTE_DISTINGUISHER))
+
+# BGPVPN fields built from the associations: field, relationship and
+# associated resource id column
+ASSOCIATION_FIELDS = (('networks', 'network_associations', 'network_id'),
+                      ('routers', 'router_associations', 'router_id'),
+                      ('ports', 'port_associations', 'port_id'))
+
+
+class BGPVPNTarget(model_base.BASEV2):
+    """Represents one item of the route targets/distinguishers of a bgpvpn.
+
+    'position' keeps the order in which the items of one list were given.
+    """
+    __tablename__ = 'bgpvpn_targets'
+
+    bgpvpn_id = sa.Column(sa.String(36),
+                          sa.ForeignKey('bgpvpns.id', ondelete='CASCADE'),
+                          primary_key=True)
+    kind = sa.Column(sa.Enum(*TARGET_KINDS, name="bgpvpn_target_kinds"),
+                     primary_key=True)
+    position = sa.Column(sa.Integer, primary_key=True, autoincrement=False)
+    value = sa.Column(sa.String(255), nullable=False, index=True)
+
+    revises_on_change = ('bgpvpn', )
+
+
+class BGPVPNTargetAllocation(model_base.BASEV2):
+    """Represents the reservation state of an auto-allocatable target ID.
+
+    There is one row per ID of the bgpvpn/target_id_range configuration
+    option, plus the allocated IDs which are no longer part of it.
+    """
+    __tablename__ = 'bgpvpn_target_allocations'
+
+    target_id = sa.Column(sa.Integer, nullable=False, primary_key=True,
+                          autoincrement=False)
+    allocated = sa.Column(sa.Boolean, nullable=False, default=False,
+                          server_default=sa.sql.false(), index=True)
+
+
+class _TargetsComparator(hybrid.Comparator):
+    """Turn comparisons on a targets attribute into EXISTS subqueries
+
+    A filter like BGPVPN.import_targets.in_(['64512:100']) matches the
+    BGPVPNs having (at least) one of the given values in their import
+    targets, using the index on bgpvpn_targets.value. The negated
+    comparisons (!= and not_in) match the BGPVPNs having none of them.
+    """
+
+    def __init__(self, expression, name, kind):
+        super(_TargetsComparator, self).__init__(expression)
+        self.name = name
+        self.kind = kind
+
+    def _exists(self, value_filter):
+        return sa.exists().where(and_(
+            BGPVPNTarget.bgpvpn_id == self.expression,
+            BGPVPNTarget.kind == self.kind,
+            value_filter))
+
+    def operate(self, op, *other, **kwargs):
+        if op is operators.in_op:
+            return self._exists(BGPVPNTarget.value.in_(other[0]))
+        if op is operators.eq:
+            return self._exists(BGPVPNTarget.value == other[0])
+        if op is operators.not_in_op:
+            return ~self._exists(BGPVPNTarget.value.in_(other[0]))
+        if op is operators.ne:
+            return ~self._exists(BGPVPNTarget.value == other[0])
+        raise ValueError(_("Operator %(op)s is not supported on BGPVPN "
+                           "attribute %(name)s, only ==, !=, in_ and not_in "
+                           "are") % {'op': getattr(op, '__name__', op),
+                                     'name': self.name})
+
+
+def _targets_property(name, kind):
+    """Attribute exposing the 'kind' targets of a BGPVPN as a string
+
+    The comma-joined string representation is the one historically stored
+    in the bgpvpns table, and still expected by the users of the model
+    (for instance networking-bagpipe objects). Lists are also accepted when
+    setting the attribute.
+    """
+
+    def fget(self):
+        return utils.rtrd_list2str(self.get_targets(kind))
+
+    def fset(self, value):
+        self.set_targets(kind, utils.rtrd_str2list(value))
+
+    def comparator(cls):
+        return _TargetsComparator(cls.id, name, kind)
+
+    fget.__name__ = name
+    return hybrid.hybrid_property(fget, fset, custom_comparator=comparator)
+
 
 class BGPVPN(standard_attr.HasStandardAttributes, model_base.BASEV2,
              model_base.HasId, model_base.HasProject):
     """Represents a BGPVPN Object."""
-    name = sa.Column(sa.String(255))
+    name = sa.Column(sa.String(255), index=True)
     type = sa.Column(sa.Enum("l2", "l3",
                              name="vpn_types"),
                      nullable=False)
-    route_targets = sa.Column(sa.String(255), nullable=False)
-    import_targets = sa.Column(sa.String(255), nullable=True)
-    export_targets = sa.Column(sa.String(255), nullable=True)
-    route_distinguishers = sa.Column(sa.String(255), nullable=True)
     vni = sa.Column(sa.Integer, nullable=True)
     local_pref = sa.Column(sa.BigInteger, nullable=True)
     network_associations = orm.relationship("BGPVPNNetAssociation",
-                                            backref="bgpvpn",
+                                            backref=orm.backref(
+                                                'bgpvpn',
+                                                load_on_pending=True),
                                             lazy='select',
                                             cascade='all, delete-orphan')
     router_associations = orm.relationship("BGPVPNRouterAssociation",
-                                           backref="bgpvpn",
+                                           backref=orm.backref(
+                                               'bgpvpn',
+                                               load_on_pending=True),
                                            lazy='select',
                                            cascade='all, delete-orphan')
     port_associations = orm.relationship("BGPVPNPortAssociation",
-                                         backref="bgpvpn",
+                                         backref=orm.backref(
+                                             'bgpvpn',
+                                             load_on_pending=True),
                                          lazy='select',
                                          cascade='all, delete-orphan')
     rbac_entries = sa.orm.relationship(BGPVPNRBAC,
-                                       backref='bgpvpn',
+                                       backref=orm.backref(
+                                           'bgpvpn',
+                                           load_on_pending=True),
                                        lazy='subquery',
                                        cascade='all, delete, delete-orphan')
+    targets = orm.relationship(BGPVPNTarget,
+                               backref=orm.backref('bgpvpn',
+                                                   load_on_pending=True),
+                               lazy='subquery',
+                               order_by=(BGPVPNTarget.kind,
+                                         BGPVPNTarget.position),
+                               cascade='all, delete-orphan')
+
+    route_targets = _targets_property('route_targets', ROUTE_TARGET)
+    import_targets = _targets_property('import_targets', IMPORT_TARGET)
+    export_targets = _targets_property('export_targets', EXPORT_TARGET)
+    route_distinguishers = _targets_property('route_distinguishers',
+                                             ROUTE_DISTINGUISHER)
+    _extra_keys = ['route_targets', 'import_targets', 'export_targets',
+                   'route_distinguishers']
 
     # standard attributes support:
     api_collections = [bgpvpn_def.COLLECTION_NAME]
     collection_resource_map = {bgpvpn_def.COLLECTION_NAME:
                                bgpvpn_def.RESOURCE_NAME}
 
+    def get_targets(self, kind):
+        return [target.value for target in self.targets
+                if target.kind == kind]
+
+    def set_targets(self, kind, values):
+        current = [target for target in self.targets if target.kind == kind]
+        # update the existing rows in place rather than deleting and
+        # re-creating them, since their primary keys would be the same
+        for target, value in zip(current, values):
+            target.value = value
+        for target in current[len(values):]:
+            self.targets.remove(target)
+        for position in range(len(current), len(values)):
+            self.targets.append(BGPVPNTarget(kind=kind, position=position,
+                                             value=values[position]))
+
 
 class BGPVPNPortAssociationRoute(model_base.BASEV2, model_base.HasId):
     """Represents an item of the 'routes' attribute of a port association."""
@@ -199,11 +379,15 @@ class BGPVPNPortAssociationRoute(model_base.BASEV2, model_base.HasId):
                           sa.ForeignKey('bgpvpns.id', ondelete='CASCADE'),
                           nullable=True)
 
+    revises_on_change = ('port_association', )
+
     port_association = orm.relationship(
         "BGPVPNPortAssociation",
         backref=orm.backref('routes',
-                            cascade='all'),
-        lazy='joined')
+                            cascade='all',
+                            passive_deletes=True),
+        lazy='joined',
+        load_on_pending=True)
     bgpvpn = orm.relationship(
         "BGPVPN",
         backref=orm.backref("port_association_routes",
@@ -213,6 +397,54 @@ class BGPVPNPortAssociationRoute(model_base.BASEV2, model_base.HasId):
         lazy='joined')
 
 
+# the records of a dump of the BGPVPN topology (see export_topology), in the
+# order they are exported and restored: record type, model and columns
+TOPOLOGY_RECORDS = (
+    ('bgpvpn', BGPVPN,
+     ('id', 'project_id', 'name', 'type', 'vni', 'local_pref')),
+    ('target', BGPVPNTarget,
+     ('bgpvpn_id', 'kind', 'position', 'value')),
+    ('rbac', BGPVPNRBAC,
+     ('id', 'project_id', 'object_id', 'target_project', 'action')),
+    ('network_association', BGPVPNNetAssociation,
+     ('id', 'project_id', 'bgpvpn_id', 'network_id')),
+    ('router_association', BGPVPNRouterAssociation,
+     ('id', 'project_id', 'bgpvpn_id', 'router_id',
+      'advertise_extra_routes')),
+    ('port_association', BGPVPNPortAssociation,
+     ('id', 'project_id', 'bgpvpn_id', 'port_id', 'advertise_fixed_ips')),
+    ('port_association_route', BGPVPNPortAssociationRoute,
+     ('id', 'port_association_id', 'type', 'local_pref', 'prefix',
+      'bgpvpn_id')),
+    ('target_allocation', BGPVPNTargetAllocation,
+     ('target_id', )),
+)
+
+TOPOLOGY_BATCH_SIZE = 1000
+
+
+def _is_requested(fields, field):
+    """Whether field is part of a resource dict restricted to fields"""
+    return not fields or field in fields
+
+
+def _supported_extensions(fields):
+    """The supported extensions, if any requested field depends on them"""
+    if (_is_requested(fields, bgpvpn_vni_def.VNI) or
+            _is_requested(fields, bgpvpn_rc_def.LOCAL_PREF_KEY)):
+        return utils.get_supported_extensions()
+    return None
+
+
+def _bgpvpn_lazy_fields(fields):
+    """Relationships of BGPVPN not needed to build the requested fields"""
+    lazy_fields = [BGPVPN.rbac_entries]
+    if not any(_is_requested(fields, field)
+               for field, _kind in TARGET_FIELD_KINDS):
+        lazy_fields.append(BGPVPN.targets)
+    return lazy_fields
+
+
 def _list_bgpvpns_result_filter_hook(query, filters):
     values = filters and filters.get('networks', [])
     if values:
@@ -226,30 +458,29 @@ def _list_bgpvpns_result_filter_hook(query, filters):
 
     values = filters and filters.get('ports', [])
     if values:
-        query = query.join(BGPVPNRouterAssociation)
+        query = query.join(BGPVPNPortAssociation)
         query = query.filter(BGPVPNPortAssociation.port_id.in_(values))
 
     return query
 
 
-@db_api.CONTEXT_WRITER
-def _add_port_assoc_route_db_from_dict(context, route, port_association_id):
+def _port_assoc_route_db_from_dict(route, **kwargs):
     if route['type'] == 'prefix':
-        kwargs = {'prefix': route['prefix']}
+        kwargs['prefix'] = route['prefix']
     elif route['type'] == 'bgpvpn':
-        kwargs = {'bgpvpn_id': route['bgpvpn_id']}
+        kwargs['bgpvpn_id'] = route['bgpvpn_id']
     else:
         # not reached
         pass
 
-    context.session.add(BGPVPNPortAssociationRoute(
-        port_association_id=port_association_id,
+    return BGPVPNPortAssociationRoute(
         type=route['type'],
         local_pref=route.get('local_pref', None),
         **kwargs
-    ))
+    )
 
 
+@db_api.CONTEXT_WRITER
 def port_assoc_route_dict_from_db(route_db):
     route = {
         'type': route_db.type,
@@ -262,6 +493,48 @@ def port_assoc_route_dict_from_db(route_db):
     return route
 
 
+# the changes between two lists of routes of a port association: 'added'
+# and 'removed' are lists of routes, 'updated' is a list of (old, new)
+# routes with the same destination but a different local_pref
+RoutesDelta = collections.namedtuple('RoutesDelta',
+                                     ['added', 'removed', 'updated'])
+
+
+def _route_destination(route):
+    return route['type'], route.get('prefix'), route.get('bgpvpn_id')
+
+
+def port_assoc_routes_delta(old_routes, new_routes):
+    """Compute the changes from a list of routes to another
+
+    Routes are matched by type, prefix or BGPVPN, and local_pref. The ones
+    with the same destination but a different local_pref are updated
+    rather than removed and added again.
+    """
+    old_by_dest = collections.defaultdict(list)
+    for route in old_routes:
+        old_by_dest[_route_destination(route)].append(route)
+    unmatched = []
+    for route in new_routes:
+        same_dest = old_by_dest[_route_destination(route)]
+        for old_route in same_dest:
+            if old_route.get('local_pref') == route.get('local_pref'):
+                same_dest.remove(old_route)
+                break
+        else:
+            unmatched.append(route)
+    delta = RoutesDelta([], [], [])
+    for route in unmatched:
+        same_dest = old_by_dest[_route_destination(route)]
+        if same_dest:
+            delta.updated.append((same_dest.pop(0), route))
+        else:
+            delta.added.append(route)
+    for same_dest in old_by_dest.values():
+        delta.removed.extend(same_dest)
+    return delta
+
+
 class BGPVPNPluginDb():
     """BGPVPN service plugin database class using SQLAlchemy models."""
 
@@ -275,38 +548,45 @@ class BGPVPNPluginDb():
         return super(BGPVPNPluginDb, cls).__new__(cls, *args, **kwargs)
 
     @db_api.CONTEXT_READER
-    def _make_bgpvpn_dict(self, context, bgpvpn_db, fields=None):
-        net_list = [net_assocs.network_id for net_assocs in
-                    bgpvpn_db.network_associations]
-        router_list = [router_assocs.router_id for router_assocs in
-                       bgpvpn_db.router_associations]
-        port_list = [port_assocs.port_id for port_assocs in
-                     bgpvpn_db.port_associations]
+    def _make_bgpvpn_dict(self, context, bgpvpn_db, fields=None,
+                          associations=None, shared=None, extensions=None):
+        # Only the relationships and sub-queries needed for the requested
+        # fields are loaded.
+        # 'associations' and 'shared' can be provided by callers which
+        # have retrieved them for many BGPVPNs at once (see get_bgpvpns),
+        # otherwise they are retrieved for this BGPVPN only. The same goes
+        # for 'extensions', the aliases of the supported extensions.
         res = {
             'id': bgpvpn_db['id'],
             'tenant_id': bgpvpn_db['tenant_id'],
-            'networks': net_list,
-            'routers': router_list,
-            'ports': port_list,
             'name': bgpvpn_db['name'],
             'type': bgpvpn_db['type'],
-            'shared': self._is_shared(context, bgpvpn_db),
-            'route_targets':
-                utils.rtrd_str2list(bgpvpn_db['route_targets']),
-            'route_distinguishers':
-                utils.rtrd_str2list(bgpvpn_db['route_distinguishers']),
-            'import_targets':
-                utils.rtrd_str2list(bgpvpn_db['import_targets']),
-            'export_targets':
-                utils.rtrd_str2list(bgpvpn_db['export_targets'])
         }
-
-        plugin = directory.get_plugin(bgpvpn_def.ALIAS)
-        if utils.is_extension_supported(plugin, bgpvpn_vni_def.ALIAS):
-            res[bgpvpn_vni_def.VNI] = bgpvpn_db.get(bgpvpn_vni_def.VNI)
-        if utils.is_extension_supported(plugin, bgpvpn_rc_def.ALIAS):
-            res[bgpvpn_rc_def.LOCAL_PREF_KEY] = bgpvpn_db.get(
-                bgpvpn_rc_def.LOCAL_PREF_KEY)
+        for field, relationship, column in ASSOCIATION_FIELDS:
+            if not _is_requested(fields, field):
+                continue
+            if associations is not None:
+                res[field] = associations[field]
+            else:
+                res[field] = [assoc[column]
+                              for assoc in bgpvpn_db[relationship]]
+        if _is_requested(fields, 'shared'):
+            if shared is None:
+                shared = self._is_shared(context, bgpvpn_db)
+            res['shared'] = shared
+        for field, kind in TARGET_FIELD_KINDS:
+            if _is_requested(fields, field):
+                res[field] = bgpvpn_db.get_targets(kind)
+
+        if (_is_requested(fields, bgpvpn_vni_def.VNI) or
+                _is_requested(fields, bgpvpn_rc_def.LOCAL_PREF_KEY)):
+            if extensions is None:
+                extensions = utils.get_supported_extensions()
+            if bgpvpn_vni_def.ALIAS in extensions:
+                res[bgpvpn_vni_def.VNI] = bgpvpn_db.get(bgpvpn_vni_def.VNI)
+            if bgpvpn_rc_def.ALIAS in extensions:
+                res[bgpvpn_rc_def.LOCAL_PREF_KEY] = bgpvpn_db.get(
+                    bgpvpn_rc_def.LOCAL_PREF_KEY)
 
         return db_utils.resource_fields(res, fields)
 
@@ -319,78 +599,410 @@ class BGPVPNPluginDb():
                          ['*', context.tenant_id]))).count() != 0)
 
     @db_api.CONTEXT_READER
-    def get_allocated_targets(self, context):
-        query = context.session.query(BGPVPN.route_targets,
-                                      BGPVPN.import_targets,
-                                      BGPVPN.export_targets)
-        query = query.filter(or_(BGPVPN.route_targets.isnot(None),
-                                 BGPVPN.import_targets.isnot(None),
-                                 BGPVPN.export_targets.isnot(None)))
-        # save route/import/export targets without duplicates
-        return {r for row in query.all() for r in row if r}
+    def _get_shared_bgpvpn_ids(self, context, bgpvpn_ids):
+        """Return the subset of bgpvpn_ids shared with the context project"""
+        if not bgpvpn_ids:
+            return set()
+        query = context.session.query(BGPVPNRBAC.object_id).filter(
+            BGPVPNRBAC.object_id.in_(bgpvpn_ids),
+            BGPVPNRBAC.action == rbac_db_models.ACCESS_SHARED,
+            BGPVPNRBAC.target_project.in_(['*', context.tenant_id]))
+        return {row.object_id for row in query.distinct()}
+
+    @db_api.CONTEXT_READER
+    def _get_bgpvpns_associations(self, context, bgpvpn_ids, fields=None):
+        """Return the ids of the resources associated to several BGPVPNs
+
+        One query is done per association type, whatever the number of
+        BGPVPNs, and only for the types among the requested fields:
+
+        {<bgpvpn_id>: {'networks': [...], 'routers': [...], 'ports': [...]}}
+        """
+        keys = [key for key, _relationship, _column in ASSOCIATION_FIELDS
+                if _is_requested(fields, key)]
+        res = {bgpvpn_id: {key: [] for key in keys}
+               for bgpvpn_id in bgpvpn_ids}
+        if not bgpvpn_ids:
+            return res
+        for key, model, column in (
+                ('networks', BGPVPNNetAssociation,
+                 BGPVPNNetAssociation.network_id),
+                ('routers', BGPVPNRouterAssociation,
+                 BGPVPNRouterAssociation.router_id),
+                ('ports', BGPVPNPortAssociation,
+                 BGPVPNPortAssociation.port_id)):
+            if key not in keys:
+                continue
+            query = context.session.query(model.bgpvpn_id, column).filter(
+                model.bgpvpn_id.in_(bgpvpn_ids))
+            for bgpvpn_id, resource_id in query:
+                res[bgpvpn_id][key].append(resource_id)
+        return res
+
+    @db_api.CONTEXT_READER
+    def get_allocated_targets(self, context, targets=None):
+        """Return the route/import/export targets used by the BGPVPNs
+
+        If 'targets' is given, only the ones among these values are returned.
+        """
+        query = context.session.query(BGPVPNTarget.value).filter(
+            BGPVPNTarget.kind.in_([ROUTE_TARGET, IMPORT_TARGET,
+                                   EXPORT_TARGET]))
+        if targets is not None:
+            if not targets:
+                return set()
+            query = query.filter(BGPVPNTarget.value.in_(targets))
+        return {row.value for row in query.distinct()}
+
+    @db_api.retry_if_session_inactive()
+    def sync_target_allocations(self, context, target_ids):
+        """Make the allocation table match the allocatable target IDs
+
+        'target_ids' is a utils.RangeSet. Rows are added for its IDs which
+        are not known yet, and removed for the unallocated IDs no longer in
+        it. The ranges already complete in the table are detected with a
+        count. The other ones are walked in windows of MAX_SYNC_CHUNK_SIZE
+        IDs: the number of rows of each window is retrieved with a single
+        query per range, and only the windows with missing rows are loaded,
+        so that at most one window of IDs is in memory.
+        """
+        ranges = target_ids.ranges()
+        target_id = BGPVPNTargetAllocation.target_id
+        added = 0
+        with db_api.CONTEXT_WRITER.using(context):
+            query = context.session.query(BGPVPNTargetAllocation)
+            removed = query.filter(
+                BGPVPNTargetAllocation.allocated == sa.false(),
+                sa.not_(sa.or_(sa.false(), *[target_id.between(first, last)
+                                             for first, last in ranges]))
+            ).delete(synchronize_session=False)
+        for first, last in ranges:
+            with db_api.CONTEXT_READER.using(context):
+                # a restart with an unchanged range is the common case
+                if context.session.query(target_id).filter(
+                        target_id.between(first, last)).count() == (
+                        last - first + 1):
+                    continue
+                counts = self._count_target_ids_per_window(context, first,
+                                                           last)
+            for window_first in range(first, last + 1, MAX_SYNC_CHUNK_SIZE):
+                window_last = min(window_first + MAX_SYNC_CHUNK_SIZE - 1,
+                                  last)
+                count = counts.get(window_first, 0)
+                if count == window_last - window_first + 1:
+                    continue
+                # each window is committed separately, so that filling a
+                # large range does not make a huge transaction, and an
+                # interrupted synchronization resumes where it stopped
+                try:
+                    with db_api.CONTEXT_WRITER.using(context):
+                        added += self._add_missing_target_ids(
+                            context, window_first, window_last, count)
+                except db_exc.DBDuplicateEntry:
+                    LOG.debug("Target IDs %(first)d-%(last)d synchronized "
+                              "concurrently by another server",
+                              {'first': window_first, 'last': window_last})
+        LOG.info("Synchronized BGPVPN target allocations: %(added)d added, "
+                 "%(removed)d removed",
+                 {'added': added, 'removed': removed})
+
+    @staticmethod
+    def _count_target_ids_per_window(context, first, last):
+        """Return the number of rows of each window from first to last
+
+        The windows of MAX_SYNC_CHUNK_SIZE IDs are identified by their
+        first ID, the ones without rows are omitted.
+        """
+        target_id = BGPVPNTargetAllocation.target_id
+        window_first = target_id - (target_id - first) % MAX_SYNC_CHUNK_SIZE
+        query = context.session.query(
+            window_first, sa.func.count()).filter(
+                target_id.between(first, last)).group_by(window_first)
+        return {int(window): count for window, count in query}
+
+    @staticmethod
+    def _add_missing_target_ids(context, first, last, count):
+        """Add the rows missing for the IDs from first to last
+
+        'count' is the number of rows already there. Returns the number of
+        rows added.
+        """
+        existing = set()
+        if count:
+            target_id = BGPVPNTargetAllocation.target_id
+            existing = {row.target_id for row in context.session.query(
+                target_id).filter(target_id.between(first, last))}
+        rows = [{'target_id': i, 'allocated': False}
+                for i in range(first, last + 1) if i not in existing]
+        context.session.execute(BGPVPNTargetAllocation.__table__.insert(),
+                                rows)
+        return len(rows)
+
+    def allocate_target_id(self, context):
+        """Reserve the lowest free target ID
+
+        Returns None if all the target IDs are allocated.
+        """
+        target_ids = self.allocate_target_ids(context, 1)
+        return target_ids[0] if target_ids else None
+
+    def allocate_target_ids(self, context, count):
+        """Reserve the 'count' lowest free target IDs
+
+        Fewer IDs are returned if not enough of them are free.
+        """
+        target_id = BGPVPNTargetAllocation.target_id
+        for attempt in range(MAX_TARGET_ALLOCATION_ATTEMPTS):
+            try:
+                with db_api.CONTEXT_WRITER.using(context):
+                    query = context.session.query(BGPVPNTargetAllocation)
+                    target_ids = [row.target_id for row in
+                                  context.session.query(target_id).filter_by(
+                                      allocated=False).order_by(
+                                      target_id).limit(count)]
+                    if not target_ids:
+                        return []
+                    # compare-and-swap: another server may have reserved
+                    # some of the same IDs in the meantime, in which case
+                    # the transaction is rolled back and they are all tried
+                    # again
+                    updated = query.filter(
+                        target_id.in_(target_ids),
+                        BGPVPNTargetAllocation.allocated == sa.false()
+                    ).update({'allocated': True}, synchronize_session=False)
+                    if updated != len(target_ids):
+                        raise _TargetAllocationConflict()
+                    return target_ids
+            except _TargetAllocationConflict:
+                LOG.debug("Target IDs %(target_ids)s were allocated "
+                          "concurrently, attempt %(attempt)d",
+                          {'target_ids': target_ids, 'attempt': attempt + 1})
+        raise db_exc.RetryRequest(
+            bgpvpn_ext.BGPVPNTargetAllocationConflict(
+                target_id=target_ids[0]))
+
+    @db_api.retry_if_session_inactive()
+    def release_target_ids(self, context, target_ids):
+        if not target_ids:
+            return
+        with db_api.CONTEXT_WRITER.using(context):
+            context.session.query(BGPVPNTargetAllocation).filter(
+                BGPVPNTargetAllocation.target_id.in_(target_ids)).update(
+                    {'allocated': False}, synchronize_session=False)
+
+    @staticmethod
+    def _bgpvpn_db_from_dict(bgpvpn):
+        return BGPVPN(
+            id=uuidutils.generate_uuid(),
+            tenant_id=bgpvpn['tenant_id'],
+            name=bgpvpn['name'],
+            type=bgpvpn['type'],
+            route_targets=bgpvpn['route_targets'],
+            import_targets=bgpvpn['import_targets'],
+            export_targets=bgpvpn['export_targets'],
+            route_distinguishers=bgpvpn.get('route_distinguishers'),
+            vni=bgpvpn.get(bgpvpn_vni_def.VNI),
+            local_pref=bgpvpn.get(bgpvpn_rc_def.LOCAL_PREF_KEY),
+        )
 
     @db_api.CONTEXT_WRITER
     def create_bgpvpn(self, context, bgpvpn):
-        rt = utils.rtrd_list2str(bgpvpn['route_targets'])
-        i_rt = utils.rtrd_list2str(bgpvpn['import_targets'])
-        e_rt = utils.rtrd_list2str(bgpvpn['export_targets'])
-        rd = utils.rtrd_list2str(bgpvpn.get('route_distinguishers', ''))
-
         with db_api.CONTEXT_WRITER.using(context):
-            bgpvpn_db = BGPVPN(
-                id=uuidutils.generate_uuid(),
-                tenant_id=bgpvpn['tenant_id'],
-                name=bgpvpn['name'],
-                type=bgpvpn['type'],
-                route_targets=rt,
-                import_targets=i_rt,
-                export_targets=e_rt,
-                route_distinguishers=rd,
-                vni=bgpvpn.get(bgpvpn_vni_def.VNI),
-                local_pref=bgpvpn.get(bgpvpn_rc_def.LOCAL_PREF_KEY),
-            )
+            bgpvpn_db = self._bgpvpn_db_from_dict(bgpvpn)
             context.session.add(bgpvpn_db)
 
         return self._make_bgpvpn_dict(context, bgpvpn_db)
 
+    def create_bgpvpns(self, context, bgpvpns):
+        """Create several BGPVPNs in a single transaction"""
+        with db_api.CONTEXT_WRITER.using(context):
+            bgpvpns_db = [self._bgpvpn_db_from_dict(bgpvpn)
+                          for bgpvpn in bgpvpns]
+            context.session.add_all(bgpvpns_db)
+            context.session.flush()
+            # new BGPVPNs are neither associated nor shared yet
+            extensions = utils.get_supported_extensions()
+            return [self._make_bgpvpn_dict(
+                    context, bgpvpn_db,
+                    associations={field: [] for field, _relationship,
+                                  _column in ASSOCIATION_FIELDS},
+                    shared=False, extensions=extensions)
+                    for bgpvpn_db in bgpvpns_db]
+
     @db_api.CONTEXT_READER
-    def get_bgpvpns(self, context, filters=None, fields=None):
+    def get_bgpvpns(self, context, filters=None, fields=None, sorts=None,
+                    limit=None, marker=None, page_reverse=False):
+        marker_obj = db_utils.get_marker_obj(self, context, 'bgpvpn', limit,
+                                             marker)
         objs = model_query.get_collection(
             context, BGPVPN, None,
-            filters=filters, fields=fields)
+            filters=filters, fields=fields, sorts=sorts, limit=limit,
+            marker_obj=marker_obj, page_reverse=page_reverse,
+            lazy_fields=_bgpvpn_lazy_fields(fields))
+        # retrieve associations and RBAC shared state for all the BGPVPNs
+        # at once, rather than doing per-BGPVPN queries
+        bgpvpn_ids = [obj['id'] for obj in objs]
+        associations = self._get_bgpvpns_associations(
+            context, bgpvpn_ids, fields)
+        shared_ids = set()
+        if _is_requested(fields, 'shared'):
+            shared_ids = self._get_shared_bgpvpn_ids(context, bgpvpn_ids)
+        extensions = _supported_extensions(fields)
         return [self._make_bgpvpn_dict(
-                context, obj, fields=fields) for obj in objs]
+                context, obj, fields=fields,
+                associations=associations[obj['id']],
+                shared=obj['id'] in shared_ids,
+                extensions=extensions) for obj in objs]
+
+    @db_api.CONTEXT_READER
+    def get_bgpvpns_count(self, context, filters=None):
+        # the filters on associated resources join the association tables,
+        # a BGPVPN associated to several of the resources is counted once
+        return model_query.get_collection_query(
+            context, BGPVPN, filters=filters, field='id').distinct().count()
+
+    @staticmethod
+    def _get_assocs_count(context, model, bgpvpn_id, filters=None):
+        filters = dict(filters or {}, bgpvpn_id=[bgpvpn_id])
+        return model_query.get_collection_count(context, model,
+                                                filters=filters)
 
     @db_api.CONTEXT_READER
-    def _get_bgpvpn(self, context, id):
+    def _get_bgpvpn(self, context, id, lazy_fields=None):
         try:
-            return model_query.get_by_id(context, BGPVPN, id)
+            return model_query.get_by_id(context, BGPVPN, id,
+                                         lazy_fields=lazy_fields)
         except exc.NoResultFound:
             raise bgpvpn_ext.BGPVPNNotFound(id=id)
 
+    @db_api.CONTEXT_READER
+    def get_bgpvpn_revision_number(self, context, id):
+        """Return the revision number of a BGPVPN, with a single query
+
+        The revision number is bumped by any change of the BGPVPN, of its
+        route targets, RBAC entries and associations, and of the routes of
+        its port associations.
+        """
+        query = model_query.query_with_hooks(context, BGPVPN).join(
+            BGPVPN.standard_attr).filter(BGPVPN.id == id)
+        revision_number = query.with_entities(
+            standard_attr.StandardAttribute.revision_number).scalar()
+        if revision_number is None:
+            raise bgpvpn_ext.BGPVPNNotFound(id=id)
+        return revision_number
+
+    @db_api.CONTEXT_READER
+    def get_bgpvpns_version(self, context):
+        """Return a value changed by any change of the visible BGPVPNs
+
+        The highest revision number is not enough: a new BGPVPN starts at
+        revision 0 and a deleted one can't be seen. The number of BGPVPNs,
+        their highest standard attribute id, which grows with each new
+        BGPVPN, and the sum of their revision numbers are returned instead.
+        """
+        # the visibility filters of the BGPVPN queries can group the rows
+        # by BGPVPN, the aggregates are computed on the result
+        visible = model_query.query_with_hooks(context, BGPVPN).with_entities(
+            BGPVPN.standard_attr_id).subquery()
+        std_attr = standard_attr.StandardAttribute
+        return tuple(context.session.query(
+            sa.func.count(),
+            sa.func.max(std_attr.id),
+            sa.func.sum(std_attr.revision_number)).filter(
+            std_attr.id.in_(sa.select(visible.c.standard_attr_id))).one())
+
     @db_api.CONTEXT_READER
     def get_bgpvpn(self, context, id, fields=None):
-        bgpvpn_db = self._get_bgpvpn(context, id)
-        return self._make_bgpvpn_dict(context, bgpvpn_db, fields)
+        cache = bgpvpn_cache.get_cache()
+        if cache is None:
+            bgpvpn_db = self._get_bgpvpn(
+                context, id, lazy_fields=_bgpvpn_lazy_fields(fields))
+            return self._make_bgpvpn_dict(context, bgpvpn_db, fields)
+
+        # the revision query also checks that the BGPVPN is visible in this
+        # context; 'shared' depends on the context and isn't cached
+        bgpvpn = cache.get(id, self.get_bgpvpn_revision_number(context, id))
+        if bgpvpn is None:
+            bgpvpn_db = self._get_bgpvpn(context, id)
+            bgpvpn = self._make_bgpvpn_dict(context, bgpvpn_db, shared=False)
+            del bgpvpn['shared']
+            cache.set(id, bgpvpn_db.revision_number, bgpvpn)
+        if _is_requested(fields, 'shared'):
+            bgpvpn['shared'] = bool(self._get_shared_bgpvpn_ids(context,
+                                                                [id]))
+        return db_utils.resource_fields(bgpvpn, fields)
+
+    @db_api.CONTEXT_READER
+    def get_bgpvpns_for_networks(self, context, network_ids):
+        """Return the BGPVPNs reachable from each of several networks
+
+        A BGPVPN is reachable from a network if it is associated to the
+        network, or to a router with an interface on the network. Only what
+        is needed to plug the network into the BGPVPNs is returned, with a
+        single query whatever the number of networks and BGPVPNs:
+
+        {<network_id>: [{'id': ..., 'type': ..., 'route_targets': [...],
+                         'import_targets': [...], 'export_targets': [...],
+                         'via_router': <True if not associated to the
+                                        network itself>}, ...]}
+        """
+        res = {network_id: [] for network_id in network_ids}
+        if not network_ids:
+            return res
+        direct = sa.select(
+            BGPVPNNetAssociation.network_id.label('network_id'),
+            BGPVPNNetAssociation.bgpvpn_id.label('bgpvpn_id'),
+            sa.literal(False).label('via_router')).where(
+            BGPVPNNetAssociation.network_id.in_(network_ids))
+        via_router = sa.select(
+            models_v2.Port.network_id,
+            BGPVPNRouterAssociation.bgpvpn_id,
+            sa.literal(True)).select_from(BGPVPNRouterAssociation).join(
+            l3.RouterPort,
+            l3.RouterPort.router_id == BGPVPNRouterAssociation.router_id).join(
+            models_v2.Port, models_v2.Port.id == l3.RouterPort.port_id).where(
+            models_v2.Port.network_id.in_(network_ids))
+        reachable = sa.union_all(direct, via_router).subquery()
+        target_kinds = (ROUTE_TARGET, IMPORT_TARGET, EXPORT_TARGET)
+        query = context.session.query(
+            reachable.c.network_id, reachable.c.via_router,
+            BGPVPN.id, BGPVPN.type,
+            BGPVPNTarget.kind, BGPVPNTarget.position,
+            BGPVPNTarget.value).join(
+            BGPVPN, BGPVPN.id == reachable.c.bgpvpn_id).outerjoin(
+            BGPVPNTarget, and_(BGPVPNTarget.bgpvpn_id == BGPVPN.id,
+                               BGPVPNTarget.kind.in_(target_kinds)))
+
+        # a BGPVPN can be reachable in several ways, and there is a row per
+        # target of the BGPVPN for each of them
+        bgpvpns = {}
+        for (network_id, via_router, bgpvpn_id, type_,
+             kind, position, value) in query:
+            bgpvpn = bgpvpns.get((network_id, bgpvpn_id))
+            if bgpvpn is None:
+                bgpvpn = bgpvpns[network_id, bgpvpn_id] = {
+                    'id': bgpvpn_id,
+                    'type': type_,
+                    'via_router': bool(via_router),
+                    'targets': {kind: {} for kind in target_kinds}}
+                res[network_id].append(bgpvpn)
+            bgpvpn['via_router'] = bgpvpn['via_router'] and bool(via_router)
+            if kind is not None:
+                bgpvpn['targets'][kind][position] = value
+        for bgpvpn in bgpvpns.values():
+            targets = bgpvpn.pop('targets')
+            for field, kind in TARGET_FIELD_KINDS:
+                if kind in targets:
+                    bgpvpn[field] = [value for _position, value
+                                     in sorted(targets[kind].items())]
+        return res
 
     @db_api.CONTEXT_WRITER
     def update_bgpvpn(self, context, id, bgpvpn):
         bgpvpn_db = self._get_bgpvpn(context, id)
         if bgpvpn:
-            # Format Route Target lists to string
-            if 'route_targets' in bgpvpn:
-                rt = utils.rtrd_list2str(bgpvpn['route_targets'])
-                bgpvpn['route_targets'] = rt
-            if 'import_targets' in bgpvpn:
-                i_rt = utils.rtrd_list2str(bgpvpn['import_targets'])
-                bgpvpn['import_targets'] = i_rt
-            if 'export_targets' in bgpvpn:
-                e_rt = utils.rtrd_list2str(bgpvpn['export_targets'])
-                bgpvpn['export_targets'] = e_rt
-            if 'route_distinguishers' in bgpvpn:
-                rd = utils.rtrd_list2str(bgpvpn['route_distinguishers'])
-                bgpvpn['route_distinguishers'] = rd
             bgpvpn_db.update(bgpvpn)
+            bgpvpn_cache.invalidate(id)
         return self._make_bgpvpn_dict(context, bgpvpn_db)
 
     @db_api.CONTEXT_WRITER
@@ -398,6 +1010,7 @@ class BGPVPNPluginDb():
         bgpvpn_db = self._get_bgpvpn(context, id)
         bgpvpn = self._make_bgpvpn_dict(context, bgpvpn_db)
         context.session.delete(bgpvpn_db)
+        bgpvpn_cache.invalidate(id)
         return bgpvpn
 
     @db_api.CONTEXT_READER
@@ -427,6 +1040,7 @@ class BGPVPNPluginDb():
                     bgpvpn_id=bgpvpn_id,
                     network_id=net_assoc['network_id'])
                 context.session.add(net_assoc_db)
+            bgpvpn_cache.invalidate(bgpvpn_id)
             return self._make_net_assoc_dict(net_assoc_db)
         except db_exc.DBDuplicateEntry:
             LOG.warning("network %(net_id)s is already associated to "
@@ -436,20 +1050,89 @@ class BGPVPNPluginDb():
             raise bgpvpn_ext.BGPVPNNetAssocAlreadyExists(
                 bgpvpn_id=bgpvpn_id, net_id=net_assoc['network_id'])
 
+    def _get_already_associated(self, context, column, bgpvpn_id,
+                                resource_ids):
+        """Return a resource of resource_ids which can't be associated
+
+        Resources already associated to the BGPVPN, or present more than
+        once in resource_ids, can't be associated. 'column' is the column
+        holding the associated resource id in the association table.
+        """
+        seen = set()
+        for resource_id in resource_ids:
+            if resource_id in seen:
+                return resource_id
+            seen.add(resource_id)
+        model = column.class_
+        existing = context.session.query(column).filter(
+            model.bgpvpn_id == bgpvpn_id,
+            column.in_(resource_ids)).first()
+        return existing[0] if existing else None
+
+    @staticmethod
+    def _add_assocs(context, relationship, assoc_dbs):
+        """Add and flush new associations of a BGPVPN
+
+        When an association becomes persistent, neutron loads the resource
+        it references, to expire its 'bgpvpn_associations' backref: these
+        resources are loaded beforehand, in one query, rather than one by
+        one. 'relationship' is the association attribute referencing them.
+        """
+        model = relationship.property.mapper.class_
+        column = next(iter(relationship.property.local_columns))
+        resources = context.session.query(model).filter(model.id.in_(
+            [getattr(assoc_db, column.key) for assoc_db in assoc_dbs])).all()
+        context.session.add_all(assoc_dbs)
+        context.session.flush()
+        bgpvpn_cache.invalidate(*{assoc_db.bgpvpn_id
+                                  for assoc_db in assoc_dbs})
+        # the resources only had to stay in the session until the flush
+        del resources
+
+    def create_net_assocs(self, context, bgpvpn_id, net_assocs):
+        """Create several network associations in a single transaction"""
+        with db_api.CONTEXT_WRITER.using(context):
+            net_id = self._get_already_associated(
+                context, BGPVPNNetAssociation.network_id, bgpvpn_id,
+                [net_assoc['network_id'] for net_assoc in net_assocs])
+            if net_id:
+                raise bgpvpn_ext.BGPVPNNetAssocAlreadyExists(
+                    bgpvpn_id=bgpvpn_id, net_id=net_id)
+            net_assoc_dbs = [
+                BGPVPNNetAssociation(tenant_id=net_assoc['tenant_id'],
+                                     bgpvpn_id=bgpvpn_id,
+                                     network_id=net_assoc['network_id'])
+                for net_assoc in net_assocs]
+            self._add_assocs(context, BGPVPNNetAssociation.network,
+                             net_assoc_dbs)
+            return [self._make_net_assoc_dict(net_assoc_db)
+                    for net_assoc_db in net_assoc_dbs]
+
     @db_api.CONTEXT_READER
     def get_net_assoc(self, context, assoc_id, bgpvpn_id, fields=None):
         net_assoc_db = self._get_net_assoc(context, assoc_id, bgpvpn_id)
         return self._make_net_assoc_dict(net_assoc_db, fields)
 
     @db_api.CONTEXT_READER
-    def get_net_assocs(self, context, bgpvpn_id, filters=None, fields=None):
+    def get_net_assocs(self, context, bgpvpn_id, filters=None, fields=None,
+                       sorts=None, limit=None, marker=None,
+                       page_reverse=False):
         if not filters:
             filters = {}
         filters['bgpvpn_id'] = [bgpvpn_id]
+        marker_obj = None
+        if limit and marker:
+            marker_obj = self._get_net_assoc(context, marker, bgpvpn_id)
         return model_query.get_collection(
             context, BGPVPNNetAssociation,
             self._make_net_assoc_dict,
-            filters, fields)
+            filters, fields, sorts=sorts, limit=limit,
+            marker_obj=marker_obj, page_reverse=page_reverse)
+
+    @db_api.CONTEXT_READER
+    def get_net_assocs_count(self, context, bgpvpn_id, filters=None):
+        return self._get_assocs_count(context, BGPVPNNetAssociation,
+                                      bgpvpn_id, filters)
 
     @db_api.CONTEXT_WRITER
     def delete_net_assoc(self, context, assoc_id, bgpvpn_id):
@@ -459,6 +1142,7 @@ class BGPVPNPluginDb():
         net_assoc_db = self._get_net_assoc(context, assoc_id, bgpvpn_id)
         net_assoc = self._make_net_assoc_dict(net_assoc_db)
         context.session.delete(net_assoc_db)
+        bgpvpn_cache.invalidate(bgpvpn_id)
         return net_assoc
 
     def _make_router_assoc_dict(self, router_assoc_db, fields=None):
@@ -493,6 +1177,7 @@ class BGPVPNPluginDb():
                 router_id=router_id)
             context.session.add(router_assoc_db)
             context.session.flush()
+            bgpvpn_cache.invalidate(bgpvpn_id)
             return self._make_router_assoc_dict(router_assoc_db)
         except db_exc.DBDuplicateEntry:
             LOG.warning("router %(router_id)s is already associated to "
@@ -502,20 +1187,54 @@ class BGPVPNPluginDb():
             raise bgpvpn_ext.BGPVPNRouterAssocAlreadyExists(
                 bgpvpn_id=bgpvpn_id, router_id=router_association['router_id'])
 
+    def create_router_assocs(self, context, bgpvpn_id, router_assocs):
+        """Create several router associations in a single transaction"""
+        with db_api.CONTEXT_WRITER.using(context):
+            router_id = self._get_already_associated(
+                context, BGPVPNRouterAssociation.router_id, bgpvpn_id,
+                [router_assoc['router_id'] for router_assoc in router_assocs])
+            if router_id:
+                raise bgpvpn_ext.BGPVPNRouterAssocAlreadyExists(
+                    bgpvpn_id=bgpvpn_id, router_id=router_id)
+            # advertise_extra_routes is set to its server default here,
+            # otherwise building the dicts below would reload the new
+            # associations, and their router, one by one
+            router_assoc_dbs = [
+                BGPVPNRouterAssociation(tenant_id=router_assoc['tenant_id'],
+                                        bgpvpn_id=bgpvpn_id,
+                                        router_id=router_assoc['router_id'],
+                                        advertise_extra_routes=True)
+                for router_assoc in router_assocs]
+            self._add_assocs(context, BGPVPNRouterAssociation.router,
+                             router_assoc_dbs)
+            return [self._make_router_assoc_dict(router_assoc_db)
+                    for router_assoc_db in router_assoc_dbs]
+
     @db_api.CONTEXT_READER
     def get_router_assoc(self, context, assoc_id, bgpvpn_id, fields=None):
         router_assoc_db = self._get_router_assoc(context, assoc_id, bgpvpn_id)
         return self._make_router_assoc_dict(router_assoc_db, fields)
 
     @db_api.CONTEXT_READER
-    def get_router_assocs(self, context, bgpvpn_id, filters=None, fields=None):
+    def get_router_assocs(self, context, bgpvpn_id, filters=None, fields=None,
+                          sorts=None, limit=None, marker=None,
+                          page_reverse=False):
         if not filters:
             filters = {}
         filters['bgpvpn_id'] = [bgpvpn_id]
+        marker_obj = None
+        if limit and marker:
+            marker_obj = self._get_router_assoc(context, marker, bgpvpn_id)
         return model_query.get_collection(
             context, BGPVPNRouterAssociation,
             self._make_router_assoc_dict,
-            filters, fields)
+            filters, fields, sorts=sorts, limit=limit,
+            marker_obj=marker_obj, page_reverse=page_reverse)
+
+    @db_api.CONTEXT_READER
+    def get_router_assocs_count(self, context, bgpvpn_id, filters=None):
+        return self._get_assocs_count(context, BGPVPNRouterAssociation,
+                                      bgpvpn_id, filters)
 
     @db_api.CONTEXT_WRITER
     def update_router_assoc(self, context, assoc_id, bgpvpn_id, router_assoc):
@@ -533,20 +1252,45 @@ class BGPVPNPluginDb():
                                                  bgpvpn_id)
         router_assoc = self._make_router_assoc_dict(router_assoc_db)
         context.session.delete(router_assoc_db)
+        bgpvpn_cache.invalidate(bgpvpn_id)
         return router_assoc
 
     @db_api.CONTEXT_READER
-    def _make_port_assoc_dict(self, port_assoc_db, fields=None):
-        routes = [port_assoc_route_dict_from_db(r)
-                  for r in port_assoc_db['routes']]
+    def _make_port_assoc_dict(self, port_assoc_db, fields=None,
+                              routes=None):
+        # 'routes' can be provided by callers which have retrieved them for
+        # many port associations at once (see get_port_assocs)
         res = {'id': port_assoc_db['id'],
                'tenant_id': port_assoc_db['tenant_id'],
                'bgpvpn_id': port_assoc_db['bgpvpn_id'],
                'port_id': port_assoc_db['port_id'],
-               'advertise_fixed_ips': port_assoc_db['advertise_fixed_ips'],
-               'routes': routes}
+               'advertise_fixed_ips': port_assoc_db['advertise_fixed_ips']}
+        if _is_requested(fields, 'routes'):
+            if routes is None:
+                routes = [port_assoc_route_dict_from_db(r)
+                          for r in port_assoc_db['routes']]
+            res['routes'] = routes
         return db_utils.resource_fields(res, fields)
 
+    @db_api.CONTEXT_READER
+    def _get_port_assocs_routes(self, context, port_assoc_ids):
+        """Return the routes of several port associations in one query
+
+        {<port_association_id>: [<route>, ...]}
+        """
+        res = {port_assoc_id: [] for port_assoc_id in port_assoc_ids}
+        if not port_assoc_ids:
+            return res
+        query = context.session.query(BGPVPNPortAssociationRoute).options(
+            orm.lazyload(BGPVPNPortAssociationRoute.port_association),
+            orm.lazyload(BGPVPNPortAssociationRoute.bgpvpn)).filter(
+            BGPVPNPortAssociationRoute.port_association_id.in_(
+                port_assoc_ids))
+        for route_db in query:
+            res[route_db.port_association_id].append(
+                port_assoc_route_dict_from_db(route_db))
+        return res
+
     @db_api.CONTEXT_READER
     def _get_port_assoc(self, context, assoc_id, bgpvpn_id):
         try:
@@ -564,12 +1308,20 @@ class BGPVPNPluginDb():
         advertise_fixed_ips = port_association['advertise_fixed_ips']
         try:
             with db_api.CONTEXT_WRITER.using(context):
+                # the routes are created in the same transaction, the dict
+                # is built before the association is detached from it
                 port_assoc_db = BGPVPNPortAssociation(
                     tenant_id=port_association['tenant_id'],
                     bgpvpn_id=bgpvpn_id,
                     port_id=port_id,
-                    advertise_fixed_ips=advertise_fixed_ips)
+                    advertise_fixed_ips=advertise_fixed_ips,
+                    routes=[_port_assoc_route_db_from_dict(route)
+                            for route in port_association['routes']])
                 context.session.add(port_assoc_db)
+                context.session.flush()
+                port_assoc = self._make_port_assoc_dict(port_assoc_db)
+            bgpvpn_cache.invalidate(bgpvpn_id)
+            return port_assoc
         except db_exc.DBDuplicateEntry:
             LOG.warning(("port %(port_id)s is already associated to "
                          "BGPVPN %(bgpvpn_id)s"),
@@ -578,10 +1330,28 @@ class BGPVPNPluginDb():
             raise bgpvpn_rc_ext.BGPVPNPortAssocAlreadyExists(
                 bgpvpn_id=bgpvpn_id, port_id=port_association['port_id'])
 
-        for route in port_association['routes']:
-            _add_port_assoc_route_db_from_dict(
-                context, route, port_assoc_db.id)
-        return self._make_port_assoc_dict(port_assoc_db)
+    def create_port_assocs(self, context, bgpvpn_id, port_assocs):
+        """Create several port associations in a single transaction"""
+        with db_api.CONTEXT_WRITER.using(context):
+            port_id = self._get_already_associated(
+                context, BGPVPNPortAssociation.port_id, bgpvpn_id,
+                [port_assoc['port_id'] for port_assoc in port_assocs])
+            if port_id:
+                raise bgpvpn_rc_ext.BGPVPNPortAssocAlreadyExists(
+                    bgpvpn_id=bgpvpn_id, port_id=port_id)
+            port_assoc_dbs = [
+                BGPVPNPortAssociation(
+                    tenant_id=port_assoc['tenant_id'],
+                    bgpvpn_id=bgpvpn_id,
+                    port_id=port_assoc['port_id'],
+                    advertise_fixed_ips=port_assoc['advertise_fixed_ips'],
+                    routes=[_port_assoc_route_db_from_dict(route)
+                            for route in port_assoc['routes']])
+                for port_assoc in port_assocs]
+            self._add_assocs(context, BGPVPNPortAssociation.port,
+                             port_assoc_dbs)
+            return [self._make_port_assoc_dict(port_assoc_db)
+                    for port_assoc_db in port_assoc_dbs]
 
     @db_api.CONTEXT_READER
     def get_port_assoc(self, context, assoc_id, bgpvpn_id, fields=None):
@@ -589,25 +1359,73 @@ class BGPVPNPluginDb():
         return self._make_port_assoc_dict(port_assoc_db, fields)
 
     @db_api.CONTEXT_READER
-    def get_port_assocs(self, context, bgpvpn_id, filters=None, fields=None):
+    def get_port_assocs(self, context, bgpvpn_id, filters=None, fields=None,
+                        sorts=None, limit=None, marker=None,
+                        page_reverse=False):
         if not filters:
             filters = {}
         filters['bgpvpn_id'] = [bgpvpn_id]
-        return model_query.get_collection(
+        marker_obj = None
+        if limit and marker:
+            marker_obj = self._get_port_assoc(context, marker, bgpvpn_id)
+        # the associated ports are not needed, and the routes of all the
+        # associations are retrieved at once rather than one by one
+        port_assocs_db = model_query.get_collection_query(
             context, BGPVPNPortAssociation,
-            self._make_port_assoc_dict,
-            filters, fields)
+            filters=filters, sorts=sorts, limit=limit,
+            marker_obj=marker_obj, page_reverse=page_reverse,
+            lazy_fields=[BGPVPNPortAssociation.port]).all()
+        routes = {}
+        if _is_requested(fields, 'routes'):
+            routes = self._get_port_assocs_routes(
+                context, [port_assoc_db.id for port_assoc_db
+                          in port_assocs_db])
+        port_assocs = [
+            self._make_port_assoc_dict(port_assoc_db, fields,
+                                       routes=routes.get(port_assoc_db.id))
+            for port_assoc_db in port_assocs_db]
+        if limit and page_reverse:
+            port_assocs.reverse()
+        return port_assocs
+
+    @db_api.CONTEXT_READER
+    def get_port_assocs_count(self, context, bgpvpn_id, filters=None):
+        return self._get_assocs_count(context, BGPVPNPortAssociation,
+                                      bgpvpn_id, filters)
 
     def update_port_assoc(self, context, assoc_id, bgpvpn_id, port_assoc):
         with db_api.CONTEXT_WRITER.using(context):
             port_assoc_db = self._get_port_assoc(context, assoc_id, bgpvpn_id)
-            for route_db in port_assoc_db.routes:
-                context.session.delete(route_db)
-            for route in port_assoc.pop('routes', []):
-                _add_port_assoc_route_db_from_dict(context, route, assoc_id)
+            if 'routes' in port_assoc:
+                self._update_port_assoc_routes(context, port_assoc_db,
+                                               port_assoc.pop('routes'))
             port_assoc_db.update(port_assoc)
-        context.session.refresh(port_assoc_db)
-        return self._make_port_assoc_dict(port_assoc_db)
+            return self._make_port_assoc_dict(port_assoc_db)
+
+    @staticmethod
+    def _update_port_assoc_routes(context, port_assoc_db, routes):
+        """Only write the routes which changed"""
+        old_routes = []
+        routes_db = collections.defaultdict(list)
+        for route_db in port_assoc_db.routes:
+            route = port_assoc_route_dict_from_db(route_db)
+            old_routes.append(route)
+            routes_db[_route_destination(route),
+                      route['local_pref']].append(route_db)
+
+        def _pop_route_db(route):
+            return routes_db[_route_destination(route),
+                             route['local_pref']].pop()
+
+        delta = port_assoc_routes_delta(old_routes, routes)
+        for route in delta.removed:
+            route_db = _pop_route_db(route)
+            port_assoc_db.routes.remove(route_db)
+            context.session.delete(route_db)
+        for old_route, route in delta.updated:
+            _pop_route_db(old_route).local_pref = route.get('local_pref')
+        for route in delta.added:
+            port_assoc_db.routes.append(_port_assoc_route_db_from_dict(route))
 
     @db_api.CONTEXT_WRITER
     def delete_port_assoc(self, context, assoc_id, bgpvpn_id):
@@ -618,4 +1436,90 @@ class BGPVPNPluginDb():
                                              bgpvpn_id)
         port_assoc = self._make_port_assoc_dict(port_assoc_db)
         context.session.delete(port_assoc_db)
+        bgpvpn_cache.invalidate(bgpvpn_id)
         return port_assoc
+
+    def export_topology(self, context, batch_size=TOPOLOGY_BATCH_SIZE):
+        """Iterate over the records of a dump of all the BGPVPNs
+
+        The records are dicts with a 'record' key giving their type, see
+        TOPOLOGY_RECORDS. They are read with one query per type, whose
+        results are streamed by batches of batch_size rows, so that the
+        memory used does not depend on the number of BGPVPNs.
+        """
+        with db_api.CONTEXT_READER.using(context):
+            for record, model, columns in TOPOLOGY_RECORDS:
+                keys = list(columns)
+                entities = [getattr(model, column) for column in columns]
+                query = context.session.query(*entities)
+                if issubclass(model, standard_attr.HasStandardAttributes):
+                    keys.append('description')
+                    query = query.add_columns(
+                        standard_attr.StandardAttribute.description).join(
+                            model.standard_attr)
+                if model is BGPVPNTargetAllocation:
+                    query = query.filter(model.allocated == sa.true())
+                query = query.order_by(
+                    *model.__table__.primary_key.columns).yield_per(
+                        batch_size)
+                for row in query:
+                    item = {'record': record}
+                    item.update(zip(keys, row))
+                    yield item
+
+    def import_topology(self, context, records,
+                        batch_size=TOPOLOGY_BATCH_SIZE):
+        """Restore the records of a dump made by export_topology
+
+        The records are inserted by batches of up to batch_size records of
+        the same type, each one in its own transaction. They must come in
+        the order of TOPOLOGY_RECORDS, as export_topology produces them.
+
+        Returns the number of records restored, per type.
+        """
+        models = {record: model for record, model, _ in TOPOLOGY_RECORDS}
+        counts = collections.Counter()
+        batch = []
+
+        def _flush():
+            if batch:
+                self._import_topology_batch(context, models[batch_type],
+                                            batch)
+                counts[batch_type] += len(batch)
+                batch.clear()
+
+        batch_type = None
+        for record in records:
+            record = dict(record)
+            record_type = record.pop('record', None)
+            if record_type not in models:
+                raise ValueError(_("Unknown BGPVPN topology record type "
+                                   "%s") % record_type)
+            if record_type != batch_type or len(batch) >= batch_size:
+                _flush()
+                batch_type = record_type
+            batch.append(record)
+        _flush()
+        return dict(counts)
+
+    @staticmethod
+    def _import_topology_batch(context, model, batch):
+        LOG.debug("restoring %(count)d %(table)s rows",
+                  {'count': len(batch), 'table': model.__tablename__})
+        with db_api.CONTEXT_WRITER.using(context):
+            if model is BGPVPNTargetAllocation:
+                # the allocations of the configured range may already exist
+                target_ids = [record['target_id'] for record in batch]
+                query = context.session.query(model.target_id).filter(
+                    model.target_id.in_(target_ids))
+                existing = {target_id for target_id, in query}
+                context.session.query(model).filter(
+                    model.target_id.in_(existing)).update(
+                        {'allocated': True}, synchronize_session=False)
+                batch = [dict(record, allocated=True) for record in batch
+                         if record['target_id'] not in existing]
+            if issubclass(model, standard_attr.HasStandardAttributes):
+                # the standard attributes are created along with the objects
+                context.session.add_all(model(**record) for record in batch)
+            elif batch:
+                context.session.execute(model.__table__.insert(), batch)
@@ -0,0 +1,76 @@
+# Copyright 2026 SAP SE
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""move route targets and distinguishers to bgpvpn_targets
+
+Revision ID: e81f0d3c9a26
+Revises: 1aa861614c9e
+Create Date: 2026-10-18 10:14:02.519730
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e81f0d3c9a26'
+down_revision = '1aa861614c9e'
+depends_on = ('c4e2a1f5b7d3',)
+
+# bgpvpns column => bgpvpn_targets kind
+COLUMNS = {
+    'route_targets': 'route_target',
+    'import_targets': 'import_target',
+    'export_targets': 'export_target',
+    'route_distinguishers': 'route_distinguisher',
+}
+
+bgpvpns = sa.Table(
+    'bgpvpns', sa.MetaData(),
+    sa.Column('id', sa.String(length=36), nullable=False),
+    *[sa.Column(column, sa.String(length=255)) for column in COLUMNS])
+
+bgpvpn_targets = sa.Table(
+    'bgpvpn_targets', sa.MetaData(),
+    sa.Column('bgpvpn_id', sa.String(length=36), nullable=False),
+    sa.Column('kind', sa.String(length=32), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('value', sa.String(length=255), nullable=False))
+
+
+def upgrade():
+    migrate_targets()
+    for column in COLUMNS:
+        op.drop_column('bgpvpns', column)
+
+
+def migrate_targets():
+    session = sa.orm.Session(bind=op.get_bind())
+    with session.begin(subtransactions=True):
+        values = []
+        for row in session.query(bgpvpns):
+            for column, kind in COLUMNS.items():
+                targets = getattr(row, column)
+                if not targets:
+                    continue
+                for position, value in enumerate(targets.split(',')):
+                    values.append({'bgpvpn_id': row.id,
+                                   'kind': kind,
+                                   'position': position,
+                                   'value': value})
+        if values:
+            # pylint: disable=no-value-for-parameter
+            session.execute(bgpvpn_targets.insert(), values)
+    # this commit is necessary to allow further operations
+    session.commit()
@@ -0,0 +1,41 @@
+# Copyright 2026 SAP SE
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""add bgpvpn_target_allocations table
+
+Revision ID: 5f8e9b2c1d47
+Revises: c4e2a1f5b7d3
+Create Date: 2026-10-18 13:40:18.772051
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5f8e9b2c1d47'
+down_revision = 'c4e2a1f5b7d3'
+
+
+def upgrade():
+    op.create_table(
+        'bgpvpn_target_allocations',
+        sa.Column('target_id', sa.Integer(), autoincrement=False,
+                  nullable=False),
+        sa.Column('allocated', sa.Boolean(), nullable=False,
+                  server_default=sa.sql.false()),
+        sa.PrimaryKeyConstraint('target_id')
+    )
+    op.create_index(op.f('ix_bgpvpn_target_allocations_allocated'),
+                    'bgpvpn_target_allocations', ['allocated'], unique=False)
@@ -0,0 +1,37 @@
+# Copyright 2026 SAP SE
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""add indexes used to sort and paginate listings
+
+Revision ID: a3d7e6b94c10
+Revises: 5f8e9b2c1d47
+Create Date: 2026-10-18 15:02:44.190386
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'a3d7e6b94c10'
+down_revision = '5f8e9b2c1d47'
+
+
+def upgrade():
+    op.create_index(op.f('ix_bgpvpns_name'), 'bgpvpns', ['name'],
+                    unique=False)
+    for table in ('bgpvpn_network_associations',
+                  'bgpvpn_router_associations',
+                  'bgpvpn_port_associations'):
+        op.create_index('ix_%s_bgpvpn_id_id' % table, table,
+                        ['bgpvpn_id', 'id'], unique=False)
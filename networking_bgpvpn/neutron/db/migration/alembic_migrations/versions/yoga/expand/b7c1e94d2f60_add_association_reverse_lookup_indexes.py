@@ -0,0 +1,37 @@
+# Copyright 2026 SAP SE
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""add indexes to look up the associations of a resource
+
+Revision ID: b7c1e94d2f60
+Revises: a3d7e6b94c10
+Create Date: 2026-10-18 17:21:09.532870
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'b7c1e94d2f60'
+down_revision = 'a3d7e6b94c10'
+
+
+def upgrade():
+    # the (bgpvpn_id, <resource>_id) unique constraints can't be used to
+    # find the associations of a given network, router or port
+    for table, column in (('bgpvpn_network_associations', 'network_id'),
+                          ('bgpvpn_router_associations', 'router_id'),
+                          ('bgpvpn_port_associations', 'port_id')):
+        op.create_index(op.f('ix_%s_%s' % (table, column)), table, [column],
+                        unique=False)
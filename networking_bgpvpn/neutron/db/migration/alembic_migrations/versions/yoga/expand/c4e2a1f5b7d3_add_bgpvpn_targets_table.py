@@ -0,0 +1,47 @@
+# Copyright 2026 SAP SE
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""add bgpvpn_targets table
+
+Revision ID: c4e2a1f5b7d3
+Revises: 7a9482036ecd
+Create Date: 2026-10-18 10:12:31.204417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c4e2a1f5b7d3'
+down_revision = '7a9482036ecd'
+
+
+def upgrade():
+    op.create_table(
+        'bgpvpn_targets',
+        sa.Column('bgpvpn_id', sa.String(length=36), nullable=False),
+        sa.Column('kind', sa.Enum('route_target', 'import_target',
+                                  'export_target', 'route_distinguisher',
+                                  name='bgpvpn_target_kinds'),
+                  nullable=False),
+        sa.Column('position', sa.Integer(), autoincrement=False,
+                  nullable=False),
+        sa.Column('value', sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(['bgpvpn_id'], ['bgpvpns.id'],
+                                ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('bgpvpn_id', 'kind', 'position')
+    )
+    op.create_index(op.f('ix_bgpvpn_targets_value'),
+                    'bgpvpn_targets', ['value'], unique=False)
@@ -36,6 +36,24 @@ LOG = log.getLogger(__name__)
 
 extensions.append_api_extensions_path(bgpvpn_extensions.__path__)
 
+# Attributes backed by a database column, which the plugin can sort and
+# paginate on natively
+SORT_KEYS = {
+    bgpvpn_api_def.COLLECTION_NAME: ('id', 'tenant_id', 'project_id', 'name',
+                                     'type'),
+    bgpvpn_api_def.NETWORK_ASSOCIATIONS: ('id', 'tenant_id', 'project_id',
+                                          'network_id'),
+    bgpvpn_api_def.ROUTER_ASSOCIATIONS: ('id', 'tenant_id', 'project_id',
+                                         'router_id'),
+}
+
+
+def set_sort_keys(attr_map, sort_keys):
+    """Flag the given attributes of a resource as valid sort keys"""
+    for key in sort_keys:
+        if key in attr_map:
+            attr_map[key]['is_sort_key'] = True
+
 
 class BGPVPNNotFound(n_exc.NotFound):
     message = _("BGPVPN %(id)s could not be found")
@@ -91,6 +109,10 @@ class BGPVPNNetworkAssocExistsAnotherBgpvpn(n_exc.BadRequest):
                 " associated to multiple bgpvpns")
 
 
+class BGPVPNTargetAllocationConflict(n_exc.Conflict):
+    message = _("BGPVPN target ID %(target_id)s was concurrently allocated")
+
+
 class BGPVPNDriverError(n_exc.NeutronException):
     message = _("%(method)s failed.")
 
@@ -101,6 +123,10 @@ class Bgpvpn(api_extensions.APIExtensionDescriptor):
 
     @classmethod
     def get_resources(cls):
+        set_sort_keys(
+            bgpvpn_api_def.RESOURCE_ATTRIBUTE_MAP[
+                bgpvpn_api_def.COLLECTION_NAME],
+            SORT_KEYS[bgpvpn_api_def.COLLECTION_NAME])
         plural_mappings = resource_helper.build_plural_mappings(
             {}, bgpvpn_api_def.RESOURCE_ATTRIBUTE_MAP)
         resources = resource_helper.build_resource_info(
@@ -108,7 +134,8 @@ class Bgpvpn(api_extensions.APIExtensionDescriptor):
             bgpvpn_api_def.RESOURCE_ATTRIBUTE_MAP,
             bgpvpn_api_def.ALIAS,
             register_quota=True,
-            translate_name=True)
+            translate_name=True,
+            allow_bulk=True)
         plugin = directory.get_plugin(bgpvpn_api_def.ALIAS)
         for collection_name in bgpvpn_api_def.SUB_RESOURCE_ATTRIBUTE_MAP:
             # Special handling needed for sub-resources with 'y' ending
@@ -118,6 +145,7 @@ class Bgpvpn(api_extensions.APIExtensionDescriptor):
                 collection_name].get('parent')
             params = bgpvpn_api_def.SUB_RESOURCE_ATTRIBUTE_MAP[
                 collection_name].get('parameters')
+            set_sort_keys(params, SORT_KEYS[collection_name])
 
             controller = base.create_resource(collection_name, resource_name,
                                               plugin, params,
@@ -158,7 +186,8 @@ class BGPVPNPluginBase(libbase.ServicePluginBase, metaclass=abc.ABCMeta):
         pass
 
     @abc.abstractmethod
-    def get_bgpvpns(self, context, filters=None, fields=None):
+    def get_bgpvpns(self, context, filters=None, fields=None, sorts=None,
+                    limit=None, marker=None, page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -185,7 +214,9 @@ class BGPVPNPluginBase(libbase.ServicePluginBase, metaclass=abc.ABCMeta):
 
     @abc.abstractmethod
     def get_bgpvpn_network_associations(self, context, bgpvpn_id,
-                                        filters=None, fields=None):
+                                        filters=None, fields=None, sorts=None,
+                                        limit=None, marker=None,
+                                        page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -209,7 +240,8 @@ class BGPVPNPluginBase(libbase.ServicePluginBase, metaclass=abc.ABCMeta):
 
     @abc.abstractmethod
     def get_bgpvpn_router_associations(self, context, bgpvpn_id, filters=None,
-                                       fields=None):
+                                       fields=None, sorts=None, limit=None,
+                                       marker=None, page_reverse=False):
         pass
 
     @abc.abstractmethod
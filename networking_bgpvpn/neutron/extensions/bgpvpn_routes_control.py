@@ -28,6 +28,7 @@ from neutron_lib.services import base as libbase
 from oslo_log import log
 
 from networking_bgpvpn._i18n import _
+from networking_bgpvpn.neutron.extensions import bgpvpn as bgpvpn_ext
 
 
 LOG = log.getLogger(__name__)
@@ -76,6 +77,8 @@ class Bgpvpn_routes_control(api_extensions.APIExtensionDescriptor):
             collection_name].get('parent')
         params = api_def.SUB_RESOURCE_ATTRIBUTE_MAP[
             collection_name].get('parameters')
+        bgpvpn_ext.set_sort_keys(params, ('id', 'tenant_id', 'project_id',
+                                          'port_id'))
 
         controller = base.create_resource(collection_name, resource_name,
                                           plugin, params,
@@ -117,7 +120,9 @@ class BGPVPNRoutesControlPluginBase(libbase.ServicePluginBase,
 
     @abc.abstractmethod
     def get_bgpvpn_port_associations(self, context, bgpvpn_id,
-                                     filters=None, fields=None):
+                                     filters=None, fields=None, sorts=None,
+                                     limit=None, marker=None,
+                                     page_reverse=False):
         pass
 
     @abc.abstractmethod
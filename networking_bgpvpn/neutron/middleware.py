@@ -0,0 +1,98 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import re
+
+from neutron_lib import context as n_context
+from oslo_log import log as logging
+from oslo_middleware import base
+import webob
+import webob.dec
+
+from networking_bgpvpn.neutron.db import bgpvpn_db
+from networking_bgpvpn.neutron.extensions import bgpvpn as bgpvpn_ext
+from networking_bgpvpn.neutron.services.common import utils
+
+LOG = logging.getLogger(__name__)
+
+# the BGPVPN list, a BGPVPN, and the associations of a BGPVPN
+BGPVPN_PATH = re.compile(
+    r'^(/v2\.0)?/bgpvpn/bgpvpns'
+    r'(/(?P<bgpvpn_id>[^/.]+)'
+    r'(/(network|router|port)_associations(/[^/.]+)?)?)?'
+    r'(\.json)?$')
+
+
+class ConditionalGet(base.ConfigurableMiddleware):
+    """Answer conditional GETs of BGPVPN resources
+
+    The responses to the GET of a BGPVPN, of its associations, or of the
+    BGPVPN list get an ETag. When a request comes with the ETag of the
+    current representation in If-None-Match, '304 Not Modified' is returned
+    without building it.
+
+    The ETag derives from the revision number of the BGPVPN, which is
+    bumped by any change of its associations, or from the version of the
+    BGPVPN list (see BGPVPNPluginDb.get_bgpvpns_version), read with a
+    single query. As the representation also depends on the request and on
+    the credentials, they are part of the ETag too. Without the 'revisions'
+    service plugin, which maintains the revision numbers, nothing is done.
+
+    To be inserted in the neutron API pipeline after the authentication
+    middleware:
+
+        [filter:bgpvpn_conditional_get]
+        paste.filter_factory = networking_bgpvpn.neutron.middleware:\
+ConditionalGet.factory
+    """
+
+    def __init__(self, application, conf=None):
+        super(ConditionalGet, self).__init__(application, conf)
+        self.bgpvpn_db = bgpvpn_db.BGPVPNPluginDb()
+
+    def _get_version(self, context, bgpvpn_id):
+        if bgpvpn_id:
+            return self.bgpvpn_db.get_bgpvpn_revision_number(context,
+                                                             bgpvpn_id)
+        return self.bgpvpn_db.get_bgpvpns_version(context)
+
+    @staticmethod
+    def _etag(req, context, version):
+        key = (version, req.path_info, req.query_string, context.project_id,
+               context.is_admin, sorted(context.roles or ()))
+        return hashlib.sha256(repr(key).encode()).hexdigest()
+
+    @webob.dec.wsgify
+    def __call__(self, req):
+        match = BGPVPN_PATH.match(req.path_info)
+        if (req.method != 'GET' or not match or
+                not utils.revision_numbers_maintained()):
+            return self.application
+        # like the API does, without credentials the context is the admin one
+        context = (req.environ.get('neutron.context') or
+                   n_context.get_admin_context())
+        try:
+            version = self._get_version(context, match.group('bgpvpn_id'))
+        except bgpvpn_ext.BGPVPNNotFound:
+            # let the API answer
+            return self.application
+        etag = self._etag(req, context, version)
+        if etag in req.if_none_match:
+            LOG.debug("%s not modified", req.path_info)
+            response = webob.Response(status=304, content_type=None)
+            response.etag = etag
+            return response
+        response = req.get_response(self.application)
+        if response.status_int == 200:
+            response.etag = etag
+        return response
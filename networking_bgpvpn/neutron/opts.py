@@ -41,6 +41,58 @@ BGPVPN_CONFIG_OPTS = [
                 help='This option enables auto-allocation for route targets'
                      'for a new bgpvpns created with empty route_targets '
                      'field.'),
+    cfg.IntOpt('bgpvpn_cache_size',
+               default=0,
+               min=0,
+               help='Number of BGPVPNs whose representation is cached by '
+                    'each API worker, 0 disables the cache. A cached BGPVPN '
+                    'is still checked against its revision number in the '
+                    'database, which requires the "revisions" service '
+                    'plugin.'),
+    cfg.IntOpt('postcommit_workers',
+               default=0,
+               min=0,
+               help='Number of threads of each API worker running the '
+                    'postcommit operations of the service driver once the '
+                    'API request has returned. The operations of a BGPVPN '
+                    'are run in order. 0 runs them within the API requests.'),
+    cfg.IntOpt('postcommit_queue_size',
+               default=1000,
+               min=1,
+               help='Maximum number of postcommit operations waiting for '
+                    'each postcommit thread, API requests wait for the '
+                    'queue to have room once it is full.'),
+    cfg.FloatOpt('push_coalescing_interval',
+                 default=0,
+                 min=0,
+                 help='Interval in seconds during which the bagpipe driver '
+                      'merges the changes of an association, to push it to '
+                      'the agents once in its latest state. 0 pushes each '
+                      'change right away.'),
+    cfg.FloatOpt('port_batch_interval',
+                 default=0,
+                 min=0,
+                 help='Interval in seconds during which the bagpipe driver '
+                      'gathers the ports attached to or detached from '
+                      'BGPVPNs on a host, to notify the agent of the host '
+                      'about them together, retrieving the BGPVPN '
+                      'information of the attached ports at once. 0 '
+                      'notifies the agent of each port right away.'),
+    cfg.IntOpt('port_batch_size',
+               default=500,
+               min=1,
+               help='Number of ports gathered for a host after which the '
+                    'bagpipe driver notifies its agent without waiting for '
+                    'the end of port_batch_interval.'),
+    cfg.IntOpt('gateway_mac_cache_ttl',
+               default=0,
+               min=0,
+               help='Time in seconds during which the bagpipe driver '
+                    'caches the MAC address of the router interface of a '
+                    'network. The cache of a worker is invalidated when it '
+                    'processes the addition or removal of a router '
+                    'interface on the network, the other workers rely on '
+                    'the expiry. 0 disables the cache.'),
 ]
 
 
@@ -24,3 +24,6 @@ UINT16_REGEX = bgpvpn.UINT16_REGEX
 UINT8_REGEX = bgpvpn.UINT8_REGEX
 IP4_REGEX = bgpvpn.IP4_REGEX
 RTRD_REGEX = bgpvpn.RTRD_REGEX
+
+# type of the neutron service plugin maintaining the revision numbers
+REVISION_PLUGIN = 'revision_plugin'
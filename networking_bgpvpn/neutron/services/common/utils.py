@@ -13,12 +13,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import bisect
 
 from neutron_lib.api.definitions import bgpvpn as bgpvpn_def
 from neutron_lib.api.definitions import bgpvpn_routes_control as bgpvpn_rc_def
 from neutron_lib.api.definitions import bgpvpn_vni as bgpvpn_vni_def
 from neutron_lib.plugins import directory
 
+from networking_bgpvpn.neutron.services.common import constants
+
 
 def rtrd_list2str(list):
     """Format Route Target list to string"""
@@ -42,6 +45,66 @@ def rtrd_str2list(str):
     return str.split(',')
 
 
+class RangeSet(object):
+    """Set of integers defined by inclusive ranges
+
+    The integers are not materialized: overlapping or adjacent ranges are
+    merged, and membership tests are done by bisection on the ranges.
+    """
+
+    def __init__(self, ranges=()):
+        merged = []
+        for first, last in sorted(ranges):
+            if merged and first <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], last)
+            else:
+                merged.append([first, last])
+        self._firsts = [first for first, _last in merged]
+        self._lasts = [last for _first, last in merged]
+
+    @classmethod
+    def from_string(cls, ranges_str):
+        """Parse a string like '300-1000,1500,2000-3000'"""
+        ranges = []
+        for rng in ranges_str.split(','):
+            if not rng.strip():
+                continue
+            first, _sep, last = rng.partition('-')
+            ranges.append((int(first), int(last or first)))
+        return cls(ranges)
+
+    def ranges(self):
+        return list(zip(self._firsts, self._lasts))
+
+    def next_after(self, value):
+        """Return the lowest integer of the set above value, None if none"""
+        i = bisect.bisect_right(self._firsts, value) - 1
+        if i >= 0 and value < self._lasts[i]:
+            return value + 1
+        if i + 1 < len(self._firsts):
+            return self._firsts[i + 1]
+        return None
+
+    def __contains__(self, value):
+        i = bisect.bisect_right(self._firsts, value) - 1
+        return i >= 0 and value <= self._lasts[i]
+
+    def __iter__(self):
+        for first, last in zip(self._firsts, self._lasts):
+            yield from range(first, last + 1)
+
+    def __len__(self):
+        return sum(last - first + 1
+                   for first, last in zip(self._firsts, self._lasts))
+
+    def __eq__(self, other):
+        return (isinstance(other, RangeSet) and
+                self.ranges() == other.ranges())
+
+    def __repr__(self):
+        return 'RangeSet(%s)' % self.ranges()
+
+
 def filter_resource(resource, filters=None):
     if not filters:
         filters = {}
@@ -69,7 +132,21 @@ def is_extension_supported(plugin, ext_alias):
     return ext_alias in plugin.supported_extension_aliases
 
 
-def make_bgpvpn_dict(bgpvpn, fields=None):
+def get_supported_extensions():
+    """Return the aliases of the extensions supported by the BGPVPN plugin
+
+    The set is computed once, when the plugin loads its service driver, so
+    that building BGPVPN dicts doesn't walk the list of aliases each time.
+    """
+    return directory.get_plugin(bgpvpn_def.ALIAS).supported_extensions
+
+
+def revision_numbers_maintained():
+    """Whether the revision numbers are bumped by the changes of resources"""
+    return directory.get_plugin(constants.REVISION_PLUGIN) is not None
+
+
+def make_bgpvpn_dict(bgpvpn, fields=None, extensions=None):
     res = {
         'id': bgpvpn['id'],
         'tenant_id': bgpvpn['tenant_id'],
@@ -83,10 +160,12 @@ def make_bgpvpn_dict(bgpvpn, fields=None):
         'routers': bgpvpn.get('routers', []),
         'ports': bgpvpn.get('ports', []),
     }
-    plugin = directory.get_plugin(bgpvpn_def.ALIAS)
-    if is_extension_supported(plugin, bgpvpn_vni_def.ALIAS):
+    # callers building many dicts can look up the extensions once for all
+    if extensions is None:
+        extensions = get_supported_extensions()
+    if bgpvpn_vni_def.ALIAS in extensions:
         res[bgpvpn_vni_def.VNI] = bgpvpn.get(bgpvpn_vni_def.VNI)
-    if is_extension_supported(plugin, bgpvpn_rc_def.ALIAS):
+    if bgpvpn_rc_def.ALIAS in extensions:
         res[bgpvpn_rc_def.LOCAL_PREF_KEY] = bgpvpn.get(
             bgpvpn_rc_def.LOCAL_PREF_KEY)
     return filter_fields(res, fields)
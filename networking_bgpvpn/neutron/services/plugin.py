@@ -14,6 +14,7 @@
 #    under the License.
 
 import copy
+import itertools
 
 from neutron.db import servicetype_db as st_db
 from neutron.objects import base
@@ -25,12 +26,15 @@ from neutron_lib.callbacks import events
 from neutron_lib.callbacks import registry
 from neutron_lib.callbacks import resources
 from neutron_lib import constants as const
+from neutron_lib import context as n_context
 from neutron_lib import exceptions as n_exc
+from neutron_lib.exceptions import l3 as l3_exc
 from neutron_lib.plugins import constants as plugin_constants
 from neutron_lib.plugins import directory
 
 from oslo_config import cfg
 from oslo_log import log
+from oslo_utils import excutils
 
 from networking_bgpvpn._i18n import _
 
@@ -49,11 +53,22 @@ CONF = cfg.CONF
 # service_provider configuration: "BGPVPN:Dummy:networking_bgpvpn ...")
 SERVICE_PROVIDER_TYPE = "BGPVPN"
 
+TARGET_FIELDS = ('route_targets', 'import_targets', 'export_targets')
+
+
+def _get_targets(bgpvpn):
+    return {target for field in TARGET_FIELDS
+            for target in bgpvpn.get(field) or []}
+
 
 @registry.has_registry_receivers
 class BGPVPNPlugin(bgpvpn.BGPVPNPluginBase,
                    bgpvpn_rc.BGPVPNRoutesControlPluginBase):
 
+    __native_bulk_support = True
+    __native_pagination_support = True
+    __native_sorting_support = True
+
     def __init__(self):
         super(BGPVPNPlugin, self).__init__()
 
@@ -70,11 +85,17 @@ class BGPVPNPlugin(bgpvpn.BGPVPNPluginBase,
         LOG.info("BGP VPN Service Plugin using Service Driver: %s",
                  default_provider)
         self.driver = drivers[default_provider]
+        # the extensions supported with this driver don't change once it is
+        # loaded, see utils.get_supported_extensions
+        self.supported_extensions = frozenset(
+            self.supported_extension_aliases)
 
         # Register options for plugin and save bgpvpn section
         opts.register_bgpvpn_options(CONF)
         self.bgpvpn_config = CONF.bgpvpn
-        self.bgpvpn_available_targets = self._available_targets()
+        self.bgpvpn_region_asn, self.bgpvpn_target_ids = (
+            self._available_target_ids())
+        self._target_allocations_synced = False
 
         # Register RBAC object for BGPVPN RBAC
         base.NeutronObjectRegistry.register(bgpvpn_rbac_obj.BGPVPNRBAC)
@@ -90,6 +111,14 @@ class BGPVPNPlugin(bgpvpn.BGPVPNPluginBase,
         exts += self.driver.more_supported_extension_aliases
         return exts
 
+    @registry.receives(resources.PROCESS, [events.BEFORE_SPAWN])
+    def _sync_target_allocations_before_spawn(self, resource, event, trigger,
+                                              payload=None):
+        # done once before the API workers are forked, so that they do not
+        # have to do it themselves
+        if self._is_targets_auto_allocation_enabled():
+            self._sync_target_allocations(n_context.get_admin_context())
+
     @registry.receives(resources.ROUTER_INTERFACE, [events.BEFORE_CREATE])
     def _notify_adding_interface_to_router(self, resource, event, trigger,
                                            payload):
@@ -143,6 +172,45 @@ class BGPVPNPlugin(bgpvpn.BGPVPNPluginBase,
                        )
                 raise n_exc.BadRequest(resource='bgpvpn', msg=msg)
 
+    def _validate_networks(self, context, net_ids):
+        """Validate several networks at once, return them by id"""
+        plugin = directory.get_plugin()
+        networks = {net['id']: net for net in plugin.get_networks(
+            context, filters={'id': net_ids})}
+        for net_id in net_ids:
+            if net_id not in networks:
+                raise n_exc.NetworkNotFound(net_id=net_id)
+        self._validate_networks_have_router_assoc(
+            context, list(networks.values()), plugin)
+        return networks
+
+    def _validate_networks_have_router_assoc(self, context, networks,
+                                             plugin):
+        filter = {'network_id': [network['id'] for network in networks],
+                  'device_owner': [const.DEVICE_OWNER_ROUTER_INTF]}
+        router_ports = plugin.get_ports(context, filters=filter)
+        if not router_ports:
+            return
+        filter = {'tenant_id': list({network['tenant_id']
+                                     for network in networks}),
+                  'routers': list({port['device_id']
+                                   for port in router_ports})}
+        bgpvpns = self.driver.get_bgpvpns(context, filters=filter)
+        networks = {network['id']: network for network in networks}
+        for port in router_ports:
+            network = networks[port['network_id']]
+            bgpvpn_ids = sorted({
+                str(bgpvpn['id']) for bgpvpn in bgpvpns
+                if bgpvpn['tenant_id'] == network['tenant_id'] and
+                port['device_id'] in bgpvpn['routers']})
+            if bgpvpn_ids:
+                msg = ('Network %(net_id)s is linked to a router which is '
+                       'already associated to bgpvpn(s) %(bgpvpns)s'
+                       % {'net_id': network['id'],
+                          'bgpvpns': bgpvpn_ids}
+                       )
+                raise n_exc.BadRequest(resource='bgpvpn', msg=msg)
+
     def _validate_router(self, context, router_id):
         l3_plugin = directory.get_plugin(plugin_constants.L3)
         router = l3_plugin.get_router(context, router_id)
@@ -150,11 +218,34 @@ class BGPVPNPlugin(bgpvpn.BGPVPNPluginBase,
         self._validate_router_has_net_assocs(context, router, plugin)
         return router
 
+    def _validate_routers(self, context, router_ids):
+        """Validate several routers at once, return them by id"""
+        l3_plugin = directory.get_plugin(plugin_constants.L3)
+        routers = {router['id']: router for router in l3_plugin.get_routers(
+            context, filters={'id': router_ids})}
+        for router_id in router_ids:
+            if router_id not in routers:
+                raise l3_exc.RouterNotFound(router_id=router_id)
+        plugin = directory.get_plugin()
+        self._validate_routers_have_net_assocs(
+            context, list(routers.values()), plugin)
+        return routers
+
     def _validate_port(self, context, port_id):
         plugin = directory.get_plugin()
         port = plugin.get_port(context, port_id)
         return port
 
+    def _validate_ports(self, context, port_ids):
+        """Validate several ports at once, return them by id"""
+        plugin = directory.get_plugin()
+        ports = {port['id']: port for port in plugin.get_ports(
+            context, filters={'id': port_ids})}
+        for port_id in port_ids:
+            if port_id not in ports:
+                raise n_exc.PortNotFound(port_id=port_id)
+        return ports
+
     def _validate_router_has_net_assocs(self, context, router, plugin):
         filter = {'device_id': [router['id']],
                   'device_owner': [const.DEVICE_OWNER_ROUTER_INTF]}
@@ -174,33 +265,147 @@ class BGPVPNPlugin(bgpvpn.BGPVPNPluginBase,
                               'bgpvpns': bgpvpns})
                     raise n_exc.BadRequest(resource='bgpvpn', msg=msg)
 
-    def _validate_targets(self, context, bgpvpn):
-        rt = utils.rtrd_list2str(bgpvpn['route_targets'])
-        i_rt = utils.rtrd_list2str(bgpvpn['import_targets'])
-        e_rt = utils.rtrd_list2str(bgpvpn['export_targets'])
-        # auto-allocation works only if all target fields are empty
-        if not i_rt and not e_rt and not rt:
-            if self._is_targets_auto_allocation_enabled():
-                alloc_targets = self.driver.bgpvpn_db.get_allocated_targets(
-                    context)
-                for target in self.bgpvpn_available_targets:
-                    if target not in alloc_targets:
-                        if self.bgpvpn_config.import_target_auto_allocation:
-                            bgpvpn['import_targets'] = [target]
-                        if self.bgpvpn_config.export_target_auto_allocation:
-                            bgpvpn['export_targets'] = [target]
-                        if self.bgpvpn_config.route_target_auto_allocation:
-                            bgpvpn['route_targets'] = [target]
-                        return
-            else:
-                msg = ('Targets fields required. One of the fields: '
-                       'export_targets, import_targets, route_target must be '
-                       'passed.')
+    def _validate_routers_have_net_assocs(self, context, routers, plugin):
+        filter = {'device_id': [router['id'] for router in routers],
+                  'device_owner': [const.DEVICE_OWNER_ROUTER_INTF]}
+        router_ports = plugin.get_ports(context, filters=filter)
+        if not router_ports:
+            return
+        filter = {'tenant_id': list({router['tenant_id']
+                                     for router in routers}),
+                  'networks': list({port['network_id']
+                                    for port in router_ports})}
+        bgpvpns = self.driver.get_bgpvpns(context, filters=filter)
+        routers = {router['id']: router for router in routers}
+        for port in router_ports:
+            router = routers[port['device_id']]
+            bgpvpn_ids = sorted({
+                str(bgpvpn['id']) for bgpvpn in bgpvpns
+                if bgpvpn['tenant_id'] == router['tenant_id'] and
+                port['network_id'] in bgpvpn['networks']})
+            if bgpvpn_ids:
+                msg = ('router %(rtr_id)s has an attached network '
+                       '%(net_id)s which is already associated to '
+                       'bgpvpn(s) %(bgpvpns)s'
+                       % {'rtr_id': router['id'],
+                          'net_id': port['network_id'],
+                          'bgpvpns': bgpvpn_ids})
                 raise n_exc.BadRequest(resource='bgpvpn', msg=msg)
 
-    def _available_targets(self):
+    def _needs_targets(self, bgpvpn):
+        """Check whether targets have to be auto-allocated for a new BGPVPN
+
+        Auto-allocation works only if all target fields are empty, and a
+        BadRequest is raised if it is disabled.
+        """
+        if (bgpvpn['route_targets'] or bgpvpn['import_targets'] or
+                bgpvpn['export_targets']):
+            return False
+        if not self._is_targets_auto_allocation_enabled():
+            msg = ('Targets fields required. One of the fields: '
+                   'export_targets, import_targets, route_target must be '
+                   'passed.')
+            raise n_exc.BadRequest(resource='bgpvpn', msg=msg)
+        return True
+
+    def _set_targets(self, bgpvpn, target):
+        """Set an auto-allocated target on the enabled target fields"""
+        if target is None:
+            LOG.warning("No target left to auto-allocate in "
+                        "target_id_range %s",
+                        self.bgpvpn_config.target_id_range)
+            return
+        if self.bgpvpn_config.import_target_auto_allocation:
+            bgpvpn['import_targets'] = [target]
+        if self.bgpvpn_config.export_target_auto_allocation:
+            bgpvpn['export_targets'] = [target]
+        if self.bgpvpn_config.route_target_auto_allocation:
+            bgpvpn['route_targets'] = [target]
+
+    def _validate_targets(self, context, bgpvpn):
+        """Check the targets of a new BGPVPN, allocate one if needed
+
+        Returns the auto-allocated target, if any.
+        """
+        if not self._needs_targets(bgpvpn):
+            return None
+        target = self._allocate_target(context)
+        self._set_targets(bgpvpn, target)
+        return target
+
+    def _sync_target_allocations(self, context):
+        self.driver.bgpvpn_db.sync_target_allocations(
+            context, self.bgpvpn_target_ids)
+        self._target_allocations_synced = True
+
+    def _allocate_target(self, context):
+        targets, _reserved = self._allocate_targets(context, 1)
+        return targets[0] if targets else None
+
+    def _allocate_targets(self, context, count, excluded=()):
+        """Reserve 'count' free targets
+
+        Fewer targets are returned if not enough of them are free. The
+        'excluded' targets, not in the database yet, are never returned.
+
+        Returns the allocated targets and all the targets reserved by the
+        call, including the ones skipped because they are in use or
+        excluded.
+        """
+        if not self._target_allocations_synced:
+            self._sync_target_allocations(context)
+        bgpvpn_db = self.driver.bgpvpn_db
+        targets = []
+        reserved = []
+        while len(targets) < count:
+            target_ids = bgpvpn_db.allocate_target_ids(context,
+                                                       count - len(targets))
+            if not target_ids:
+                break
+            candidates = [self._format_target(target_id)
+                          for target_id in target_ids]
+            reserved.extend(candidates)
+            # a target can have been set manually on a BGPVPN, in which
+            # case it remains reserved and the next free ones are tried
+            in_use = bgpvpn_db.get_allocated_targets(context,
+                                                     targets=candidates)
+            in_use.update(excluded)
+            targets.extend(target for target in candidates
+                           if target not in in_use)
+        return targets, reserved
+
+    def _release_targets(self, context, targets):
+        """Release the auto-allocatable targets no longer used"""
+        target_ids = {}
+        for target in targets:
+            target_id = self._parse_target(target)
+            if target_id is not None:
+                target_ids[target] = target_id
+        if not target_ids:
+            return
+        in_use = self.driver.bgpvpn_db.get_allocated_targets(
+            context, targets=list(target_ids))
+        self.driver.bgpvpn_db.release_target_ids(
+            context, [target_id for target, target_id in target_ids.items()
+                      if target not in in_use])
+
+    def _format_target(self, target_id):
+        return '%s:%s' % (self.bgpvpn_region_asn, target_id)
+
+    def _parse_target(self, target):
+        """Return the ID of a target of the region ASN, None otherwise"""
+        asn, _sep, target_id = target.partition(':')
+        if asn == str(self.bgpvpn_region_asn) and target_id.isdigit():
+            return int(target_id)
+        return None
+
+    def _available_target_ids(self):
+        """Return the region 4-byte ASN and the auto-allocatable target IDs
+
+        The target IDs are returned as a utils.RangeSet.
+        """
         if not self._is_targets_auto_allocation_enabled():
-            return []
+            return None, utils.RangeSet()
         if not self.bgpvpn_config.region_asn:
             msg = ('Region ASn is required for auto-allocation of '
                    'targets.')
@@ -217,14 +422,8 @@ class BGPVPNPlugin(bgpvpn.BGPVPNPluginBase,
                    'range 4200000000 < ASn < 4294967294' % asn_4_byte)
             raise ValueError(msg)
 
-        res = []
-        for rng in self.bgpvpn_config.target_id_range.split(','):
-            if '-' in rng:
-                values = rng.split('-')
-                res.extend(list(range(int(values[0]), int(values[1]) + 1)))
-            else:
-                res.append(int(rng))
-        return ['%s:%s' % (asn_4_byte, r) for r in res]
+        return asn_4_byte, utils.RangeSet.from_string(
+            self.bgpvpn_config.target_id_range)
 
     def _is_targets_auto_allocation_enabled(self):
         return (self.bgpvpn_config.export_target_auto_allocation or
@@ -239,29 +438,95 @@ class BGPVPNPlugin(bgpvpn.BGPVPNPluginBase,
 
     def create_bgpvpn(self, context, bgpvpn):
         bgpvpn = bgpvpn['bgpvpn']
-        self._validate_targets(context, bgpvpn)
-        return self.driver.create_bgpvpn(context, bgpvpn)
-
-    def get_bgpvpns(self, context, filters=None, fields=None):
-        return self.driver.get_bgpvpns(context, filters, fields)
+        target = self._validate_targets(context, bgpvpn)
+        try:
+            return self.driver.create_bgpvpn(context, bgpvpn)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                if target:
+                    self._release_targets(context, [target])
+
+    def create_bgpvpn_bulk(self, context, bgpvpns):
+        bgpvpns = [item['bgpvpn'] for item in bgpvpns['bgpvpns']]
+        # the targets of the whole batch are allocated at once, skipping
+        # the ones set manually on the other BGPVPNs of the batch
+        to_allocate = []
+        excluded = set()
+        for new_bgpvpn in bgpvpns:
+            if self._needs_targets(new_bgpvpn):
+                to_allocate.append(new_bgpvpn)
+            else:
+                excluded.update(_get_targets(new_bgpvpn))
+        targets = reserved = []
+        if to_allocate:
+            targets, reserved = self._allocate_targets(
+                context, len(to_allocate), excluded)
+        for new_bgpvpn, target in itertools.zip_longest(to_allocate,
+                                                        targets):
+            self._set_targets(new_bgpvpn, target)
+        try:
+            return self.driver.create_bgpvpns(context, bgpvpns)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                # the targets set manually in the batch were reserved too
+                # if they were in the range, only the ones used by other
+                # BGPVPNs must remain reserved
+                self._release_targets(context, reserved)
+
+    def get_bgpvpns(self, context, filters=None, fields=None, sorts=None,
+                    limit=None, marker=None, page_reverse=False):
+        return self.driver.get_bgpvpns(context, filters, fields, sorts, limit,
+                                       marker, page_reverse)
+
+    def get_bgpvpns_count(self, context, filters=None):
+        return self.driver.get_bgpvpns_count(context, filters)
 
     def get_bgpvpn(self, context, id, fields=None):
         return self.driver.get_bgpvpn(context, id, fields)
 
     def update_bgpvpn(self, context, id, bgpvpn):
         bgpvpn = bgpvpn['bgpvpn']
-        return self.driver.update_bgpvpn(context, id, bgpvpn)
+        if not (self._is_targets_auto_allocation_enabled() and
+                any(field in bgpvpn for field in TARGET_FIELDS)):
+            return self.driver.update_bgpvpn(context, id, bgpvpn)
+        old_bgpvpn = self.get_bgpvpn(context, id)
+        new_bgpvpn = self.driver.update_bgpvpn(context, id, bgpvpn)
+        self._release_targets(context, (_get_targets(old_bgpvpn) -
+                                        _get_targets(new_bgpvpn)))
+        return new_bgpvpn
 
     def delete_bgpvpn(self, context, id):
+        if not self._is_targets_auto_allocation_enabled():
+            self.driver.delete_bgpvpn(context, id)
+            return
+        bgpvpn = self.get_bgpvpn(context, id)
         self.driver.delete_bgpvpn(context, id)
+        self._release_targets(context, _get_targets(bgpvpn))
 
     def create_bgpvpn_network_association(self, context, bgpvpn_id,
                                           network_association):
         net_assoc = network_association['network_association']
         # check net exists
         net = self._validate_network(context, net_assoc['network_id'])
-        # check every resource belong to the same tenant
         bgpvpn = self.get_bgpvpn(context, bgpvpn_id)
+        self._check_net_assoc(bgpvpn, net, net_assoc)
+        return self.driver.create_net_assoc(context, bgpvpn_id, net_assoc)
+
+    def create_bgpvpn_network_association_bulk(self, context, bgpvpn_id,
+                                               network_associations):
+        net_assocs = [item['network_association'] for item in
+                      network_associations['network_associations']]
+        nets = self._validate_networks(
+            context, [net_assoc['network_id'] for net_assoc in net_assocs])
+        bgpvpn = self.get_bgpvpn(context, bgpvpn_id)
+        for net_assoc in net_assocs:
+            self._check_net_assoc(bgpvpn, nets[net_assoc['network_id']],
+                                  net_assoc)
+        return self.driver.create_net_assocs(context, bgpvpn_id, net_assocs)
+
+    @staticmethod
+    def _check_net_assoc(bgpvpn, net, net_assoc):
+        # check every resource belong to the same tenant
         if net['tenant_id'] != bgpvpn['tenant_id'] and \
                 not bgpvpn['shared']:
             msg = 'network doesn\'t belong to the bgpvpn owner'
@@ -271,15 +536,21 @@ class BGPVPNPlugin(bgpvpn.BGPVPNPluginBase,
             msg = 'network association and bgpvpn should belong to\
                 the same tenant'
             raise n_exc.NotAuthorized(resource='bgpvpn', msg=msg)
-        return self.driver.create_net_assoc(context, bgpvpn_id, net_assoc)
 
     def get_bgpvpn_network_association(self, context, assoc_id, bgpvpn_id,
                                        fields=None):
         return self.driver.get_net_assoc(context, assoc_id, bgpvpn_id, fields)
 
     def get_bgpvpn_network_associations(self, context, bgpvpn_id,
-                                        filters=None, fields=None):
-        return self.driver.get_net_assocs(context, bgpvpn_id, filters, fields)
+                                        filters=None, fields=None, sorts=None,
+                                        limit=None, marker=None,
+                                        page_reverse=False):
+        return self.driver.get_net_assocs(context, bgpvpn_id, filters, fields,
+                                          sorts, limit, marker, page_reverse)
+
+    def get_bgpvpn_network_associations_count(self, context, bgpvpn_id,
+                                              filters=None):
+        return self.driver.get_net_assocs_count(context, bgpvpn_id, filters)
 
     def update_bgpvpn_network_association(self, context, assoc_id, bgpvpn_id,
                                           network_association):
@@ -294,6 +565,26 @@ class BGPVPNPlugin(bgpvpn.BGPVPNPluginBase,
         router_assoc = router_association['router_association']
         router = self._validate_router(context, router_assoc['router_id'])
         bgpvpn = self.get_bgpvpn(context, bgpvpn_id)
+        self._check_router_assoc(bgpvpn, router, router_assoc)
+        return self.driver.create_router_assoc(context, bgpvpn_id,
+                                               router_assoc)
+
+    def create_bgpvpn_router_association_bulk(self, context, bgpvpn_id,
+                                              router_associations):
+        router_assocs = [item['router_association'] for item in
+                         router_associations['router_associations']]
+        routers = self._validate_routers(
+            context,
+            [router_assoc['router_id'] for router_assoc in router_assocs])
+        bgpvpn = self.get_bgpvpn(context, bgpvpn_id)
+        for router_assoc in router_assocs:
+            self._check_router_assoc(
+                bgpvpn, routers[router_assoc['router_id']], router_assoc)
+        return self.driver.create_router_assocs(context, bgpvpn_id,
+                                                router_assocs)
+
+    @staticmethod
+    def _check_router_assoc(bgpvpn, router, router_assoc):
         if not bgpvpn['type'] == constants.BGPVPN_L3:
             msg = ("Router associations require the bgpvpn to be of type %s"
                    % constants.BGPVPN_L3)
@@ -307,8 +598,6 @@ class BGPVPNPlugin(bgpvpn.BGPVPNPluginBase,
             msg = "router association and bgpvpn should " \
                   "belong to the same tenant"
             raise n_exc.NotAuthorized(resource='bgpvpn', msg=msg)
-        return self.driver.create_router_assoc(context, bgpvpn_id,
-                                               router_assoc)
 
     def get_bgpvpn_router_association(self, context, assoc_id, bgpvpn_id,
                                       fields=None):
@@ -316,9 +605,16 @@ class BGPVPNPlugin(bgpvpn.BGPVPNPluginBase,
                                             fields)
 
     def get_bgpvpn_router_associations(self, context, bgpvpn_id, filters=None,
-                                       fields=None):
+                                       fields=None, sorts=None, limit=None,
+                                       marker=None, page_reverse=False):
         return self.driver.get_router_assocs(context, bgpvpn_id, filters,
-                                             fields)
+                                             fields, sorts, limit, marker,
+                                             page_reverse)
+
+    def get_bgpvpn_router_associations_count(self, context, bgpvpn_id,
+                                             filters=None):
+        return self.driver.get_router_assocs_count(context, bgpvpn_id,
+                                                   filters)
 
     def update_bgpvpn_router_association(self, context, assoc_id, bgpvpn_id,
                                          router_association):
@@ -329,40 +625,92 @@ class BGPVPNPlugin(bgpvpn.BGPVPNPluginBase,
     def delete_bgpvpn_router_association(self, context, assoc_id, bgpvpn_id):
         self.driver.delete_router_assoc(context, assoc_id, bgpvpn_id)
 
-    def _validate_port_association_routes_bgpvpn(self, context,
-                                                 port_association,
-                                                 bgpvpn_id, assoc_id=None):
+    def _get_routes_bgpvpns(self, context, port_associations):
+        """Return the BGPVPNs of the routes of port associations, by ID
+
+        They are all retrieved with a single query, with only the fields
+        needed to check the routes.
+        """
+        bgpvpn_ids = {route['bgpvpn_id']
+                      for port_association in port_associations
+                      for route in port_association.get('routes', [])
+                      if route['type'] == bgpvpn_rc.api_def.BGPVPN_TYPE}
+        if not bgpvpn_ids:
+            return {}
+        return {route_bgpvpn['id']: route_bgpvpn
+                for route_bgpvpn in self.get_bgpvpns(
+                    context, filters={'id': list(bgpvpn_ids)},
+                    fields=['id', 'type', 'tenant_id'])}
+
+    @staticmethod
+    def _check_port_assoc_routes(bgpvpn, route_bgpvpns, port_association,
+                                 assoc_tenant_id):
         for route in [r for r in port_association.get('routes', []) if
                       r['type'] == bgpvpn_rc.api_def.BGPVPN_TYPE]:
-            try:
-                route_bgpvpn = self.get_bgpvpn(context, route['bgpvpn_id'])
-            except bgpvpn.BGPVPNNotFound:
+            route_bgpvpn = route_bgpvpns.get(route['bgpvpn_id'])
+            if route_bgpvpn is None:
                 raise bgpvpn_rc.BGPVPNPortAssocRouteNoSuchBGPVPN(
                     bgpvpn_id=route['bgpvpn_id'])
 
-            assoc_bgpvpn = self.get_bgpvpn(context, bgpvpn_id)
-            if route_bgpvpn['type'] != assoc_bgpvpn['type']:
+            if route_bgpvpn['type'] != bgpvpn['type']:
                 raise bgpvpn_rc.BGPVPNPortAssocRouteBGPVPNTypeDiffer(
                     route_bgpvpn_type=route_bgpvpn['type'],
-                    bgpvpn_type=assoc_bgpvpn['type']
+                    bgpvpn_type=bgpvpn['type']
                     )
 
-            assoc_tenant_id = port_association.get('project_id')
-            if assoc_tenant_id is None:
-                # update, rather than create, we need to retrieve the tenant
-                assoc = self.get_bgpvpn_port_association(context,
-                                                         assoc_id, bgpvpn_id)
-                assoc_tenant_id = assoc.get('project_id')
-
             if route_bgpvpn['project_id'] != assoc_tenant_id:
                 raise bgpvpn_rc.BGPVPNPortAssocRouteWrongBGPVPNTenant(
                     bgpvpn_id=route['bgpvpn_id'])
 
+    def _validate_port_association_routes_bgpvpn(self, context,
+                                                 port_association,
+                                                 bgpvpn_id, assoc_id=None):
+        if not any(r['type'] == bgpvpn_rc.api_def.BGPVPN_TYPE
+                   for r in port_association.get('routes', [])):
+            return
+        route_bgpvpns = self._get_routes_bgpvpns(context, [port_association])
+        bgpvpn = self.get_bgpvpn(context, bgpvpn_id)
+
+        assoc_tenant_id = port_association.get('project_id')
+        if assoc_tenant_id is None:
+            # update, rather than create, we need to retrieve the tenant
+            assoc = self.get_bgpvpn_port_association(context,
+                                                     assoc_id, bgpvpn_id)
+            assoc_tenant_id = assoc.get('project_id')
+
+        self._check_port_assoc_routes(bgpvpn, route_bgpvpns,
+                                      port_association, assoc_tenant_id)
+
     def create_bgpvpn_port_association(self, context, bgpvpn_id,
                                        port_association):
         port_association = port_association['port_association']
         port = self._validate_port(context, port_association['port_id'])
         bgpvpn = self.get_bgpvpn(context, bgpvpn_id)
+        self._check_port_assoc(bgpvpn, port, port_association)
+        self._validate_port_association_routes_bgpvpn(context,
+                                                      port_association,
+                                                      bgpvpn_id)
+        return self.driver.create_port_assoc(context,
+                                             bgpvpn_id, port_association)
+
+    def create_bgpvpn_port_association_bulk(self, context, bgpvpn_id,
+                                            port_associations):
+        port_assocs = [item['port_association'] for item in
+                       port_associations['port_associations']]
+        ports = self._validate_ports(
+            context, [port_assoc['port_id'] for port_assoc in port_assocs])
+        bgpvpn = self.get_bgpvpn(context, bgpvpn_id)
+        route_bgpvpns = self._get_routes_bgpvpns(context, port_assocs)
+        for port_assoc in port_assocs:
+            self._check_port_assoc(bgpvpn, ports[port_assoc['port_id']],
+                                   port_assoc)
+            self._check_port_assoc_routes(bgpvpn, route_bgpvpns, port_assoc,
+                                          port_assoc['project_id'])
+        return self.driver.create_port_assocs(context, bgpvpn_id,
+                                              port_assocs)
+
+    @staticmethod
+    def _check_port_assoc(bgpvpn, port, port_association):
         if not port['tenant_id'] == bgpvpn['project_id']:
             msg = "port doesn't belong to the bgpvpn owner"
             raise n_exc.NotAuthorized(resource='bgpvpn', msg=msg)
@@ -370,19 +718,22 @@ class BGPVPNPlugin(bgpvpn.BGPVPNPluginBase,
             msg = "port association and bgpvpn should " \
                   "belong to the same tenant"
             raise n_exc.NotAuthorized(resource='bgpvpn', msg=msg)
-        self._validate_port_association_routes_bgpvpn(context,
-                                                      port_association,
-                                                      bgpvpn_id)
-        return self.driver.create_port_assoc(context,
-                                             bgpvpn_id, port_association)
 
     def get_bgpvpn_port_association(self, context, assoc_id, bgpvpn_id,
                                     fields=None):
         return self.driver.get_port_assoc(context, assoc_id, bgpvpn_id, fields)
 
     def get_bgpvpn_port_associations(self, context, bgpvpn_id,
-                                     filters=None, fields=None):
-        return self.driver.get_port_assocs(context, bgpvpn_id, filters, fields)
+                                     filters=None, fields=None, sorts=None,
+                                     limit=None, marker=None,
+                                     page_reverse=False):
+        return self.driver.get_port_assocs(context, bgpvpn_id, filters,
+                                           fields, sorts, limit, marker,
+                                           page_reverse)
+
+    def get_bgpvpn_port_associations_count(self, context, bgpvpn_id,
+                                           filters=None):
+        return self.driver.get_port_assocs_count(context, bgpvpn_id, filters)
 
     def update_bgpvpn_port_association(self, context, assoc_id, bgpvpn_id,
                                        port_association):
@@ -13,7 +13,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-from sqlalchemy import orm
+import atexit
+import collections
+import threading
+import time
+
 from sqlalchemy import sql
 
 from neutron.db.models import l3
@@ -25,8 +29,10 @@ from neutron_lib.callbacks import events
 from neutron_lib.callbacks import registry
 from neutron_lib.callbacks import resources
 from neutron_lib import constants as const
+from neutron_lib import context as n_context
 from neutron_lib.db import api as db_api
 
+from oslo_config import cfg
 from oslo_log import helpers as log_helpers
 from oslo_log import log as logging
 
@@ -45,77 +51,101 @@ LOG = logging.getLogger(__name__)
 @db_api.CONTEXT_READER
 def get_network_info_for_port(context, port_id, network_id):
     """Get MAC, IP and Gateway IP addresses informations for a specific port"""
-    try:
-        net_info = (context.session.
-                    query(models_v2.Port.mac_address,
-                          models_v2.IPAllocation.ip_address,
-                          models_v2.Subnet.cidr,
-                          models_v2.Subnet.gateway_ip).
-                    join(models_v2.IPAllocation,
-                         models_v2.IPAllocation.port_id ==
-                         models_v2.Port.id).
-                    join(models_v2.Subnet,
-                         models_v2.IPAllocation.subnet_id ==
-                         models_v2.Subnet.id).
-                    filter(models_v2.Subnet.ip_version == 4).
-                    filter(models_v2.Port.id == port_id).one())
-
-        (mac_address, ip_address, cidr, gateway_ip) = net_info
-    except orm.exc.NoResultFound:
-        return
-
-    gateway_mac = (
-        context.session.
-        query(models_v2.Port.mac_address).
-        filter(
-            models_v2.Port.network_id == network_id,
-            (models_v2.Port.device_owner ==
-             const.DEVICE_OWNER_ROUTER_INTF)
-        ).
-        one_or_none()
-    )
+    return get_network_info_for_ports(context, [port_id]).get(port_id)
 
-    return {'mac_address': mac_address,
+
+@db_api.CONTEXT_READER
+def get_network_info_for_ports(context, port_ids, gateway_mac_getter=None):
+    """Get MAC, IP and Gateway IP addresses informations for several ports
+
+    Two queries are run whatever the number of ports, and the ports without
+    an IPv4 address are left out:
+
+    {<port_id>: {'mac_address': ..., 'ip_address': <address/prefix length>,
+                 'gateway_ip': ..., 'gateway_mac': ...}, ...}
+
+    The gateway MACs are retrieved with gateway_mac_getter, called like
+    get_gateway_macs, which is the default.
+    """
+    if not port_ids:
+        return {}
+    net_infos = {}
+    network_ids = set()
+    for (port_id, network_id, mac_address, ip_address, cidr,
+         gateway_ip) in (context.session.
+                         query(models_v2.Port.id,
+                               models_v2.Port.network_id,
+                               models_v2.Port.mac_address,
+                               models_v2.IPAllocation.ip_address,
+                               models_v2.Subnet.cidr,
+                               models_v2.Subnet.gateway_ip).
+                         join(models_v2.IPAllocation,
+                              models_v2.IPAllocation.port_id ==
+                              models_v2.Port.id).
+                         join(models_v2.Subnet,
+                              models_v2.IPAllocation.subnet_id ==
+                              models_v2.Subnet.id).
+                         filter(models_v2.Subnet.ip_version == 4).
+                         filter(models_v2.Port.id.in_(port_ids))):
+        if port_id in net_infos:
+            LOG.warning("Port %s has several IPv4 addresses, only %s is "
+                        "used", port_id, net_infos[port_id]['ip_address'])
+            continue
+        network_ids.add(network_id)
+        net_infos[port_id] = {
+            'network_id': network_id,
+            'mac_address': mac_address,
             'ip_address': ip_address + cidr[cidr.index('/'):],
-            'gateway_ip': gateway_ip,
-            'gateway_mac': gateway_mac[0] if gateway_mac else None}
+            'gateway_ip': gateway_ip}
+
+    gateway_macs = (gateway_mac_getter or get_gateway_macs)(
+        context, list(network_ids))
+    for net_info in net_infos.values():
+        net_info['gateway_mac'] = gateway_macs.get(
+            net_info.pop('network_id'))
+    return net_infos
 
 
-@db_api.CONTEXT_READER
 def get_gateway_mac(context, network_id):
-    gateway_mac = (
+    return get_gateway_macs(context, [network_id]).get(network_id)
+
+
+@db_api.CONTEXT_READER
+def get_gateway_macs(context, network_ids):
+    """Map the given networks to the MAC of their router interface"""
+    if not network_ids:
+        return {}
+    return dict(
         context.session.
-        query(models_v2.Port.mac_address).
+        query(models_v2.Port.network_id, models_v2.Port.mac_address).
         filter(
-            models_v2.Port.network_id == network_id,
+            models_v2.Port.network_id.in_(network_ids),
             (models_v2.Port.device_owner ==
              const.DEVICE_OWNER_ROUTER_INTF)
-        ).
-        one_or_none()
+        )
     )
 
-    return gateway_mac[0] if gateway_mac else None
-
 
 @db_api.CONTEXT_READER
-def get_network_ports(context, network_id):
-    # NOTE(tmorin): currents callers don't look at detailed results
-    # but only test if at least one result exist => can be optimized
-    # by returning a count, rather than all port information
-    return (context.session.query(models_v2.Port).
-            filter(models_v2.Port.network_id == network_id,
-                   models_v2.Port.admin_state_up == sql.true()).all())
+def network_has_ports(context, network_id):
+    """Whether the network has at least one port administratively up"""
+    return context.session.query(
+        context.session.query(models_v2.Port.id).
+        filter(models_v2.Port.network_id == network_id,
+               models_v2.Port.admin_state_up == sql.true()).
+        exists()).scalar()
 
 
 @db_api.CONTEXT_READER
-def get_router_ports(context, router_id):
-    return (
-        context.session.query(models_v2.Port).
-        filter(
-            models_v2.Port.device_id == router_id,
-            models_v2.Port.device_owner == const.DEVICE_OWNER_ROUTER_INTF
-        ).all()
-    )
+def get_networks_with_ports(context, network_ids):
+    """The subset of the given networks having ports administratively up"""
+    if not network_ids:
+        return set()
+    return {network_id for network_id, in
+            context.session.query(models_v2.Port.network_id).
+            filter(models_v2.Port.network_id.in_(network_ids),
+                   models_v2.Port.admin_state_up == sql.true()).
+            distinct()}
 
 
 @db_api.CONTEXT_READER
@@ -153,12 +183,25 @@ def get_bgpvpns_of_router_assocs_by_network(context, net_id):
 
 
 @db_api.CONTEXT_READER
+def get_networks_for_routers(context, router_ids):
+    """Map each of the given routers to the set of networks it is plugged in
+    """
+    networks = {router_id: set() for router_id in router_ids}
+    if not networks:
+        return networks
+    for router_id, network_id in (
+            context.session.
+            query(models_v2.Port.device_id, models_v2.Port.network_id).
+            filter(
+                models_v2.Port.device_id.in_(networks),
+                models_v2.Port.device_owner == const.DEVICE_OWNER_ROUTER_INTF
+            )):
+        networks[router_id].add(network_id)
+    return networks
+
+
 def get_networks_for_router(context, router_id):
-    ports = get_router_ports(context, router_id)
-    if ports:
-        return {port['network_id'] for port in ports}
-    else:
-        return []
+    return get_networks_for_routers(context, [router_id])[router_id]
 
 
 def _log_callback_processing_exception(resource, event, trigger, kwargs, e):
@@ -172,6 +215,191 @@ def _log_callback_processing_exception(resource, event, trigger, kwargs, e):
                    'exc': e})
 
 
+class GatewayMacCache(object):
+    """Cache the MAC address of the router interface of networks
+
+    The MAC of a network, or its absence, is cached until a router
+    interface is added to or removed from the network. As only the worker
+    processing the router interface event knows about it, the entries also
+    expire after 'ttl' seconds.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.invalidations = 0
+        # network id -> (gateway MAC or None, expiry time)
+        self._macs = {}
+        self._next_purge = 0
+        self._lock = threading.Lock()
+
+    def get(self, context, network_ids):
+        """Map the given networks to the MAC of their router interface
+
+        Like get_gateway_macs, with a query for the networks not cached
+        only.
+        """
+        now = time.monotonic()
+        macs = {}
+        missing = []
+        with self._lock:
+            for network_id in network_ids:
+                entry = self._macs.get(network_id)
+                if entry is not None and entry[1] > now:
+                    macs[network_id] = entry[0]
+                    continue
+                if entry is not None:
+                    self.expirations += 1
+                missing.append(network_id)
+            self.hits += len(macs)
+            self.misses += len(missing)
+            invalidations = self.invalidations
+        if not missing:
+            return macs
+
+        fetched = get_gateway_macs(context, missing)
+        with self._lock:
+            # not cached if a router interface changed in the meantime
+            if invalidations == self.invalidations:
+                if now >= self._next_purge:
+                    self._purge(now)
+                for network_id in missing:
+                    self._macs[network_id] = (fetched.get(network_id),
+                                              now + self.ttl)
+        for network_id in missing:
+            macs[network_id] = fetched.get(network_id)
+        return macs
+
+    def _purge(self, now):
+        self._macs = {network_id: entry
+                      for network_id, entry in self._macs.items()
+                      if entry[1] > now}
+        self._next_purge = now + self.ttl
+
+    def invalidate(self, network_id):
+        with self._lock:
+            self._macs.pop(network_id, None)
+            self.invalidations += 1
+        LOG.debug("gateway MAC of network %(network_id)s invalidated, "
+                  "%(stats)s", {'network_id': network_id,
+                                'stats': self.stats})
+
+    @property
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'size': len(self._macs),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations}
+
+
+class PortEventBatcher(object):
+    """Gather the port attachments and detachments of each host
+
+    The first event queued for a host starts the interval, at the end of
+    which, or as soon as 'size' ports are queued for the host, 'detach' then
+    'attach' are called once each, with the ports queued for the host. As
+    the ports can belong to different projects, they are given an admin
+    context.
+
+    The events of a port are merged: a port attached then detached within
+    the interval is only detached, while a port detached then attached is
+    detached before being attached again.
+    """
+
+    ATTACH = 'attach'
+    DETACH = 'detach'
+
+    def __init__(self, attach, detach, interval, size):
+        self._attach = attach
+        self._detach = detach
+        self.interval = interval
+        self.size = size
+        self.batches = 0
+        self.attached = 0
+        self.detached = 0
+        self.merged = 0
+        # host -> {port id: [(event, port), ...]}, in the order the ports
+        # were queued
+        self._pending = {}
+        self._timers = {}
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def attach(self, host, port):
+        self._add(host, port, self.ATTACH)
+
+    def detach(self, host, port):
+        self._add(host, port, self.DETACH)
+
+    def _add(self, host, port, event):
+        with self._lock:
+            ports = self._pending.setdefault(host, collections.OrderedDict())
+            events = ports.setdefault(port['id'], [])
+            if events and events[-1][0] == self.ATTACH:
+                # superseded, the port was not attached yet
+                events.pop()
+                self.merged += 1
+            if event == self.ATTACH or not events:
+                events.append((event, port))
+            else:
+                self.merged += 1
+            full = len(ports) >= self.size
+            if not full and host not in self._timers:
+                timer = threading.Timer(self.interval, self.flush, (host, ))
+                timer.daemon = True
+                self._timers[host] = timer
+                timer.start()
+        if full:
+            self.flush(host)
+
+    def flush(self, host=None):
+        """Send the events queued for a host, or for all hosts"""
+        with self._lock:
+            hosts = list(self._pending) if host is None else [host]
+            batches = []
+            for host in hosts:
+                timer = self._timers.pop(host, None)
+                if timer is not None:
+                    timer.cancel()
+                ports = self._pending.pop(host, None)
+                if ports:
+                    batches.append((host, ports))
+        for host, ports in batches:
+            to_detach = [events[0][1] for events in ports.values()
+                         if events[0][0] == self.DETACH]
+            to_attach = [events[-1][1] for events in ports.values()
+                         if events[-1][0] == self.ATTACH]
+            context = n_context.get_admin_context()
+            try:
+                if to_detach:
+                    self._detach(context, to_detach, host)
+                    self.detached += len(to_detach)
+                if to_attach:
+                    self._attach(context, to_attach, host)
+                    self.attached += len(to_attach)
+                self.batches += 1
+            except Exception:
+                LOG.exception("Error sending the port events of host %s",
+                              host)
+            LOG.debug("sent %(count)d port events of host %(host)s, "
+                      "%(stats)s", {'count': len(to_detach) + len(to_attach),
+                                    'host': host, 'stats': self.stats})
+
+    @property
+    def stats(self):
+        return {'pending': sum(len(ports)
+                               for ports in self._pending.values()),
+                'batches': self.batches,
+                'attached': self.attached,
+                'detached': self.detached,
+                'merged': self.merged}
+
+
 @registry.has_registry_receivers
 class BaGPipeBGPVPNDriver(v2.BaGPipeBGPVPNDriver):
 
@@ -181,6 +409,45 @@ class BaGPipeBGPVPNDriver(v2.BaGPipeBGPVPNDriver):
         super(BaGPipeBGPVPNDriver, self).__init__(service_plugin)
 
         self.agent_rpc = rpc_client.BGPVPNAgentNotifyApi()
+        self._port_event_batcher = None
+        self._gateway_mac_cache = None
+
+    @property
+    def port_event_batcher(self):
+        """The PortEventBatcher of the port events, None if not delayed
+
+        See the bgpvpn/port_batch_interval and bgpvpn/port_batch_size
+        configuration options.
+        """
+        if (self._port_event_batcher is None and
+                cfg.CONF.bgpvpn.port_batch_interval):
+            self._port_event_batcher = PortEventBatcher(
+                self._attach_ports, self._detach_ports,
+                cfg.CONF.bgpvpn.port_batch_interval,
+                cfg.CONF.bgpvpn.port_batch_size)
+        return self._port_event_batcher
+
+    @property
+    def gateway_mac_cache(self):
+        """The GatewayMacCache of the driver, None if not caching
+
+        See the bgpvpn/gateway_mac_cache_ttl configuration option.
+        """
+        if (self._gateway_mac_cache is None and
+                cfg.CONF.bgpvpn.gateway_mac_cache_ttl):
+            self._gateway_mac_cache = GatewayMacCache(
+                cfg.CONF.bgpvpn.gateway_mac_cache_ttl)
+        return self._gateway_mac_cache
+
+    def _get_gateway_macs(self, context, network_ids):
+        cache = self.gateway_mac_cache
+        if cache is None:
+            return get_gateway_macs(context, network_ids)
+        return cache.get(context, network_ids)
+
+    def _invalidate_gateway_mac(self, network_id):
+        if self._gateway_mac_cache is not None:
+            self._gateway_mac_cache.invalidate(network_id)
 
     def _format_bgpvpn(self, context, bgpvpn, network_id):
         """JSON-format BGPVPN
@@ -189,13 +456,48 @@ class BaGPipeBGPVPNDriver(v2.BaGPipeBGPVPNDriver):
         """
         formatted_bgpvpn = {'id': bgpvpn['id'],
                             'network_id': network_id,
-                            'gateway_mac': get_gateway_mac(context,
-                                                           network_id)}
+                            'gateway_mac': self._get_gateway_macs(
+                                context, [network_id]).get(network_id)}
         formatted_bgpvpn.update(
             self._format_bgpvpn_network_route_targets([bgpvpn]))
 
         return formatted_bgpvpn
 
+    def _format_bgpvpn_for_networks(self, context, bgpvpn, network_ids):
+        """JSON-format BGPVPN for each of the networks
+
+        Like _format_bgpvpn, with the gateway MACs of all the networks
+        retrieved at once.
+        """
+        gateway_macs = self._get_gateway_macs(context, network_ids)
+        route_targets = self._format_bgpvpn_network_route_targets([bgpvpn])
+        formatted_bgpvpns = []
+        for network_id in network_ids:
+            formatted_bgpvpn = {'id': bgpvpn['id'],
+                                'network_id': network_id,
+                                'gateway_mac': gateway_macs.get(network_id)}
+            formatted_bgpvpn.update(route_targets)
+            formatted_bgpvpns.append(formatted_bgpvpn)
+        return formatted_bgpvpns
+
+    def _notify_bgpvpn_for_networks(self, context, method, bgpvpn,
+                                    network_ids):
+        """Notify the agents of BGPVPN for the networks having ports
+
+        'method' is the name of the agent RPC method, update_bgpvpn or
+        delete_bgpvpn. All the messages are built before being sent.
+        """
+        with_ports = get_networks_with_ports(context, network_ids)
+        network_ids = [net_id for net_id in network_ids
+                       if net_id in with_ports]
+        if not network_ids:
+            return
+        formatted_bgpvpns = self._format_bgpvpn_for_networks(
+            context, bgpvpn, network_ids)
+        notify = getattr(self.agent_rpc, method)
+        for formatted_bgpvpn in formatted_bgpvpns:
+            notify(context, formatted_bgpvpn)
+
     def _format_bgpvpn_network_route_targets(self, bgpvpns):
         """Format BGPVPN network informations (VPN type and route targets)
 
@@ -264,22 +566,23 @@ class BaGPipeBGPVPNDriver(v2.BaGPipeBGPVPNDriver):
         return bgpvpn_rts
 
     def _bgpvpns_for_network(self, context, network_id):
-        return (
-            self.bgpvpn_db.get_bgpvpns(
-                context,
-                filters={
-                    'networks': [network_id],
-                },
-            ) or self.retrieve_bgpvpns_of_router_assocs_by_network(context,
-                                                                   network_id)
-        )
+        return self._bgpvpns_for_networks(context, [network_id])[network_id]
+
+    def _bgpvpns_for_networks(self, context, network_ids):
+        bgpvpns_by_network = self.bgpvpn_db.get_bgpvpns_for_networks(
+            context, network_ids)
+        # the BGPVPNs of the routers of a network are only used if no
+        # BGPVPN is associated to the network itself
+        return {network_id: ([bgpvpn for bgpvpn in bgpvpns
+                              if not bgpvpn['via_router']] or bgpvpns)
+                for network_id, bgpvpns in bgpvpns_by_network.items()}
 
     def _networks_for_bgpvpn(self, context, bgpvpn):
-        networks = []
-        networks.extend(bgpvpn['networks'])
-        for router_id in bgpvpn['routers']:
-            networks.extend(get_networks_for_router(context, router_id))
-        return list(set(networks))
+        networks = set(bgpvpn['networks'])
+        for router_networks in get_networks_for_routers(
+                context, bgpvpn['routers']).values():
+            networks.update(router_networks)
+        return list(networks)
 
     def _retrieve_bgpvpn_network_info_for_port(self, context, port):
         """Retrieve BGP VPN network informations for a specific port
@@ -296,12 +599,17 @@ class BaGPipeBGPVPNDriver(v2.BaGPipeBGPVPNDriver):
             }
         }
         """
-        port_id = port['id']
-        network_id = port['network_id']
+        return self._retrieve_bgpvpn_network_info_for_ports(
+            context, [port]).get(port['id'])
 
-        bgpvpn_network_info = {}
+    def _retrieve_bgpvpn_network_info_for_ports(self, context, ports):
+        """Retrieve BGP VPN network informations for several ports
 
-        bgpvpns = self._bgpvpns_for_network(context, network_id)
+        Like _retrieve_bgpvpn_network_info_for_port, with a few queries
+        whatever the number of ports: {<port_id>: <informations>, ...}
+        """
+        bgpvpns_by_network = self._bgpvpns_for_networks(
+            context, list({port['network_id'] for port in ports}))
 
         # NOTE(tmorin): We currently need to send 'network_id', 'mac_address',
         #   'ip_address', 'gateway_ip' to the agent, even in the absence of
@@ -310,37 +618,45 @@ class BaGPipeBGPVPNDriver(v2.BaGPipeBGPVPNDriver):
         #   to retrieve this info by itself, we'll change this method
         #   to return {} if there is no bound bgpvpn.
 
-        bgpvpn_rts = self._format_bgpvpn_network_route_targets(bgpvpns)
+        LOG.debug("Getting ports %s network details",
+                  [port['id'] for port in ports])
+        network_infos = get_network_info_for_ports(
+            context, [port['id'] for port in ports],
+            gateway_mac_getter=self._get_gateway_macs)
 
-        LOG.debug("Port connected on BGPVPN network %s with route targets "
-                  "%s" % (network_id, bgpvpn_rts))
+        bgpvpn_network_infos = {}
+        for port in ports:
+            network_id = port['network_id']
+            network_info = network_infos.get(port['id'])
+            if not network_info:
+                LOG.warning("No network information for net %s", network_id)
+                continue
 
-        bgpvpn_network_info.update(bgpvpn_rts)
+            bgpvpn_rts = self._format_bgpvpn_network_route_targets(
+                bgpvpns_by_network[network_id])
 
-        LOG.debug("Getting port %s network details" % port_id)
-        network_info = get_network_info_for_port(context, port_id, network_id)
+            LOG.debug("Port connected on BGPVPN network %s with route "
+                      "targets %s" % (network_id, bgpvpn_rts))
 
-        if not network_info:
-            LOG.warning("No network information for net %s", network_id)
-            return
-
-        bgpvpn_network_info.update(network_info)
+            bgpvpn_network_info = dict(bgpvpn_rts)
+            bgpvpn_network_info.update(network_info)
+            bgpvpn_network_infos[port['id']] = bgpvpn_network_info
 
-        return bgpvpn_network_info
+        return bgpvpn_network_infos
 
     @db_api.CONTEXT_READER
     def retrieve_bgpvpns_of_router_assocs_by_network(self, context,
                                                      network_id):
-        return [self.bgpvpn_db._make_bgpvpn_dict(context, bgpvpn) for bgpvpn in
+        extensions = utils.get_supported_extensions()
+        return [self.bgpvpn_db._make_bgpvpn_dict(context, bgpvpn,
+                                                 extensions=extensions)
+                for bgpvpn in
                 get_bgpvpns_of_router_assocs_by_network(context, network_id)]
 
     def delete_bgpvpn_postcommit(self, context, bgpvpn):
-        for net_id in self._networks_for_bgpvpn(context, bgpvpn):
-            if get_network_ports(context, net_id):
-                # Format BGPVPN before sending notification
-                self.agent_rpc.delete_bgpvpn(
-                    context,
-                    self._format_bgpvpn(context, bgpvpn, net_id))
+        self._notify_bgpvpn_for_networks(
+            context, 'delete_bgpvpn', bgpvpn,
+            self._networks_for_bgpvpn(context, bgpvpn))
 
     def update_bgpvpn_postcommit(self, context, old_bgpvpn, bgpvpn):
         super(BaGPipeBGPVPNDriver, self).update_bgpvpn_postcommit(
@@ -351,12 +667,12 @@ class BaGPipeBGPVPNDriver(v2.BaGPipeBGPVPNDriver):
         ATTRIBUTES_TO_IGNORE = set('name')
         moving_keys = added_keys | removed_keys | changed_keys
         if len(moving_keys ^ ATTRIBUTES_TO_IGNORE):
-            for net_id in self._networks_for_bgpvpn(context, bgpvpn):
-                if (get_network_ports(context, net_id)):
-                    self._update_bgpvpn_for_network(context, net_id, bgpvpn)
+            self._notify_bgpvpn_for_networks(
+                context, 'update_bgpvpn', bgpvpn,
+                self._networks_for_bgpvpn(context, bgpvpn))
 
     def _update_bgpvpn_for_net_with_id(self, context, network_id, bgpvpn_id):
-        if get_network_ports(context, network_id):
+        if network_has_ports(context, network_id):
             bgpvpn = self.get_bgpvpn(context, bgpvpn_id)
             self._update_bgpvpn_for_network(context, network_id, bgpvpn)
 
@@ -373,7 +689,7 @@ class BaGPipeBGPVPNDriver(v2.BaGPipeBGPVPNDriver):
                                             net_assoc['bgpvpn_id'])
 
     def delete_net_assoc_postcommit(self, context, net_assoc):
-        if get_network_ports(context, net_assoc['network_id']):
+        if network_has_ports(context, net_assoc['network_id']):
             bgpvpn = self.get_bgpvpn(context, net_assoc['bgpvpn_id'])
             formated_bgpvpn = self._format_bgpvpn(context, bgpvpn,
                                                   net_assoc['network_id'])
@@ -411,29 +727,16 @@ class BaGPipeBGPVPNDriver(v2.BaGPipeBGPVPNDriver):
                 original_port['status'] != const.PORT_STATUS_ACTIVE):
             LOG.debug("notify_port_updated, port became ACTIVE")
 
-            bgpvpn_network_info = (
-                self._retrieve_bgpvpn_network_info_for_port(context, port)
-            )
-
-            if bgpvpn_network_info:
-                port_bgpvpn_info.update(bgpvpn_network_info)
-
-                self.agent_rpc.attach_port_on_bgpvpn(context,
-                                                     port_bgpvpn_info,
-                                                     agent_host)
+            batcher = self.port_event_batcher
+            if batcher is None:
+                self._attach_ports(context, [port], agent_host)
             else:
-                # currently not reached, because we need
-                # _retrieve_bgpvpn_network_info_for_port to always
-                # return network information, even in the absence
-                # of any BGPVPN port bound.
-                pass
+                batcher.attach(agent_host, port)
 
         elif (port['status'] == const.PORT_STATUS_DOWN and
               original_port['status'] != const.PORT_STATUS_DOWN):
             LOG.debug("notify_port_updated, port became DOWN")
-            self.agent_rpc.detach_port_from_bgpvpn(context,
-                                                   port_bgpvpn_info,
-                                                   agent_host)
+            self._notify_port_detached(context, port_bgpvpn_info, agent_host)
         else:
             LOG.debug("new port status is %s, origin status was %s,"
                       " => no action", port['status'], original_port['status'])
@@ -446,28 +749,64 @@ class BaGPipeBGPVPNDriver(v2.BaGPipeBGPVPNDriver):
         if self._ignore_port(context, port):
             return
 
-        self.agent_rpc.detach_port_from_bgpvpn(context,
-                                               port_bgpvpn_info,
-                                               port[portbindings.HOST_ID])
+        self._notify_port_detached(context, port_bgpvpn_info,
+                                   port[portbindings.HOST_ID])
+
+    def _notify_port_detached(self, context, port_bgpvpn_info, agent_host):
+        batcher = self.port_event_batcher
+        if batcher is None:
+            self._detach_ports(context, [port_bgpvpn_info], agent_host)
+        else:
+            batcher.detach(agent_host, port_bgpvpn_info)
+
+    def _attach_ports(self, context, ports, agent_host):
+        """Attach the ports of a host to their BGPVPNs"""
+        bgpvpn_network_infos = self._retrieve_bgpvpn_network_info_for_ports(
+            context, ports)
+        for port in ports:
+            bgpvpn_network_info = bgpvpn_network_infos.get(port['id'])
+            if bgpvpn_network_info:
+                port_bgpvpn_info = {'id': port['id'],
+                                    'network_id': port['network_id']}
+                port_bgpvpn_info.update(bgpvpn_network_info)
+
+                self.agent_rpc.attach_port_on_bgpvpn(context,
+                                                     port_bgpvpn_info,
+                                                     agent_host)
+            else:
+                # currently not reached, because we need
+                # _retrieve_bgpvpn_network_info_for_ports to always
+                # return network information, even in the absence
+                # of any BGPVPN port bound.
+                pass
+
+    def _detach_ports(self, context, ports_bgpvpn_info, agent_host):
+        """Detach the ports of a host from their BGPVPNs"""
+        for port_bgpvpn_info in ports_bgpvpn_info:
+            self.agent_rpc.detach_port_from_bgpvpn(context,
+                                                   port_bgpvpn_info,
+                                                   agent_host)
 
     def create_router_assoc_postcommit(self, context, router_assoc):
         super(BaGPipeBGPVPNDriver, self).create_router_assoc_postcommit(
             context, router_assoc)
-        for net_id in get_networks_for_router(context,
-                                              router_assoc['router_id']):
-            self._update_bgpvpn_for_net_with_id(context,
-                                                net_id,
-                                                router_assoc['bgpvpn_id'])
+        self._notify_router_assoc(context, 'update_bgpvpn', router_assoc)
 
     def delete_router_assoc_postcommit(self, context, router_assoc):
-        for net_id in get_networks_for_router(context,
-                                              router_assoc['router_id']):
-            net_assoc = {'network_id': net_id,
-                         'bgpvpn_id': router_assoc['bgpvpn_id']}
-            self.delete_net_assoc_postcommit(context, net_assoc)
+        self._notify_router_assoc(context, 'delete_bgpvpn', router_assoc)
+
+    def _notify_router_assoc(self, context, method, router_assoc):
+        network_ids = get_networks_for_router(context,
+                                              router_assoc['router_id'])
+        if network_ids:
+            self._notify_bgpvpn_for_networks(
+                context, method,
+                self.get_bgpvpn(context, router_assoc['bgpvpn_id']),
+                list(network_ids))
 
     @log_helpers.log_method_call
     def notify_router_interface_created(self, context, router_id, net_id):
+        self._invalidate_gateway_mac(net_id)
         super(BaGPipeBGPVPNDriver, self).notify_router_interface_created(
             context, router_id, net_id)
 
@@ -489,6 +828,7 @@ class BaGPipeBGPVPNDriver(v2.BaGPipeBGPVPNDriver):
 
     @log_helpers.log_method_call
     def notify_router_interface_deleted(self, context, router_id, net_id):
+        self._invalidate_gateway_mac(net_id)
         super(BaGPipeBGPVPNDriver, self).notify_router_interface_deleted(
             context, router_id, net_id)
 
@@ -13,6 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import atexit
+import collections
+import threading
+
 from sqlalchemy import orm
 
 from neutron.api.rpc.callbacks import events as rpc_events
@@ -30,6 +34,7 @@ from neutron_lib.plugins import directory
 
 from networking_bagpipe.objects import bgpvpn as bgpvpn_objects
 
+from oslo_config import cfg
 from oslo_log import helpers as log_helpers
 from oslo_log import log as logging
 
@@ -70,6 +75,88 @@ def _log_callback_processing_exception(resource, event, trigger, metadata, e):
                    'exc': e})
 
 
+class PushCoalescer(object):
+    """Merge the pushes of an association made within a short interval
+
+    The first event queued starts the interval, at the end of which the
+    pending associations are pushed, grouped by event type. An association
+    queued again in the meantime is pushed once, in its latest state, with
+    the event type summing its events up: an association created then
+    updated is pushed as created, one updated then deleted as deleted, and
+    one created then deleted is not pushed at all.
+    """
+
+    def __init__(self, push, interval):
+        self._push = push
+        self.interval = interval
+        self.merged = 0
+        self.dropped = 0
+        self.pushed = 0
+        # (object type, id) -> (context, association, event type), in the
+        # order the associations were first queued
+        self._pending = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._timer = None
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _merge(previous_event_type, event_type):
+        if previous_event_type == rpc_events.CREATED:
+            if event_type == rpc_events.DELETED:
+                return None
+            return rpc_events.CREATED
+        return event_type
+
+    def add(self, context, associations, event_type):
+        with self._lock:
+            for assoc in associations:
+                key = (assoc.obj_name(), assoc.id)
+                previous = self._pending.get(key)
+                if previous is None:
+                    self._pending[key] = (context, assoc, event_type)
+                    continue
+                self.merged += 1
+                merged_event_type = self._merge(previous[2], event_type)
+                if merged_event_type is None:
+                    del self._pending[key]
+                    self.dropped += 1
+                    continue
+                self._pending[key] = (context, assoc, merged_event_type)
+            if self._pending and self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pending, self._pending = (list(self._pending.values()),
+                                      collections.OrderedDict())
+        by_event_type = collections.OrderedDict()
+        for context, assoc, event_type in pending:
+            by_event_type.setdefault(event_type, (context, []))[1].append(
+                assoc)
+        for event_type, (context, associations) in by_event_type.items():
+            try:
+                self._push(context, associations, event_type)
+                self.pushed += len(associations)
+            except Exception:
+                LOG.exception("Error pushing %s associations", event_type)
+        if pending:
+            LOG.debug("pushed %(count)d coalesced associations, "
+                      "%(stats)s", {'count': len(pending),
+                                    'stats': self.stats})
+
+    @property
+    def stats(self):
+        return {'pending': len(self._pending),
+                'merged': self.merged,
+                'dropped': self.dropped,
+                'pushed': self.pushed}
+
+
 @registry.has_registry_receivers
 class BaGPipeBGPVPNDriver(driver_api.BGPVPNDriverRC):
 
@@ -82,6 +169,19 @@ class BaGPipeBGPVPNDriver(driver_api.BGPVPNDriverRC):
         super(BaGPipeBGPVPNDriver, self).__init__(service_plugin)
 
         self._push_rpc = resources_rpc.ResourcesPushRpcApi()
+        self._push_coalescer = None
+
+    @property
+    def push_coalescer(self):
+        """The PushCoalescer of the pushes, None if they are not delayed
+
+        See the bgpvpn/push_coalescing_interval configuration option.
+        """
+        if (self._push_coalescer is None and
+                cfg.CONF.bgpvpn.push_coalescing_interval):
+            self._push_coalescer = PushCoalescer(
+                self._push_rpc.push, cfg.CONF.bgpvpn.push_coalescing_interval)
+        return self._push_coalescer
 
     def _push_association(self, context, association, event_type):
         self._push_associations(context, [association], event_type)
@@ -91,7 +191,11 @@ class BaGPipeBGPVPNDriver(driver_api.BGPVPNDriverRC):
             return
         for assoc in associations:
             LOG.debug("pushing %s %s (%s)", event_type, assoc, assoc.bgpvpn)
-        self._push_rpc.push(context, associations, event_type)
+        coalescer = self.push_coalescer
+        if coalescer is None:
+            self._push_rpc.push(context, associations, event_type)
+        else:
+            coalescer.add(context, associations, event_type)
 
     def _common_precommit_checks(self, bgpvpn):
         # No support yet for specifying route distinguishers
@@ -141,6 +245,15 @@ class BaGPipeBGPVPNDriver(driver_api.BGPVPNDriverRC):
                 id=net_assoc['id']),
             rpc_events.CREATED)
 
+    def create_net_assocs_postcommit(self, context, net_assocs):
+        # a single push for the whole batch
+        self._push_associations(
+            context,
+            bgpvpn_objects.BGPVPNNetAssociation.get_objects(
+                context,
+                id=[net_assoc['id'] for net_assoc in net_assocs]),
+            rpc_events.CREATED)
+
     def delete_net_assoc_precommit(self, context, net_assoc):
         self._push_association(
             context,
@@ -157,8 +270,23 @@ class BaGPipeBGPVPNDriver(driver_api.BGPVPNDriverRC):
                 id=port_assoc['id']),
             rpc_events.CREATED)
 
+    def create_port_assocs_postcommit(self, context, port_assocs):
+        self._push_associations(
+            context,
+            bgpvpn_objects.BGPVPNPortAssociation.get_objects(
+                context,
+                id=[port_assoc['id'] for port_assoc in port_assocs]),
+            rpc_events.CREATED)
+
     def update_port_assoc_postcommit(self, context,
-                                     old_port_assoc, port_assoc):
+                                     old_port_assoc, port_assoc,
+                                     routes_delta=None):
+        # nothing to push to the agents if neither the routes nor the
+        # advertisement of the fixed IPs changed
+        if (routes_delta is not None and not any(routes_delta) and
+                old_port_assoc['advertise_fixed_ips'] ==
+                port_assoc['advertise_fixed_ips']):
+            return
         self._push_association(
             context,
             bgpvpn_objects.BGPVPNPortAssociation.get_object(
@@ -182,6 +310,14 @@ class BaGPipeBGPVPNDriver(driver_api.BGPVPNDriverRC):
                 id=router_assoc['id']),
             rpc_events.CREATED)
 
+    def create_router_assocs_postcommit(self, context, router_assocs):
+        self._push_associations(
+            context,
+            bgpvpn_objects.BGPVPNRouterAssociation.get_objects(
+                context,
+                id=[router_assoc['id'] for router_assoc in router_assocs]),
+            rpc_events.CREATED)
+
     def delete_router_assoc_precommit(self, context, router_assoc):
         self._push_association(
             context,
@@ -17,10 +17,12 @@ import abc
 import copy
 
 from neutron_lib.db import api as db_api
+from oslo_config import cfg
 
 from networking_bgpvpn.neutron.db import bgpvpn_db
 from networking_bgpvpn.neutron.extensions \
     import bgpvpn_routes_control as bgpvpn_rc
+from networking_bgpvpn.neutron.services.service_drivers import postcommit
 
 
 class BGPVPNDriverBase(metaclass=abc.ABCMeta):
@@ -43,7 +45,8 @@ class BGPVPNDriverBase(metaclass=abc.ABCMeta):
         pass
 
     @abc.abstractmethod
-    def get_bgpvpns(self, context, filters=None, fields=None):
+    def get_bgpvpns(self, context, filters=None, fields=None, sorts=None,
+                    limit=None, marker=None, page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -67,7 +70,9 @@ class BGPVPNDriverBase(metaclass=abc.ABCMeta):
         pass
 
     @abc.abstractmethod
-    def get_net_assocs(self, context, bgpvpn_id, filters=None, fields=None):
+    def get_net_assocs(self, context, bgpvpn_id, filters=None, fields=None,
+                       sorts=None, limit=None, marker=None,
+                       page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -83,13 +88,57 @@ class BGPVPNDriverBase(metaclass=abc.ABCMeta):
         pass
 
     @abc.abstractmethod
-    def get_router_assocs(self, context, bgpvpn_id, filters=None, fields=None):
+    def get_router_assocs(self, context, bgpvpn_id, filters=None, fields=None,
+                          sorts=None, limit=None, marker=None,
+                          page_reverse=False):
         pass
 
     @abc.abstractmethod
     def delete_router_assoc(self, context, assoc_id, bgpvpn_id):
         pass
 
+    def create_bgpvpns(self, context, bgpvpns):
+        """Create several BGPVPNs
+
+        Drivers can override this to create them all at once, this default
+        implementation creates them one by one.
+        """
+        return [self.create_bgpvpn(context, bgpvpn) for bgpvpn in bgpvpns]
+
+    def create_net_assocs(self, context, bgpvpn_id, network_associations):
+        """Create several network associations of a BGPVPN
+
+        Drivers can override this to create them all at once, this default
+        implementation creates them one by one.
+        """
+        return [self.create_net_assoc(context, bgpvpn_id, net_assoc)
+                for net_assoc in network_associations]
+
+    def create_router_assocs(self, context, bgpvpn_id, router_associations):
+        """Create several router associations of a BGPVPN
+
+        Drivers can override this to create them all at once, this default
+        implementation creates them one by one.
+        """
+        return [self.create_router_assoc(context, bgpvpn_id, router_assoc)
+                for router_assoc in router_associations]
+
+    def get_bgpvpns_count(self, context, filters=None):
+        """Count the BGPVPNs matching filters
+
+        Drivers can override this to count them without retrieving them,
+        this default implementation retrieves their ids.
+        """
+        return len(self.get_bgpvpns(context, filters, fields=['id']))
+
+    def get_net_assocs_count(self, context, bgpvpn_id, filters=None):
+        return len(self.get_net_assocs(context, bgpvpn_id, filters,
+                                       fields=['id']))
+
+    def get_router_assocs_count(self, context, bgpvpn_id, filters=None):
+        return len(self.get_router_assocs(context, bgpvpn_id, filters,
+                                          fields=['id']))
+
 
 class BGPVPNDriverDBMixin(BGPVPNDriverBase, metaclass=abc.ABCMeta):
     """BGPVPNDriverDB Mixin to provision the database on behalf of the driver
@@ -101,17 +150,55 @@ class BGPVPNDriverDBMixin(BGPVPNDriverBase, metaclass=abc.ABCMeta):
     def __init__(self, *args, **kwargs):
         super(BGPVPNDriverDBMixin, self).__init__(*args, **kwargs)
         self.bgpvpn_db = bgpvpn_db.BGPVPNPluginDb()
+        self._postcommit_pool = None
+
+    @property
+    def postcommit_pool(self):
+        """The pool running the postcommit operations
+
+        None if they are run within the API requests, see the
+        bgpvpn/postcommit_workers configuration option.
+        """
+        if (self._postcommit_pool is None and
+                cfg.CONF.bgpvpn.postcommit_workers):
+            self._postcommit_pool = postcommit.PostcommitPool(
+                cfg.CONF.bgpvpn.postcommit_workers,
+                cfg.CONF.bgpvpn.postcommit_queue_size)
+        return self._postcommit_pool
+
+    def _postcommit(self, bgpvpn_id, method, context, *args, **kwargs):
+        pool = self.postcommit_pool
+        if pool is None:
+            method(context, *args, **kwargs)
+        else:
+            pool.submit(bgpvpn_id, method, context, *args, **kwargs)
 
     def create_bgpvpn(self, context, bgpvpn):
         with db_api.CONTEXT_WRITER.using(context):
             bgpvpn = self.bgpvpn_db.create_bgpvpn(
                 context, bgpvpn)
             self.create_bgpvpn_precommit(context, bgpvpn)
-        self.create_bgpvpn_postcommit(context, bgpvpn)
+        self._postcommit(bgpvpn['id'], self.create_bgpvpn_postcommit,
+                         context, bgpvpn)
         return bgpvpn
 
-    def get_bgpvpns(self, context, filters=None, fields=None):
-        return self.bgpvpn_db.get_bgpvpns(context, filters, fields)
+    def create_bgpvpns(self, context, bgpvpns):
+        with db_api.CONTEXT_WRITER.using(context):
+            bgpvpns = self.bgpvpn_db.create_bgpvpns(context, bgpvpns)
+            for bgpvpn in bgpvpns:
+                self.create_bgpvpn_precommit(context, bgpvpn)
+        for bgpvpn in bgpvpns:
+            self._postcommit(bgpvpn['id'], self.create_bgpvpn_postcommit,
+                             context, bgpvpn)
+        return bgpvpns
+
+    def get_bgpvpns(self, context, filters=None, fields=None, sorts=None,
+                    limit=None, marker=None, page_reverse=False):
+        return self.bgpvpn_db.get_bgpvpns(context, filters, fields, sorts,
+                                          limit, marker, page_reverse)
+
+    def get_bgpvpns_count(self, context, filters=None):
+        return self.bgpvpn_db.get_bgpvpns_count(context, filters)
 
     def get_bgpvpn(self, context, id, fields=None):
         return self.bgpvpn_db.get_bgpvpn(context, id, fields)
@@ -123,7 +210,8 @@ class BGPVPNDriverDBMixin(BGPVPNDriverBase, metaclass=abc.ABCMeta):
             new_bgpvpn.update(bgpvpn_delta)
             self.update_bgpvpn_precommit(context, old_bgpvpn, new_bgpvpn)
             bgpvpn = self.bgpvpn_db.update_bgpvpn(context, id, bgpvpn_delta)
-        self.update_bgpvpn_postcommit(context, old_bgpvpn, bgpvpn)
+        self._postcommit(id, self.update_bgpvpn_postcommit, context,
+                         old_bgpvpn, bgpvpn)
         return bgpvpn
 
     def delete_bgpvpn(self, context, id):
@@ -131,7 +219,7 @@ class BGPVPNDriverDBMixin(BGPVPNDriverBase, metaclass=abc.ABCMeta):
             bgpvpn = self.bgpvpn_db.get_bgpvpn(context, id)
             self.delete_bgpvpn_precommit(context, bgpvpn)
             self.bgpvpn_db.delete_bgpvpn(context, id)
-        self.delete_bgpvpn_postcommit(context, bgpvpn)
+        self._postcommit(id, self.delete_bgpvpn_postcommit, context, bgpvpn)
 
     def create_net_assoc(self, context, bgpvpn_id, network_association):
         with db_api.CONTEXT_WRITER.using(context):
@@ -139,16 +227,33 @@ class BGPVPNDriverDBMixin(BGPVPNDriverBase, metaclass=abc.ABCMeta):
                                                     bgpvpn_id,
                                                     network_association)
             self.create_net_assoc_precommit(context, assoc)
-        self.create_net_assoc_postcommit(context, assoc)
+        self._postcommit(bgpvpn_id, self.create_net_assoc_postcommit,
+                         context, assoc)
         return assoc
 
+    def create_net_assocs(self, context, bgpvpn_id, network_associations):
+        with db_api.CONTEXT_WRITER.using(context):
+            assocs = self.bgpvpn_db.create_net_assocs(context, bgpvpn_id,
+                                                      network_associations)
+            self.create_net_assocs_precommit(context, assocs)
+        self._postcommit(bgpvpn_id, self.create_net_assocs_postcommit,
+                         context, assocs)
+        return assocs
+
     def get_net_assoc(self, context, assoc_id, bgpvpn_id, fields=None):
         return self.bgpvpn_db.get_net_assoc(context, assoc_id, bgpvpn_id,
                                             fields)
 
-    def get_net_assocs(self, context, bgpvpn_id, filters=None, fields=None):
+    def get_net_assocs(self, context, bgpvpn_id, filters=None, fields=None,
+                       sorts=None, limit=None, marker=None,
+                       page_reverse=False):
         return self.bgpvpn_db.get_net_assocs(context, bgpvpn_id,
-                                             filters, fields)
+                                             filters, fields, sorts, limit,
+                                             marker, page_reverse)
+
+    def get_net_assocs_count(self, context, bgpvpn_id, filters=None):
+        return self.bgpvpn_db.get_net_assocs_count(context, bgpvpn_id,
+                                                   filters)
 
     def delete_net_assoc(self, context, assoc_id, bgpvpn_id):
         with db_api.CONTEXT_WRITER.using(context):
@@ -160,23 +265,41 @@ class BGPVPNDriverDBMixin(BGPVPNDriverBase, metaclass=abc.ABCMeta):
             self.bgpvpn_db.delete_net_assoc(context,
                                             assoc_id,
                                             bgpvpn_id)
-        self.delete_net_assoc_postcommit(context, net_assoc)
+        self._postcommit(bgpvpn_id, self.delete_net_assoc_postcommit,
+                         context, net_assoc)
 
     def create_router_assoc(self, context, bgpvpn_id, router_association):
         with db_api.CONTEXT_WRITER.using(context):
             assoc = self.bgpvpn_db.create_router_assoc(context, bgpvpn_id,
                                                        router_association)
             self.create_router_assoc_precommit(context, assoc)
-        self.create_router_assoc_postcommit(context, assoc)
+        self._postcommit(bgpvpn_id, self.create_router_assoc_postcommit,
+                         context, assoc)
         return assoc
 
+    def create_router_assocs(self, context, bgpvpn_id, router_associations):
+        with db_api.CONTEXT_WRITER.using(context):
+            assocs = self.bgpvpn_db.create_router_assocs(context, bgpvpn_id,
+                                                         router_associations)
+            self.create_router_assocs_precommit(context, assocs)
+        self._postcommit(bgpvpn_id, self.create_router_assocs_postcommit,
+                         context, assocs)
+        return assocs
+
     def get_router_assoc(self, context, assoc_id, bgpvpn_id, fields=None):
         return self.bgpvpn_db.get_router_assoc(context, assoc_id,
                                                bgpvpn_id, fields)
 
-    def get_router_assocs(self, context, bgpvpn_id, filters=None, fields=None):
+    def get_router_assocs(self, context, bgpvpn_id, filters=None, fields=None,
+                          sorts=None, limit=None, marker=None,
+                          page_reverse=False):
         return self.bgpvpn_db.get_router_assocs(context, bgpvpn_id,
-                                                filters, fields)
+                                                filters, fields, sorts, limit,
+                                                marker, page_reverse)
+
+    def get_router_assocs_count(self, context, bgpvpn_id, filters=None):
+        return self.bgpvpn_db.get_router_assocs_count(context, bgpvpn_id,
+                                                      filters)
 
     def delete_router_assoc(self, context, assoc_id, bgpvpn_id):
         with db_api.CONTEXT_WRITER.using(context):
@@ -188,7 +311,8 @@ class BGPVPNDriverDBMixin(BGPVPNDriverBase, metaclass=abc.ABCMeta):
                                                assoc_id,
                                                bgpvpn_id)
 
-        self.delete_router_assoc_postcommit(context, router_assoc)
+        self._postcommit(bgpvpn_id, self.delete_router_assoc_postcommit,
+                         context, router_assoc)
 
     @abc.abstractmethod
     def create_bgpvpn_postcommit(self, context, bgpvpn):
@@ -218,6 +342,19 @@ class BGPVPNDriverDBMixin(BGPVPNDriverBase, metaclass=abc.ABCMeta):
     def create_net_assoc_postcommit(self, context, net_assoc):
         pass
 
+    def create_net_assocs_precommit(self, context, net_assocs):
+        for net_assoc in net_assocs:
+            self.create_net_assoc_precommit(context, net_assoc)
+
+    def create_net_assocs_postcommit(self, context, net_assocs):
+        """Called once after several network associations were created
+
+        Drivers can override this to process the whole batch at once, by
+        default create_net_assoc_postcommit is called for each association.
+        """
+        for net_assoc in net_assocs:
+            self.create_net_assoc_postcommit(context, net_assoc)
+
     @abc.abstractmethod
     def delete_net_assoc_precommit(self, context, net_assoc):
         pass
@@ -234,6 +371,20 @@ class BGPVPNDriverDBMixin(BGPVPNDriverBase, metaclass=abc.ABCMeta):
     def create_router_assoc_postcommit(self, context, router_assoc):
         pass
 
+    def create_router_assocs_precommit(self, context, router_assocs):
+        for router_assoc in router_assocs:
+            self.create_router_assoc_precommit(context, router_assoc)
+
+    def create_router_assocs_postcommit(self, context, router_assocs):
+        """Called once after several router associations were created
+
+        Drivers can override this to process the whole batch at once, by
+        default create_router_assoc_postcommit is called for each
+        association.
+        """
+        for router_assoc in router_assocs:
+            self.create_router_assoc_postcommit(context, router_assoc)
+
     @abc.abstractmethod
     def delete_router_assoc_precommit(self, context, router_assoc):
         pass
@@ -315,7 +466,9 @@ class BGPVPNDriverRCBase(BGPVPNDriverBase, metaclass=abc.ABCMeta):
         pass
 
     @abc.abstractmethod
-    def get_port_assocs(self, context, bgpvpn_id, filters=None, fields=None):
+    def get_port_assocs(self, context, bgpvpn_id, filters=None, fields=None,
+                        sorts=None, limit=None, marker=None,
+                        page_reverse=False):
         pass
 
     @abc.abstractmethod
@@ -326,6 +479,15 @@ class BGPVPNDriverRCBase(BGPVPNDriverBase, metaclass=abc.ABCMeta):
     def delete_port_assoc(self, context, assoc_id, bgpvpn_id):
         pass
 
+    def create_port_assocs(self, context, bgpvpn_id, port_associations):
+        """Create several port associations of a BGPVPN
+
+        Drivers can override this to create them all at once, this default
+        implementation creates them one by one.
+        """
+        return [self.create_port_assoc(context, bgpvpn_id, port_assoc)
+                for port_assoc in port_associations]
+
 
 class BGPVPNDriverRCDBMixin(BGPVPNDriverRCBase, BGPVPNDriverDBMixin,
                             metaclass=abc.ABCMeta):
@@ -343,8 +505,8 @@ class BGPVPNDriverRCDBMixin(BGPVPNDriverRCBase, BGPVPNDriverDBMixin,
                                                               router_assoc)
             self.update_router_assoc_precommit(context,
                                                old_router_assoc, router_assoc)
-        self.update_router_assoc_postcommit(context,
-                                            old_router_assoc, router_assoc)
+        self._postcommit(bgpvpn_id, self.update_router_assoc_postcommit,
+                         context, old_router_assoc, router_assoc)
         return router_assoc
 
     @abc.abstractmethod
@@ -362,9 +524,19 @@ class BGPVPNDriverRCDBMixin(BGPVPNDriverRCBase, BGPVPNDriverDBMixin,
             port_assoc = self.bgpvpn_db.create_port_assoc(context, bgpvpn_id,
                                                           port_association)
             self.create_port_assoc_precommit(context, port_assoc)
-        self.create_port_assoc_postcommit(context, port_assoc)
+        self._postcommit(bgpvpn_id, self.create_port_assoc_postcommit,
+                         context, port_assoc)
         return port_assoc
 
+    def create_port_assocs(self, context, bgpvpn_id, port_associations):
+        with db_api.CONTEXT_WRITER.using(context):
+            port_assocs = self.bgpvpn_db.create_port_assocs(
+                context, bgpvpn_id, port_associations)
+            self.create_port_assocs_precommit(context, port_assocs)
+        self._postcommit(bgpvpn_id, self.create_port_assocs_postcommit,
+                         context, port_assocs)
+        return port_assocs
+
     @abc.abstractmethod
     def create_port_assoc_precommit(self, context, port_assoc):
         pass
@@ -373,13 +545,33 @@ class BGPVPNDriverRCDBMixin(BGPVPNDriverRCBase, BGPVPNDriverDBMixin,
     def create_port_assoc_postcommit(self, context, port_assoc):
         pass
 
+    def create_port_assocs_precommit(self, context, port_assocs):
+        for port_assoc in port_assocs:
+            self.create_port_assoc_precommit(context, port_assoc)
+
+    def create_port_assocs_postcommit(self, context, port_assocs):
+        """Called once after several port associations were created
+
+        Drivers can override this to process the whole batch at once, by
+        default create_port_assoc_postcommit is called for each association.
+        """
+        for port_assoc in port_assocs:
+            self.create_port_assoc_postcommit(context, port_assoc)
+
     def get_port_assoc(self, context, assoc_id, bgpvpn_id, fields=None):
         return self.bgpvpn_db.get_port_assoc(context, assoc_id,
                                              bgpvpn_id, fields)
 
-    def get_port_assocs(self, context, bgpvpn_id, filters=None, fields=None):
+    def get_port_assocs(self, context, bgpvpn_id, filters=None, fields=None,
+                        sorts=None, limit=None, marker=None,
+                        page_reverse=False):
         return self.bgpvpn_db.get_port_assocs(context, bgpvpn_id,
-                                              filters, fields)
+                                              filters, fields, sorts, limit,
+                                              marker, page_reverse)
+
+    def get_port_assocs_count(self, context, bgpvpn_id, filters=None):
+        return self.bgpvpn_db.get_port_assocs_count(context, bgpvpn_id,
+                                                    filters)
 
     def update_port_assoc(self, context, assoc_id, bgpvpn_id, port_assoc):
         old_port_assoc = self.get_port_assoc(context, assoc_id, bgpvpn_id)
@@ -389,8 +581,11 @@ class BGPVPNDriverRCDBMixin(BGPVPNDriverRCBase, BGPVPNDriverDBMixin,
                                                           port_assoc)
             self.update_port_assoc_precommit(context,
                                              old_port_assoc, port_assoc)
-        self.update_port_assoc_postcommit(context,
-                                          old_port_assoc, port_assoc)
+        routes_delta = bgpvpn_db.port_assoc_routes_delta(
+            old_port_assoc['routes'], port_assoc['routes'])
+        self._postcommit(bgpvpn_id, self.update_port_assoc_postcommit,
+                         context, old_port_assoc, port_assoc,
+                         routes_delta=routes_delta)
         return port_assoc
 
     @abc.abstractmethod
@@ -400,7 +595,13 @@ class BGPVPNDriverRCDBMixin(BGPVPNDriverRCBase, BGPVPNDriverDBMixin,
 
     @abc.abstractmethod
     def update_port_assoc_postcommit(self, context,
-                                     old_port_assoc, port_assoc):
+                                     old_port_assoc, port_assoc,
+                                     routes_delta=None):
+        """Called after the update of a port association
+
+        'routes_delta' is a bgpvpn_db.RoutesDelta of the routes added,
+        removed and updated, to let drivers apply them incrementally.
+        """
         pass
 
     def delete_port_assoc(self, context, assoc_id, bgpvpn_id):
@@ -412,7 +613,8 @@ class BGPVPNDriverRCDBMixin(BGPVPNDriverRCBase, BGPVPNDriverDBMixin,
             self.bgpvpn_db.delete_port_assoc(context,
                                              assoc_id,
                                              bgpvpn_id)
-        self.delete_port_assoc_postcommit(context, port_assoc)
+        self._postcommit(bgpvpn_id, self.delete_port_assoc_postcommit,
+                         context, port_assoc)
 
     @abc.abstractmethod
     def delete_port_assoc_precommit(self, context, port_assoc):
@@ -445,7 +647,8 @@ class BGPVPNDriverRC(BGPVPNDriverRCDBMixin, BGPVPNDriver):
         pass
 
     def update_port_assoc_postcommit(self, context,
-                                     old_port_assoc, port_assoc):
+                                     old_port_assoc, port_assoc,
+                                     routes_delta=None):
         pass
 
     def delete_port_assoc_precommit(self, context, port_assoc):
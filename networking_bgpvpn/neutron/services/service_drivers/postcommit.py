@@ -0,0 +1,144 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import atexit
+import queue
+import threading
+import time
+import zlib
+
+from neutron_lib import context as n_context
+from oslo_log import log
+
+LOG = log.getLogger(__name__)
+
+# put in the queues to stop the workers
+_STOP = object()
+
+
+class PostcommitPool(object):
+    """Run the postcommit operations of a driver in background workers
+
+    Each operation is queued with the id of the BGPVPN it applies to. The
+    operations of a BGPVPN always go to the same worker, so that they are
+    run in the order they were submitted in, while the operations of
+    different BGPVPNs are run concurrently.
+
+    The queue of each worker is bounded: when it is full, 'submit' waits for
+    a free slot, slowing the API down rather than letting the backlog grow.
+    The workers are started on the first submission, so that they belong to
+    the API worker process and not to the process it was forked from.
+
+    The exceptions raised by the operations are logged, since there is no
+    longer an API request to report them to.
+    """
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.processed = 0
+        self.failed = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._queues = []
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def _start(self):
+        with self._lock:
+            if self._threads or self._stopped:
+                return
+            for index in range(self.workers):
+                work_queue = queue.Queue(self.queue_size)
+                thread = threading.Thread(
+                    target=self._run, args=(work_queue, ),
+                    name='bgpvpn-postcommit-%d' % index, daemon=True)
+                self._queues.append(work_queue)
+                self._threads.append(thread)
+                thread.start()
+            atexit.register(self.shutdown)
+
+    def submit(self, bgpvpn_id, func, context, *args, **kwargs):
+        """Queue func(context, *args, **kwargs) after the operations of the
+        same BGPVPN
+
+        The operation is given its own copy of the context, whose database
+        session is not shared with the API request. Once the pool is shut
+        down, the operations are run right away.
+        """
+        self._start()
+        if self._stopped:
+            func(context, *args, **kwargs)
+            return
+        context = n_context.Context.from_dict(context.to_dict())
+        work_queue = self._queues[zlib.crc32(bgpvpn_id.encode()) %
+                                  self.workers]
+        if work_queue.full():
+            LOG.warning("The BGPVPN postcommit queue is full, %d operations "
+                        "are waiting", self.depth)
+        work_queue.put((time.monotonic(), func, context, args, kwargs))
+
+    def _run(self, work_queue):
+        while True:
+            item = work_queue.get()
+            if item is _STOP:
+                return
+            queued_at, func, context, args, kwargs = item
+            try:
+                func(context, *args, **kwargs)
+            except Exception:
+                LOG.exception("BGPVPN postcommit operation %s failed",
+                              getattr(func, '__name__', func))
+                with self._lock:
+                    self.failed += 1
+            latency = time.monotonic() - queued_at
+            with self._lock:
+                self.processed += 1
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+            LOG.debug("BGPVPN postcommit operation %(func)s done "
+                      "%(latency).3fs after being queued, %(depth)d "
+                      "operations waiting",
+                      {'func': getattr(func, '__name__', func),
+                       'latency': latency,
+                       'depth': self.depth})
+
+    @property
+    def depth(self):
+        """The number of operations waiting to be run"""
+        return sum(work_queue.qsize() for work_queue in self._queues)
+
+    @property
+    def stats(self):
+        with self._lock:
+            processed = self.processed
+            return {'depth': self.depth,
+                    'processed': processed,
+                    'failed': self.failed,
+                    'average_latency': (self.total_latency / processed
+                                        if processed else 0.0),
+                    'max_latency': self.max_latency}
+
+    def shutdown(self, timeout=None):
+        """Stop the workers once the queued operations are run"""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+        if self._threads:
+            LOG.info("Waiting for %d BGPVPN postcommit operations",
+                     self.depth)
+        for work_queue in self._queues:
+            work_queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
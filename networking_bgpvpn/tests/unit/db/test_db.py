@@ -12,14 +12,29 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import functools
+import itertools
+from unittest import mock
+
+from oslo_config import cfg
+from oslo_db import exception as db_exc
+from oslo_serialization import jsonutils
 from oslo_utils import uuidutils
+import sqlalchemy as sa
+from sqlalchemy import orm
 
+from neutron.db.models import l3 as l3_models
+from neutron.db import models_v2
 from neutron.db import rbac_db_models
+from neutron.services.revisions import revision_plugin
 from neutron_lib.api.definitions import bgpvpn_routes_control as bgpvpn_rc_def
 from neutron_lib.api.definitions import bgpvpn_vni as bgpvpn_vni_def
 from neutron_lib import context
 from neutron_lib.db import api as db_api
+from neutron_lib.plugins import directory
 
+from networking_bgpvpn.neutron.db import bgpvpn_cache
+from networking_bgpvpn.neutron.db import bgpvpn_db
 from networking_bgpvpn.neutron.db.bgpvpn_db import BGPVPNPluginDb
 from networking_bgpvpn.neutron.db.bgpvpn_db import BGPVPNRBAC
 from networking_bgpvpn.neutron.extensions.bgpvpn \
@@ -29,6 +44,7 @@ from networking_bgpvpn.neutron.extensions.bgpvpn import BGPVPNNotFound
 from networking_bgpvpn.neutron.services.common import constants
 from networking_bgpvpn.neutron.services.common import utils
 from networking_bgpvpn.tests.unit.services import test_plugin
+from networking_bgpvpn.tests.unit import sql_fixtures
 
 
 def _id_list(list):
@@ -248,6 +264,409 @@ class BgpvpnDBTestCase(test_plugin.BgpvpnTestCaseMixin):
         bgpvpn = self.plugin_db.get_bgpvpn(ctx, bgpvpn['id'])
         self.assertEqual(True, bgpvpn['shared'])
 
+    def _create_bgpvpns_with_assocs(self, count, net_id, router_id):
+        for i in range(count):
+            bgpvpn = self.plugin_db.create_bgpvpn(
+                self.ctx,
+                {"tenant_id": self.ctx.tenant_id,
+                 "type": "l3",
+                 "name": "",
+                 "route_targets": ["64512:%d" % i],
+                 "import_targets": [],
+                 "export_targets": []})
+            self.plugin_db.create_net_assoc(
+                self.ctx, bgpvpn['id'],
+                {'tenant_id': self.ctx.tenant_id, 'network_id': net_id})
+            self.plugin_db.create_router_assoc(
+                self.ctx, bgpvpn['id'],
+                {'tenant_id': self.ctx.tenant_id, 'router_id': router_id})
+
+    def test_get_bgpvpns_query_count_independent_of_size(self):
+        with self.network() as net, \
+                self.router(tenant_id=self._tenant_id) as router:
+            net_id = net['network']['id']
+            router_id = router['router']['id']
+
+            self._create_bgpvpns_with_assocs(2, net_id, router_id)
+            small_count = sql_fixtures.count_queries(
+                self.plugin_db.get_bgpvpns, self.ctx)
+
+            self._create_bgpvpns_with_assocs(10, net_id, router_id)
+            bgpvpns = self.plugin_db.get_bgpvpns(self.ctx)
+            large_count = sql_fixtures.count_queries(
+                self.plugin_db.get_bgpvpns, self.ctx)
+
+            self.assertEqual(12, len(bgpvpns))
+            for bgpvpn in bgpvpns:
+                self.assertEqual([net_id], bgpvpn['networks'])
+                self.assertEqual([router_id], bgpvpn['routers'])
+                self.assertEqual([], bgpvpn['ports'])
+                self.assertFalse(bgpvpn['shared'])
+            self.assertEqual(small_count, large_count)
+
+    def test_get_bgpvpns_for_networks(self):
+        with self.network() as net1, self.network() as net2, \
+                self.network() as net3, \
+                self.subnet(network=net1) as subnet1, \
+                self.subnet(network=net2, cidr='10.0.1.0/24') as subnet2, \
+                self.router(tenant_id=self._tenant_id) as router:
+            net1_id = net1['network']['id']
+            net2_id = net2['network']['id']
+            router_id = router['router']['id']
+            for subnet in (subnet1, subnet2):
+                self._router_interface_action('add', router_id,
+                                              subnet['subnet']['id'], None)
+            bgpvpn1, bgpvpn2 = [self.plugin_db.create_bgpvpn(
+                self.ctx,
+                {"tenant_id": self.ctx.tenant_id,
+                 "type": "l3",
+                 "name": "",
+                 "route_targets": ["64512:%d" % i, "64512:%d0" % i],
+                 "import_targets": ["64512:%d1" % i],
+                 "export_targets": [],
+                 "route_distinguishers": ["64512:%d2" % i]})
+                for i in (1, 2)]
+            self.plugin_db.create_net_assoc(
+                self.ctx, bgpvpn1['id'],
+                {'tenant_id': self.ctx.tenant_id, 'network_id': net1_id})
+            self.plugin_db.create_router_assoc(
+                self.ctx, bgpvpn1['id'],
+                {'tenant_id': self.ctx.tenant_id, 'router_id': router_id})
+            self.plugin_db.create_router_assoc(
+                self.ctx, bgpvpn2['id'],
+                {'tenant_id': self.ctx.tenant_id, 'router_id': router_id})
+
+            network_ids = [net1_id, net2_id, net3['network']['id']]
+            self.assertEqual(1, sql_fixtures.count_queries(
+                self.plugin_db.get_bgpvpns_for_networks, self.ctx,
+                network_ids))
+            res = self.plugin_db.get_bgpvpns_for_networks(self.ctx,
+                                                          network_ids)
+
+            def _expected(bgpvpn, via_router):
+                return {'id': bgpvpn['id'],
+                        'type': 'l3',
+                        'route_targets': bgpvpn['route_targets'],
+                        'import_targets': bgpvpn['import_targets'],
+                        'export_targets': [],
+                        'via_router': via_router}
+
+            # bgpvpn1 is associated to net1 both directly and through the
+            # router, it is reported once
+            self.assertCountEqual([_expected(bgpvpn1, False),
+                                   _expected(bgpvpn2, True)],
+                                  res[net1_id])
+            self.assertCountEqual([_expected(bgpvpn1, True),
+                                   _expected(bgpvpn2, True)],
+                                  res[net2_id])
+            self.assertEqual([], res[net3['network']['id']])
+            self.assertEqual({}, self.plugin_db.get_bgpvpns_for_networks(
+                self.ctx, []))
+
+    def test_get_counts(self):
+        with self.network() as net1, self.network() as net2, \
+                self.port() as port:
+            net_ids = [net1['network']['id'], net2['network']['id']]
+            bgpvpn1, bgpvpn2 = [self.plugin_db.create_bgpvpn(
+                self.ctx,
+                {"tenant_id": tenant_id,
+                 "type": "l3",
+                 "name": "",
+                 "route_targets": ["64512:%d" % i],
+                 "import_targets": [],
+                 "export_targets": [],
+                 "route_distinguishers": []})
+                for i, tenant_id in ((1, self._tenant_id), (2, 'other'))]
+            for net_id in net_ids:
+                self.plugin_db.create_net_assoc(
+                    self.ctx, bgpvpn1['id'],
+                    {'tenant_id': self._tenant_id, 'network_id': net_id})
+            self.plugin_db.create_port_assoc(
+                self.ctx, bgpvpn1['id'],
+                {'tenant_id': self._tenant_id,
+                 'port_id': port['port']['id'],
+                 'advertise_fixed_ips': True,
+                 'routes': []})
+
+            for filters, expected in (
+                    (None, 2),
+                    ({'project_id': [self._tenant_id]}, 1),
+                    ({'project_id': ['other']}, 1),
+                    ({'project_id': ['foo']}, 0),
+                    # bgpvpn1 is associated to both networks, it is
+                    # counted once
+                    ({'networks': net_ids}, 1),
+                    ({'ports': [port['port']['id']]}, 1),
+                    ({'routers': [uuidutils.generate_uuid()]}, 0)):
+                self.assertEqual(
+                    expected,
+                    self.plugin_db.get_bgpvpns_count(self.ctx, filters))
+                self.assertEqual(
+                    expected,
+                    len(self.plugin_db.get_bgpvpns(self.ctx, filters)))
+            self.assertEqual(1, sql_fixtures.count_queries(
+                self.plugin_db.get_bgpvpns_count, self.ctx))
+
+            self.assertEqual(2, self.plugin_db.get_net_assocs_count(
+                self.ctx, bgpvpn1['id']))
+            self.assertEqual(1, self.plugin_db.get_net_assocs_count(
+                self.ctx, bgpvpn1['id'], {'network_id': net_ids[:1]}))
+            self.assertEqual(0, self.plugin_db.get_net_assocs_count(
+                self.ctx, bgpvpn2['id']))
+            self.assertEqual(1, sql_fixtures.count_queries(
+                self.plugin_db.get_net_assocs_count, self.ctx,
+                bgpvpn1['id']))
+            self.assertEqual(0, self.plugin_db.get_router_assocs_count(
+                self.ctx, bgpvpn1['id']))
+            self.assertEqual(1, self.plugin_db.get_port_assocs_count(
+                self.ctx, bgpvpn1['id']))
+            self.assertEqual(0, self.plugin_db.get_port_assocs_count(
+                self.ctx, bgpvpn2['id']))
+
+    def test_export_import_topology(self):
+        with self.network() as net, self.port() as port, \
+                self.router(tenant_id=self._tenant_id) as router:
+            self._create_bgpvpns_with_assocs(3, net['network']['id'],
+                                             router['router']['id'])
+            other_id = _id_list(self.plugin_db.get_bgpvpns(self.ctx))[0]
+            bgpvpn = self.plugin_db.create_bgpvpn(
+                self.ctx,
+                {"tenant_id": self._tenant_id,
+                 "type": "l2",
+                 "name": "other",
+                 "route_targets": [],
+                 "import_targets": ["64512:100"],
+                 "export_targets": ["64512:101", "64512:102"],
+                 "route_distinguishers": []})
+            self.plugin_db.create_port_assoc(
+                self.ctx, bgpvpn['id'],
+                {'tenant_id': self._tenant_id,
+                 'port_id': port['port']['id'],
+                 'advertise_fixed_ips': False,
+                 'routes': [{'type': 'prefix', 'prefix': '12.1.3.0/24',
+                             'local_pref': 100},
+                            {'type': 'bgpvpn', 'bgpvpn_id': other_id}]})
+            with db_api.CONTEXT_WRITER.using(self.ctx):
+                self.ctx.session.add(BGPVPNRBAC(
+                    object_id=bgpvpn['id'],
+                    target_project='*',
+                    action=rbac_db_models.ACCESS_SHARED,
+                    project_id=self._tenant_id))
+            self.plugin_db.sync_target_allocations(
+                self.ctx, utils.RangeSet([(1, 5)]))
+            self.assertEqual([1, 2], self.plugin_db.allocate_target_ids(
+                self.ctx, 2))
+            allocations = self.ctx.session.query(
+                bgpvpn_db.BGPVPNTargetAllocation)
+
+            def _allocated():
+                return [allocation.target_id for allocation in
+                        allocations.filter_by(allocated=True)]
+
+            def _topology():
+                # the restored rows get new standard attributes, which
+                # change the default order of the lists
+                bgpvpns = sorted(self.plugin_db.get_bgpvpns(self.ctx),
+                                 key=lambda bgpvpn: bgpvpn['id'])
+                port_assocs = self.plugin_db.get_port_assocs(self.ctx,
+                                                             bgpvpn['id'])
+                for port_assoc in port_assocs:
+                    port_assoc['routes'].sort(key=lambda route: route['type'])
+                return bgpvpns, port_assocs
+
+            expected = _topology()
+            # the number of queries does not depend on the number of
+            # BGPVPNs and associations
+            self.assertEqual(len(bgpvpn_db.TOPOLOGY_RECORDS),
+                             sql_fixtures.count_queries(
+                                 lambda: list(self.plugin_db.export_topology(
+                                     self.ctx, batch_size=2))))
+            dump = [jsonutils.loads(jsonutils.dumps(record)) for record in
+                    self.plugin_db.export_topology(self.ctx, batch_size=2)]
+            # the records come in the order they are restored in
+            self.assertEqual(
+                [record for record, _model, _columns
+                 in bgpvpn_db.TOPOLOGY_RECORDS],
+                [record for record, _group in itertools.groupby(
+                    record['record'] for record in dump)])
+
+            for id in _id_list(expected[0]):
+                self.plugin_db.delete_bgpvpn(self.ctx, id)
+            # the row of an allocated ID may be missing, for instance if
+            # the configured range has changed
+            self.plugin_db.release_target_ids(self.ctx, [2])
+            with db_api.CONTEXT_WRITER.using(self.ctx):
+                allocations.filter_by(target_id=1).delete()
+            self.assertEqual([], _allocated())
+
+            counts = self.plugin_db.import_topology(self.ctx, iter(dump),
+                                                    batch_size=2)
+            self.assertEqual(4, counts['bgpvpn'])
+            self.assertEqual(2, counts['port_association_route'])
+            self.assertEqual(len(dump), sum(counts.values()))
+            self.assertEqual(expected, _topology())
+            self.assertEqual([1, 2], sorted(_allocated()))
+
+    def test_import_topology_unknown_record(self):
+        self.assertRaises(ValueError, self.plugin_db.import_topology,
+                          self.ctx, [{'record': 'foo'}])
+
+    def test_get_bgpvpns_extensions_looked_up_once(self):
+        with self.network() as net, \
+                self.router(tenant_id=self._tenant_id) as router:
+            self._create_bgpvpns_with_assocs(3, net['network']['id'],
+                                             router['router']['id'])
+
+            with mock.patch.object(
+                    utils, 'get_supported_extensions',
+                    wraps=utils.get_supported_extensions) as get_extensions:
+                bgpvpns = self.plugin_db.get_bgpvpns(self.ctx)
+                get_extensions.assert_called_once_with()
+
+                get_extensions.reset_mock()
+                self.plugin_db.get_bgpvpns(self.ctx, fields=['id', 'name'])
+                get_extensions.assert_not_called()
+
+            self.assertEqual(3, len(bgpvpns))
+            self.assertEqual(frozenset(
+                self.bgpvpn_plugin.supported_extension_aliases),
+                self.bgpvpn_plugin.supported_extensions)
+
+    def test_get_bgpvpns_fields_query_count(self):
+        with self.network() as net, \
+                self.router(tenant_id=self._tenant_id) as router:
+            self._create_bgpvpns_with_assocs(3, net['network']['id'],
+                                             router['router']['id'])
+
+            bgpvpns = self.plugin_db.get_bgpvpns(self.ctx,
+                                                 fields=['id', 'name'])
+            self.assertEqual(1, sql_fixtures.count_queries(
+                self.plugin_db.get_bgpvpns, self.ctx, fields=['id', 'name']))
+            self.assertEqual(3, len(bgpvpns))
+            for bgpvpn in bgpvpns:
+                self.assertEqual({'id', 'name'}, set(bgpvpn))
+
+            # one more query per type of association or target requested
+            bgpvpns = self.plugin_db.get_bgpvpns(
+                self.ctx, fields=['id', 'networks', 'route_targets'])
+            self.assertEqual(3, sql_fixtures.count_queries(
+                self.plugin_db.get_bgpvpns, self.ctx,
+                fields=['id', 'networks', 'route_targets']))
+            for bgpvpn in bgpvpns:
+                self.assertEqual([net['network']['id']], bgpvpn['networks'])
+                self.assertEqual(1, len(bgpvpn['route_targets']))
+                self.assertNotIn('routers', bgpvpn)
+
+    def test_get_bgpvpn_fields(self):
+        bgpvpn = self.plugin_db.create_bgpvpn(
+            self.ctx,
+            {"tenant_id": self.ctx.tenant_id,
+             "type": "l3",
+             "name": "foo",
+             "route_targets": ["64512:1"],
+             "import_targets": [],
+             "export_targets": []})
+        with mock.patch.object(self.plugin_db, '_is_shared') as is_shared:
+            self.assertEqual(
+                {'id': bgpvpn['id'], 'name': 'foo',
+                 'route_targets': ['64512:1']},
+                self.plugin_db.get_bgpvpn(
+                    self.ctx, bgpvpn['id'],
+                    fields=['id', 'name', 'route_targets']))
+            is_shared.assert_not_called()
+
+    def test_get_bgpvpns_shared(self):
+        bgpvpn_shared = self.plugin_db.create_bgpvpn(
+            self.ctx,
+            {"tenant_id": self.ctx.tenant_id,
+             "type": "l3",
+             "name": "",
+             "route_targets": ["64512:1"],
+             "import_targets": [],
+             "export_targets": []})
+        bgpvpn_not_shared = self.plugin_db.create_bgpvpn(
+            self.ctx,
+            {"tenant_id": self.ctx.tenant_id,
+             "type": "l3",
+             "name": "",
+             "route_targets": ["64512:2"],
+             "import_targets": [],
+             "export_targets": []})
+        with db_api.CONTEXT_WRITER.using(self.ctx):
+            self.ctx.session.add(BGPVPNRBAC(
+                object_id=bgpvpn_shared['id'],
+                target_project='*',
+                action=rbac_db_models.ACCESS_SHARED,
+                object_type=BGPVPNRBAC.object_type,
+                project_id=self._tenant_id,
+            ))
+
+        shared = {bgpvpn['id']: bgpvpn['shared']
+                  for bgpvpn in self.plugin_db.get_bgpvpns(self.ctx)}
+        self.assertEqual({bgpvpn_shared['id']: True,
+                          bgpvpn_not_shared['id']: False}, shared)
+
+    def test_get_bgpvpns_paginated(self):
+        for name in ('c', 'a', 'd', 'b'):
+            self.plugin_db.create_bgpvpn(
+                self.ctx,
+                {"tenant_id": self.ctx.tenant_id,
+                 "type": "l3",
+                 "name": name,
+                 "route_targets": ["64512:1"],
+                 "import_targets": [],
+                 "export_targets": []})
+        sorts = [('name', True), ('id', True)]
+
+        page = self.plugin_db.get_bgpvpns(self.ctx, sorts=sorts, limit=2)
+        self.assertEqual(['a', 'b'], [bgpvpn['name'] for bgpvpn in page])
+
+        page = self.plugin_db.get_bgpvpns(self.ctx, sorts=sorts, limit=2,
+                                          marker=page[-1]['id'])
+        self.assertEqual(['c', 'd'], [bgpvpn['name'] for bgpvpn in page])
+
+        page = self.plugin_db.get_bgpvpns(self.ctx, sorts=sorts, limit=2,
+                                          marker=page[0]['id'],
+                                          page_reverse=True)
+        self.assertEqual(['a', 'b'], [bgpvpn['name'] for bgpvpn in page])
+
+    def test_get_bgpvpns_paginated_unknown_marker(self):
+        self.assertRaises(BGPVPNNotFound,
+                          self.plugin_db.get_bgpvpns,
+                          self.ctx, sorts=[('id', True)], limit=1,
+                          marker=uuidutils.generate_uuid())
+
+    def test_get_router_assocs_paginated(self):
+        with self.router(tenant_id=self._tenant_id) as router1, \
+                self.router(tenant_id=self._tenant_id) as router2, \
+                self.router(tenant_id=self._tenant_id) as router3:
+            bgpvpn = self.plugin_db.create_bgpvpn(
+                self.ctx,
+                {"tenant_id": self.ctx.tenant_id,
+                 "type": "l3",
+                 "name": "",
+                 "route_targets": ["64512:1"],
+                 "import_targets": [],
+                 "export_targets": []})
+            router_ids = sorted(router['router']['id']
+                                for router in (router1, router2, router3))
+            for router_id in router_ids:
+                self.plugin_db.create_router_assoc(
+                    self.ctx, bgpvpn['id'],
+                    {'tenant_id': self.ctx.tenant_id, 'router_id': router_id})
+            sorts = [('router_id', False), ('id', True)]
+
+            page = self.plugin_db.get_router_assocs(
+                self.ctx, bgpvpn['id'], sorts=sorts, limit=2)
+            self.assertEqual(router_ids[:0:-1],
+                             [assoc['router_id'] for assoc in page])
+
+            page = self.plugin_db.get_router_assocs(
+                self.ctx, bgpvpn['id'], sorts=sorts, limit=2,
+                marker=page[-1]['id'])
+            self.assertEqual(router_ids[:1],
+                             [assoc['router_id'] for assoc in page])
+
     def test_get_allocated_targets(self):
         target_fields = ["route_targets", "import_targets", "export_targets"]
         for i in range(3):
@@ -270,6 +689,273 @@ class BgpvpnDBTestCase(test_plugin.BgpvpnTestCaseMixin):
                           '64512:2', '64510:0', '64511:0', '64511:2',
                           '64512:1'}, alloc_targets)
 
+    def test_get_allocated_targets_among_given_values(self):
+        self.plugin_db.create_bgpvpn(
+            self.ctx,
+            {"tenant_id": self.ctx.tenant_id,
+             "type": "l3",
+             "name": "",
+             "route_targets": ["64512:1", "64512:2"],
+             "import_targets": ["64512:3"],
+             "export_targets": [],
+             "route_distinguishers": ["64512:4"]})
+
+        self.assertEqual({'64512:1', '64512:2', '64512:3'},
+                         self.plugin_db.get_allocated_targets(self.ctx))
+        self.assertEqual({'64512:2'},
+                         self.plugin_db.get_allocated_targets(
+                             self.ctx, targets=['64512:2', '64512:4',
+                                                '64512:5']))
+        self.assertEqual(set(),
+                         self.plugin_db.get_allocated_targets(
+                             self.ctx, targets=[]))
+
+    def test_target_allocations(self):
+        self.plugin_db.sync_target_allocations(
+            self.ctx, utils.RangeSet([(1, 3)]))
+
+        self.assertEqual(1, self.plugin_db.allocate_target_id(self.ctx))
+        self.assertEqual(2, self.plugin_db.allocate_target_id(self.ctx))
+        self.plugin_db.release_target_ids(self.ctx, [1])
+        self.assertEqual(1, self.plugin_db.allocate_target_id(self.ctx))
+        self.assertEqual(3, self.plugin_db.allocate_target_id(self.ctx))
+        self.assertIsNone(self.plugin_db.allocate_target_id(self.ctx))
+
+        # allocated IDs are kept when removed from the range, until released
+        self.plugin_db.sync_target_allocations(
+            self.ctx, utils.RangeSet([(3, 4)]))
+        self.plugin_db.release_target_ids(self.ctx, [1, 2, 3])
+        self.plugin_db.sync_target_allocations(
+            self.ctx, utils.RangeSet([(3, 4)]))
+        self.assertEqual(3, self.plugin_db.allocate_target_id(self.ctx))
+        self.assertEqual(4, self.plugin_db.allocate_target_id(self.ctx))
+        self.assertIsNone(self.plugin_db.allocate_target_id(self.ctx))
+
+    @mock.patch.object(bgpvpn_db, 'MAX_SYNC_CHUNK_SIZE', 10)
+    def test_sync_target_allocations_windows(self):
+        self.plugin_db.sync_target_allocations(
+            self.ctx, utils.RangeSet([(1, 25)]))
+        self.assertEqual([1, 2], self.plugin_db.allocate_target_ids(self.ctx,
+                                                                    2))
+
+        with mock.patch.object(
+                self.plugin_db, '_add_missing_target_ids',
+                wraps=self.plugin_db._add_missing_target_ids) as mock_add:
+            # complete windows are skipped
+            self.plugin_db.sync_target_allocations(
+                self.ctx, utils.RangeSet([(1, 25)]))
+            mock_add.assert_not_called()
+
+            # only the incomplete windows of an extended range are loaded
+            self.plugin_db.sync_target_allocations(
+                self.ctx, utils.RangeSet([(1, 26), (40, 42)]))
+            self.assertEqual([mock.call(mock.ANY, 21, 26, 5),
+                              mock.call(mock.ANY, 40, 42, 0)],
+                             mock_add.call_args_list)
+        self.assertEqual(list(range(3, 27)) + [40, 41, 42],
+                         self.plugin_db.allocate_target_ids(self.ctx, 30))
+
+    @mock.patch.object(bgpvpn_db, 'MAX_SYNC_CHUNK_SIZE', 10)
+    def test_sync_target_allocations_committed_per_window(self):
+        add_missing = self.plugin_db._add_missing_target_ids
+
+        def _add_missing_failing(exc):
+            def _add_missing(context, first, last, count):
+                if first == 11:
+                    raise exc
+                return add_missing(context, first, last, count)
+            return _add_missing
+
+        with mock.patch.object(self.plugin_db, '_add_missing_target_ids',
+                               side_effect=_add_missing_failing(
+                                   RuntimeError())):
+            self.assertRaises(RuntimeError,
+                              self.plugin_db.sync_target_allocations,
+                              self.ctx, utils.RangeSet([(1, 25)]))
+        # the first window was committed
+        self.assertEqual(list(range(1, 11)),
+                         self.plugin_db.allocate_target_ids(self.ctx, 30))
+
+        # a window synchronized concurrently by another server is skipped
+        with mock.patch.object(self.plugin_db, '_add_missing_target_ids',
+                               side_effect=_add_missing_failing(
+                                   db_exc.DBDuplicateEntry())):
+            self.plugin_db.sync_target_allocations(
+                self.ctx, utils.RangeSet([(1, 25)]))
+        self.assertEqual(list(range(21, 26)),
+                         self.plugin_db.allocate_target_ids(self.ctx, 30))
+        self.plugin_db.sync_target_allocations(
+            self.ctx, utils.RangeSet([(1, 25)]))
+        self.assertEqual(list(range(11, 21)),
+                         self.plugin_db.allocate_target_ids(self.ctx, 30))
+
+    def test_allocate_target_id_query_count_independent_of_allocated(self):
+        self.plugin_db.sync_target_allocations(
+            self.ctx, utils.RangeSet([(0, 999)]))
+        first_count = sql_fixtures.count_queries(
+            self.plugin_db.allocate_target_id, self.ctx)
+        for _ in range(500):
+            self.plugin_db.allocate_target_id(self.ctx)
+        count = sql_fixtures.count_queries(
+            self.plugin_db.allocate_target_id, self.ctx)
+
+        self.assertEqual(first_count, count)
+
+    def test_allocate_target_id_retried_on_conflict(self):
+        self.plugin_db.sync_target_allocations(
+            self.ctx, utils.RangeSet([(1, 2)]))
+        update = orm.Query.update
+        conflicts = [0]
+
+        def _update(query, values, **kwargs):
+            # the first compare-and-swap fails, as if another server had
+            # allocated the same ID in the meantime
+            if conflicts:
+                return conflicts.pop()
+            return update(query, values, **kwargs)
+
+        with mock.patch.object(orm.Query, 'update', _update):
+            self.assertEqual(1, self.plugin_db.allocate_target_id(self.ctx))
+        self.assertEqual(2, self.plugin_db.allocate_target_id(self.ctx))
+
+    def test_allocate_target_ids(self):
+        self.plugin_db.sync_target_allocations(
+            self.ctx, utils.RangeSet([(1, 5)]))
+        self.assertEqual(1, self.plugin_db.allocate_target_id(self.ctx))
+
+        self.assertEqual([2, 3],
+                         self.plugin_db.allocate_target_ids(self.ctx, 2))
+        self.plugin_db.release_target_ids(self.ctx, [2])
+        # fewer IDs are returned when not enough are free
+        self.assertEqual([2, 4, 5],
+                         self.plugin_db.allocate_target_ids(self.ctx, 4))
+        self.assertEqual([], self.plugin_db.allocate_target_ids(self.ctx, 2))
+
+    def test_allocate_target_ids_retried_on_conflict(self):
+        self.plugin_db.sync_target_allocations(
+            self.ctx, utils.RangeSet([(1, 4)]))
+        update = orm.Query.update
+        conflicts = [1]
+
+        def _update(query, values, **kwargs):
+            # only one of the two IDs of the first compare-and-swap is
+            # reserved, the other one having been allocated by another server
+            if conflicts:
+                return conflicts.pop()
+            return update(query, values, **kwargs)
+
+        with mock.patch.object(orm.Query, 'update', _update):
+            self.assertEqual([1, 2],
+                             self.plugin_db.allocate_target_ids(self.ctx, 2))
+        self.assertEqual([3, 4],
+                         self.plugin_db.allocate_target_ids(self.ctx, 2))
+
+    def test_create_bgpvpns(self):
+        bgpvpns = self.plugin_db.create_bgpvpns(
+            self.ctx,
+            [{"tenant_id": self.ctx.tenant_id,
+              "type": "l3",
+              "name": name,
+              "route_targets": [target],
+              "export_targets": [],
+              "import_targets": [],
+              "route_distinguishers": []}
+             for name, target in (('vpn-a', '64512:1'),
+                                  ('vpn-b', '64512:2'))])
+
+        self.assertEqual(['vpn-a', 'vpn-b'],
+                         [bgpvpn['name'] for bgpvpn in bgpvpns])
+        for bgpvpn in bgpvpns:
+            self.assertEqual(
+                bgpvpn, self.plugin_db.get_bgpvpn(self.ctx, bgpvpn['id']))
+
+    def test_get_bgpvpns_filtered_by_target(self):
+        bgpvpn1 = self.plugin_db.create_bgpvpn(
+            self.ctx,
+            {"tenant_id": self.ctx.tenant_id,
+             "type": "l3",
+             "name": "",
+             "route_targets": [],
+             "import_targets": ["64512:1", "64512:100"],
+             "export_targets": ["64512:1"]})
+        bgpvpn2 = self.plugin_db.create_bgpvpn(
+            self.ctx,
+            {"tenant_id": self.ctx.tenant_id,
+             "type": "l3",
+             "name": "",
+             "route_targets": [],
+             "import_targets": ["64512:100"],
+             "export_targets": ["64512:2"]})
+
+        self.assertCountEqual(
+            [bgpvpn1['id'], bgpvpn2['id']],
+            _id_list(self.plugin_db.get_bgpvpns(
+                self.ctx, filters={'import_targets': ['64512:100']})))
+        self.assertEqual(
+            [bgpvpn2['id']],
+            _id_list(self.plugin_db.get_bgpvpns(
+                self.ctx, filters={'export_targets': ['64512:2',
+                                                      '64512:3']})))
+        self.assertEqual(
+            [],
+            _id_list(self.plugin_db.get_bgpvpns(
+                self.ctx, filters={'route_targets': ['64512:1']})))
+
+    def test_targets_comparisons(self):
+        bgpvpn1 = self.plugin_db.create_bgpvpn(
+            self.ctx,
+            {"tenant_id": self.ctx.tenant_id,
+             "type": "l3",
+             "name": "",
+             "route_targets": ["64512:1"],
+             "import_targets": [],
+             "export_targets": []})
+        bgpvpn2 = self.plugin_db.create_bgpvpn(
+            self.ctx,
+            {"tenant_id": self.ctx.tenant_id,
+             "type": "l3",
+             "name": "",
+             "route_targets": ["64512:2"],
+             "import_targets": [],
+             "export_targets": []})
+        route_targets = bgpvpn_db.BGPVPN.route_targets
+
+        def _ids(criterion):
+            with db_api.CONTEXT_READER.using(self.ctx):
+                return sorted(
+                    bgpvpn.id for bgpvpn in self.ctx.session.query(
+                        bgpvpn_db.BGPVPN).filter(criterion))
+
+        self.assertEqual([bgpvpn1['id']], _ids(route_targets == '64512:1'))
+        self.assertEqual([bgpvpn2['id']], _ids(route_targets != '64512:1'))
+        self.assertEqual([bgpvpn2['id']],
+                         _ids(route_targets.not_in(['64512:1', '64512:3'])))
+        self.assertRaisesRegex(ValueError,
+                               'not supported on BGPVPN attribute '
+                               'route_targets',
+                               route_targets.like, '64512:%')
+
+    def test_update_bgpvpn_targets_keeps_order(self):
+        bgpvpn = self.plugin_db.create_bgpvpn(
+            self.ctx,
+            {"tenant_id": self.ctx.tenant_id,
+             "type": "l3",
+             "name": "",
+             "route_targets": ["64512:3", "64512:1", "64512:2"],
+             "import_targets": ["64512:4"],
+             "export_targets": []})
+
+        self.plugin_db.update_bgpvpn(
+            self.ctx, bgpvpn['id'],
+            {"route_targets": ["64512:2", "64512:5"],
+             "export_targets": ["64512:6", "64512:4"]})
+
+        bgpvpn = self.plugin_db.get_bgpvpn(self.ctx, bgpvpn['id'])
+        self.assertEqual(["64512:2", "64512:5"], bgpvpn['route_targets'])
+        self.assertEqual(["64512:4"], bgpvpn['import_targets'])
+        self.assertEqual(["64512:6", "64512:4"], bgpvpn['export_targets'])
+        self.assertEqual([], bgpvpn['route_distinguishers'])
+
     def test_db_associate_disassociate_net(self):
         with self.network() as net:
             net_id = net['network']['id']
@@ -295,6 +981,80 @@ class BgpvpnDBTestCase(test_plugin.BgpvpnTestCaseMixin):
                                   id, {'tenant_id': self._tenant_id,
                                        'network_id': net_id})
 
+    def test_db_association_unique_constraints(self):
+        with self.network() as net, self.router() as router, \
+                self.port() as port, self.bgpvpn() as bgpvpn:
+            id = bgpvpn['bgpvpn']['id']
+            for model, column, resource_id in (
+                    (bgpvpn_db.BGPVPNNetAssociation, 'network_id',
+                     net['network']['id']),
+                    (bgpvpn_db.BGPVPNRouterAssociation, 'router_id',
+                     router['router']['id']),
+                    (bgpvpn_db.BGPVPNPortAssociation, 'port_id',
+                     port['port']['id'])):
+                # bypass the checks of the plugin, the database itself must
+                # refuse a second association
+                def _insert():
+                    with db_api.CONTEXT_WRITER.using(self.ctx):
+                        self.ctx.session.add(
+                            model(tenant_id=self._tenant_id, bgpvpn_id=id,
+                                  **{column: resource_id}))
+                _insert()
+                self.assertRaises(db_exc.DBDuplicateEntry, _insert)
+
+    def test_db_association_reverse_lookups_use_an_index(self):
+        for model, column in (
+                (bgpvpn_db.BGPVPNNetAssociation, 'network_id'),
+                (bgpvpn_db.BGPVPNRouterAssociation, 'router_id'),
+                (bgpvpn_db.BGPVPNPortAssociation, 'port_id')):
+            with db_api.CONTEXT_READER.using(self.ctx):
+                plan = self.ctx.session.execute(
+                    sa.text("EXPLAIN QUERY PLAN SELECT bgpvpn_id FROM "
+                            "%s WHERE %s = :id" % (model.__tablename__,
+                                                   column)),
+                    {'id': 'foo'}).fetchall()
+            self.assertIn('USING INDEX ix_%s_%s' % (model.__tablename__,
+                                                    column),
+                          ' '.join(row[-1] for row in plan))
+
+    def test_db_create_net_assocs(self):
+        with self.network() as net1, self.network() as net2, \
+                self.bgpvpn() as bgpvpn:
+            id = bgpvpn['bgpvpn']['id']
+            net_ids = [net1['network']['id'], net2['network']['id']]
+            assocs = self.plugin_db.create_net_assocs(
+                self.ctx, id, [{'tenant_id': self._tenant_id,
+                                'network_id': net_id}
+                               for net_id in net_ids])
+            self.assertEqual(net_ids,
+                             [assoc['network_id'] for assoc in assocs])
+            self.assertEqual(
+                sorted(net_ids),
+                sorted(self.plugin_db.get_bgpvpn(self.ctx, id)['networks']))
+
+    def test_db_create_net_assocs_already_associated(self):
+        with self.network() as net1, self.network() as net2, \
+                self.bgpvpn() as bgpvpn:
+            net1_id = net1['network']['id']
+            net2_id = net2['network']['id']
+            id = bgpvpn['bgpvpn']['id']
+            with self.assoc_net(id, net_id=net2_id):
+                self.assertRaises(BGPVPNNetAssocAlreadyExists,
+                                  self.plugin_db.create_net_assocs,
+                                  self.ctx, id,
+                                  [{'tenant_id': self._tenant_id,
+                                    'network_id': net_id}
+                                   for net_id in (net1_id, net2_id)])
+                self.assertEqual(
+                    [net2_id],
+                    self.plugin_db.get_bgpvpn(self.ctx, id)['networks'])
+            # the same network twice in the batch
+            self.assertRaises(BGPVPNNetAssocAlreadyExists,
+                              self.plugin_db.create_net_assocs,
+                              self.ctx, id,
+                              [{'tenant_id': self._tenant_id,
+                                'network_id': net1_id}] * 2)
+
     def test_db_find_bgpvpn_for_associated_network(self):
         with self.network() as net, \
                 self.bgpvpn(type=constants.BGPVPN_L2) as bgpvpn_l2, \
@@ -486,6 +1246,30 @@ class BgpvpnDBTestCase(test_plugin.BgpvpnTestCaseMixin):
             bgpvpn = self.plugin_db.get_bgpvpn(self.ctx, bgpvpn_id)
             self.assertEqual([], bgpvpn['ports'])
 
+    def test_db_create_port_assocs(self):
+        route = {'type': 'prefix', 'prefix': '12.1.0.0/16',
+                 'local_pref': 100}
+        with self.port(tenant_id=self._tenant_id) as port1, \
+                self.port(tenant_id=self._tenant_id) as port2, \
+                self.bgpvpn() as bgpvpn:
+            bgpvpn_id = bgpvpn['bgpvpn']['id']
+            assocs = self.plugin_db.create_port_assocs(
+                self.ctx, bgpvpn_id,
+                [{'tenant_id': self._tenant_id,
+                  'port_id': port1['port']['id'],
+                  'advertise_fixed_ips': True,
+                  'routes': [route]},
+                 {'tenant_id': self._tenant_id,
+                  'port_id': port2['port']['id'],
+                  'advertise_fixed_ips': False,
+                  'routes': []}])
+            self.assertEqual([[route], []],
+                             [assoc['routes'] for assoc in assocs])
+            self.assertEqual(
+                [route],
+                self.plugin_db.get_port_assoc(self.ctx, assocs[0]['id'],
+                                              bgpvpn_id)['routes'])
+
     def test_db_update_port_association(self):
         ROUTE_A = {'type': 'prefix',
                    'prefix': '12.1.0.0/16'}
@@ -539,6 +1323,91 @@ class BgpvpnDBTestCase(test_plugin.BgpvpnTestCaseMixin):
             )
             self.assertEqual(0, len(res['port_association']['routes']))
 
+    def test_db_update_port_association_routes_delta(self):
+        route_a = {'type': 'prefix', 'prefix': '12.1.0.0/16',
+                   'local_pref': None}
+        route_b = {'type': 'prefix', 'prefix': '14.0.0.0/8',
+                   'local_pref': 200}
+        route_c = {'type': 'prefix', 'prefix': '18.1.0.0/16',
+                   'local_pref': None}
+        with self.port(tenant_id=self._tenant_id) as port, \
+                self.bgpvpn() as bgpvpn, \
+                self.bgpvpn() as bgpvpn2:
+            bgpvpn_id = bgpvpn['bgpvpn']['id']
+            route_d = {'type': 'bgpvpn', 'bgpvpn_id': bgpvpn2['bgpvpn']['id'],
+                       'local_pref': None}
+            port_assoc, = self.plugin_db.create_port_assocs(
+                self.ctx, bgpvpn_id,
+                [{'tenant_id': self._tenant_id,
+                 'port_id': port['port']['id'],
+                  'advertise_fixed_ips': True,
+                  'routes': [route_a, route_b, route_d]}])
+            assoc_id = port_assoc['id']
+            route_ids = {
+                route.prefix or route.bgpvpn_id: route.id
+                for route in self.ctx.session.query(
+                    bgpvpn_db.BGPVPNPortAssociationRoute)}
+
+            route_b_bis = dict(route_b, local_pref=100)
+            new_routes = [route_b_bis, route_c, route_d]
+            self.assertEqual(
+                bgpvpn_db.RoutesDelta(added=[route_c],
+                                      removed=[route_a],
+                                      updated=[(route_b, route_b_bis)]),
+                bgpvpn_db.port_assoc_routes_delta(
+                    [route_a, route_b, route_d], new_routes))
+
+            port_assoc = self.plugin_db.update_port_assoc(
+                self.ctx, assoc_id, bgpvpn_id, {'routes': new_routes})
+
+            self.assertCountEqual(new_routes, port_assoc['routes'])
+            self.assertCountEqual(
+                new_routes,
+                self.plugin_db.get_port_assoc(self.ctx, assoc_id,
+                                              bgpvpn_id)['routes'])
+            routes_db = {route.prefix or route.bgpvpn_id: route
+                         for route in self.ctx.session.query(
+                             bgpvpn_db.BGPVPNPortAssociationRoute)}
+            # the unchanged and updated routes are kept, not re-inserted
+            self.assertEqual(route_ids[route_b['prefix']],
+                             routes_db[route_b['prefix']].id)
+            self.assertEqual(route_ids[route_d['bgpvpn_id']],
+                             routes_db[route_d['bgpvpn_id']].id)
+            self.assertNotIn(route_a['prefix'], routes_db)
+
+    def test_db_update_port_association_unchanged_routes(self):
+        route = {'type': 'prefix', 'prefix': '12.1.0.0/16',
+                 'local_pref': 100}
+        with self.port(tenant_id=self._tenant_id) as port, \
+                self.bgpvpn() as bgpvpn:
+            bgpvpn_id = bgpvpn['bgpvpn']['id']
+            port_assoc, = self.plugin_db.create_port_assocs(
+                self.ctx, bgpvpn_id,
+                [{'tenant_id': self._tenant_id,
+                 'port_id': port['port']['id'],
+                  'advertise_fixed_ips': True,
+                  'routes': [route]}])
+            self.assertEqual(
+                bgpvpn_db.RoutesDelta([], [], []),
+                bgpvpn_db.port_assoc_routes_delta([route], [route]))
+
+            # nothing is written, the update costs as much as a read
+            self.assertEqual(
+                sql_fixtures.count_queries(
+                    self.plugin_db.get_port_assoc,
+                    self.ctx, port_assoc['id'], bgpvpn_id),
+                sql_fixtures.count_queries(
+                    self.plugin_db.update_port_assoc,
+                    self.ctx, port_assoc['id'], bgpvpn_id,
+                    {'routes': [route]}))
+
+            # the routes are kept when not part of the update
+            port_assoc = self.plugin_db.update_port_assoc(
+                self.ctx, port_assoc['id'], bgpvpn_id,
+                {'advertise_fixed_ips': False})
+            self.assertFalse(port_assoc['advertise_fixed_ips'])
+            self.assertEqual([route], port_assoc['routes'])
+
 
 class BgpvpnDBTestCaseWithVNI(BgpvpnDBTestCase):
 
@@ -556,3 +1425,328 @@ class BgpvpnDBTestCaseWithRC(BgpvpnDBTestCase):
                                  'service_drivers.driver_api.BGPVPNDriverRC')
         super(BgpvpnDBTestCaseWithRC, self).setUp(
             service_provider=test_service_provider)
+
+
+class BgpvpnDBCacheTestCase(test_plugin.BgpvpnTestCaseMixin):
+
+    def setUp(self):
+        super(BgpvpnDBCacheTestCase, self).setUp()
+        self.ctx = context.get_admin_context()
+        self.ctx.tenant_id = self._tenant_id
+        self.plugin_db = BGPVPNPluginDb()
+        directory.add_plugin(constants.REVISION_PLUGIN,
+                             revision_plugin.RevisionPlugin())
+        mock.patch.object(bgpvpn_cache, '_cache', None).start()
+        cfg.CONF.set_override('bgpvpn_cache_size', 2, 'bgpvpn')
+
+    def _create_bgpvpn(self, **kwargs):
+        bgpvpn = {"tenant_id": self._tenant_id,
+                  "type": "l3",
+                  "name": "",
+                  "route_targets": ["64512:1"],
+                  "import_targets": [],
+                  "export_targets": [],
+                  "route_distinguishers": []}
+        bgpvpn.update(kwargs)
+        return self.plugin_db.create_bgpvpn(self.ctx, bgpvpn)
+
+    def test_cache_disabled(self):
+        cfg.CONF.set_override('bgpvpn_cache_size', 0, 'bgpvpn')
+        id = self._create_bgpvpn()['id']
+        self.plugin_db.get_bgpvpn(self.ctx, id)
+        self.assertIsNone(bgpvpn_cache.get_cache())
+
+    def test_get_bgpvpn_cached(self):
+        bgpvpn = self._create_bgpvpn()
+        self.assertEqual(bgpvpn, self.plugin_db.get_bgpvpn(self.ctx,
+                                                           bgpvpn['id']))
+        cache = bgpvpn_cache.get_cache()
+        self.assertEqual({'size': 1, 'hits': 0, 'misses': 1}, cache.stats)
+        # a hit only costs the revision check, plus the 'shared' lookup
+        with sql_fixtures.SQLStatements() as sql:
+            self.assertEqual(bgpvpn, self.plugin_db.get_bgpvpn(
+                self.ctx, bgpvpn['id']))
+        self.assertEqual(2, sql.count)
+        self.assertEqual(1, sql_fixtures.count_queries(
+            self.plugin_db.get_bgpvpn, self.ctx, bgpvpn['id'],
+            fields=['id', 'route_targets']))
+        self.assertEqual({'size': 1, 'hits': 2, 'misses': 1}, cache.stats)
+
+    def test_get_bgpvpn_cached_returns_copies(self):
+        id = self._create_bgpvpn()['id']
+        self.plugin_db.get_bgpvpn(self.ctx, id)['route_targets'].append('x')
+        self.assertEqual(['64512:1'], self.plugin_db.get_bgpvpn(
+            self.ctx, id)['route_targets'])
+
+    def test_get_bgpvpn_cached_not_visible(self):
+        id = self._create_bgpvpn()['id']
+        self.plugin_db.get_bgpvpn(self.ctx, id)
+        other_ctx = context.Context(user_id='fake_user',
+                                    tenant_id='other_tenant')
+        self.assertRaises(BGPVPNNotFound, self.plugin_db.get_bgpvpn,
+                          other_ctx, id)
+
+    def test_get_bgpvpn_changed_by_another_worker(self):
+        with self.network() as net:
+            net_id = net['network']['id']
+            id = self._create_bgpvpn()['id']
+            self.plugin_db.get_bgpvpn(self.ctx, id)
+            # the cache of another worker is not invalidated by these
+            # writes, the revision number of the BGPVPN is
+            with mock.patch.object(bgpvpn_cache, 'invalidate'):
+                assoc = self.plugin_db.create_net_assoc(
+                    self.ctx, id,
+                    {'tenant_id': self._tenant_id, 'network_id': net_id})
+                self.assertEqual([net_id], self.plugin_db.get_bgpvpn(
+                    self.ctx, id)['networks'])
+                self.plugin_db.update_bgpvpn(self.ctx, id,
+                                             {'route_targets': ['64512:2']})
+                self.assertEqual(['64512:2'], self.plugin_db.get_bgpvpn(
+                    self.ctx, id)['route_targets'])
+                self.plugin_db.delete_net_assoc(self.ctx, assoc['id'], id)
+                self.assertEqual([], self.plugin_db.get_bgpvpn(
+                    self.ctx, id)['networks'])
+            self.assertEqual({'size': 1, 'hits': 0, 'misses': 4},
+                             bgpvpn_cache.get_cache().stats)
+
+    def test_revision_number_bumped(self):
+        with self.port(tenant_id=self._tenant_id) as port:
+            id = self._create_bgpvpn()['id']
+
+            def _bumped(func, *args):
+                before = self.plugin_db.get_bgpvpn_revision_number(self.ctx,
+                                                                   id)
+                func(*args)
+                return before < self.plugin_db.get_bgpvpn_revision_number(
+                    self.ctx, id)
+
+            route = {'type': 'prefix', 'prefix': '12.1.0.0/16',
+                     'local_pref': 100}
+            assoc = {}
+
+            def _associate():
+                assoc.update(self.plugin_db.create_port_assoc(
+                    self.ctx, id, {'tenant_id': self._tenant_id,
+                                   'port_id': port['port']['id'],
+                                   'advertise_fixed_ips': True,
+                                   'routes': [route]}))
+
+            def _share():
+                with db_api.CONTEXT_WRITER.using(self.ctx):
+                    self.ctx.session.add(BGPVPNRBAC(
+                        object_id=id,
+                        target_project='*',
+                        action=rbac_db_models.ACCESS_SHARED,
+                        object_type=BGPVPNRBAC.object_type,
+                        project_id=self._tenant_id))
+
+            self.assertTrue(_bumped(_associate))
+            self.assertTrue(_bumped(
+                self.plugin_db.update_port_assoc, self.ctx, assoc['id'], id,
+                {'routes': [dict(route, local_pref=200)]}))
+            self.assertTrue(_bumped(self.plugin_db.update_bgpvpn, self.ctx,
+                                    id, {'import_targets': ['64512:2']}))
+            self.assertTrue(_bumped(_share))
+            self.assertTrue(_bumped(self.plugin_db.delete_port_assoc,
+                                    self.ctx, assoc['id'], id))
+
+    def test_cache_invalidated_by_writes(self):
+        id = self._create_bgpvpn()['id']
+        self.plugin_db.get_bgpvpn(self.ctx, id)
+        cache = bgpvpn_cache.get_cache()
+        self.plugin_db.update_bgpvpn(self.ctx, id, {'name': 'foo'})
+        self.assertEqual(0, cache.stats['size'])
+        self.plugin_db.get_bgpvpn(self.ctx, id)
+        self.plugin_db.delete_bgpvpn(self.ctx, id)
+        self.assertEqual(0, cache.stats['size'])
+
+    def test_cache_invalidated_by_network_deletion(self):
+        with self.network() as net:
+            net_id = net['network']['id']
+            id = self._create_bgpvpn()['id']
+            other_id = self._create_bgpvpn()['id']
+            self.plugin_db.create_net_assoc(
+                self.ctx, id,
+                {'tenant_id': self._tenant_id, 'network_id': net_id})
+            self.plugin_db.get_bgpvpn(self.ctx, id)
+            self.plugin_db.get_bgpvpn(self.ctx, other_id)
+            cache = bgpvpn_cache.get_cache()
+            self.assertEqual(2, cache.stats['size'])
+            self._delete('networks', net_id)
+            self.assertEqual(1, cache.stats['size'])
+            self.assertEqual([], self.plugin_db.get_bgpvpn(self.ctx,
+                                                           id)['networks'])
+
+    def test_cache_least_recently_used_evicted(self):
+        ids = [self._create_bgpvpn()['id'] for _ in range(3)]
+        for id in ids[:2]:
+            self.plugin_db.get_bgpvpn(self.ctx, id)
+        # the first BGPVPN becomes the most recently used
+        self.plugin_db.get_bgpvpn(self.ctx, ids[0])
+        self.plugin_db.get_bgpvpn(self.ctx, ids[2])
+        cache = bgpvpn_cache.get_cache()
+        self.assertEqual({'size': 2, 'hits': 1, 'misses': 3}, cache.stats)
+        self.plugin_db.get_bgpvpn(self.ctx, ids[0])
+        self.plugin_db.get_bgpvpn(self.ctx, ids[1])
+        self.assertEqual({'size': 2, 'hits': 2, 'misses': 4}, cache.stats)
+
+
+class BgpvpnDBQueryBudgetTestCase(test_plugin.BgpvpnTestCaseMixin):
+    """Number of SQL statements emitted by the main DB calls
+
+    Each call is measured with 1, 100 and 1,000 associations and must stay
+    within its budget whatever the size: a call doing one query per
+    association or per BGPVPN fails as soon as there are 100 of them.
+    """
+
+    SIZES = (1, 100, 1000)
+
+    def setUp(self):
+        super(BgpvpnDBQueryBudgetTestCase, self).setUp()
+        self.ctx = context.get_admin_context()
+        self.ctx.tenant_id = self._tenant_id
+        self.plugin_db = BGPVPNPluginDb()
+        self.networks = []
+        self.routers = []
+        self.ports = []
+        self.bgpvpn_id = self._create_bgpvpns(1)[0]
+
+    def _create_bgpvpns(self, count):
+        return [bgpvpn['id'] for bgpvpn in self.plugin_db.create_bgpvpns(
+            self.ctx,
+            [{"tenant_id": self._tenant_id,
+              "type": "l3",
+              "name": "",
+              "route_targets": ["64512:1"],
+              "import_targets": [],
+              "export_targets": []} for _ in range(count)])]
+
+    def _add_resources(self, count):
+        """Add networks, routers and ports, bypassing the core plugin"""
+        new = [uuidutils.generate_uuid() for _ in range(count)]
+        with db_api.CONTEXT_WRITER.using(self.ctx):
+            self.ctx.session.add_all(
+                [models_v2.Network(id=id_, project_id=self._tenant_id,
+                                   name='', status='ACTIVE',
+                                   admin_state_up=True) for id_ in new])
+            self.ctx.session.flush()
+            self.ctx.session.add_all(
+                [l3_models.Router(id=id_, project_id=self._tenant_id,
+                                  name='', status='ACTIVE',
+                                  admin_state_up=True) for id_ in new] +
+                [models_v2.Port(id=id_, project_id=self._tenant_id,
+                                name='', network_id=id_,
+                                mac_address='fa:16:3e:00:%02x:%02x' % (
+                                    index // 256, index % 256),
+                                admin_state_up=True, status='ACTIVE',
+                                device_id='', device_owner='')
+                 for index, id_ in enumerate(new, len(self.ports))])
+        self.networks.extend(new)
+        self.routers.extend(new)
+        self.ports.extend(new)
+        return new
+
+    def _associate(self, bgpvpn_id, resource_ids):
+        return (
+            functools.partial(
+                self.plugin_db.create_net_assocs, self.ctx, bgpvpn_id,
+                [{'tenant_id': self._tenant_id, 'network_id': id_}
+                 for id_ in resource_ids]),
+            functools.partial(
+                self.plugin_db.create_router_assocs, self.ctx, bgpvpn_id,
+                [{'tenant_id': self._tenant_id, 'router_id': id_}
+                 for id_ in resource_ids]),
+            functools.partial(
+                self.plugin_db.create_port_assocs, self.ctx, bgpvpn_id,
+                [{'tenant_id': self._tenant_id, 'port_id': id_,
+                  'advertise_fixed_ips': True,
+                  'routes': [{'type': 'prefix', 'prefix': '10.0.0.0/24'}]}
+                 for id_ in resource_ids]))
+
+    def _grow(self, size):
+        """Associate the BGPVPN to 'size' resources of each type
+
+        There are also 'size' other BGPVPNs, each associated to a network.
+        """
+        new = self._add_resources(size - len(self.networks))
+        for create_assocs in self._associate(self.bgpvpn_id, new):
+            create_assocs()
+        bgpvpn_ids = self._create_bgpvpns(len(new))
+        with db_api.CONTEXT_WRITER.using(self.ctx):
+            self.plugin_db._add_assocs(
+                self.ctx, bgpvpn_db.BGPVPNNetAssociation.network,
+                [bgpvpn_db.BGPVPNNetAssociation(project_id=self._tenant_id,
+                                                bgpvpn_id=bgpvpn_id,
+                                                network_id=network_id)
+                 for bgpvpn_id, network_id in zip(bgpvpn_ids, new)])
+
+    def _assert_budget(self, budget, size, name, call, selects_only=False):
+        with sql_fixtures.SQLStatements() as sql:
+            call()
+        statements = sql.selects if selects_only else sql.statements
+        self.assertLessEqual(
+            len(statements), budget,
+            "%s with %d associations exceeds its budget of %d SQL "
+            "statements:\n%s" % (name, size, budget, sql))
+
+    def test_query_budgets(self):
+        # the budgets include the queries done by neutron to load the
+        # associated resources
+        for size in self.SIZES:
+            self._grow(size)
+            for name, budget, call in (
+                    ('get_bgpvpns', 6,
+                     functools.partial(self.plugin_db.get_bgpvpns,
+                                       self.ctx)),
+                    ('get_bgpvpns(fields)', 1,
+                     functools.partial(self.plugin_db.get_bgpvpns, self.ctx,
+                                       fields=['id', 'name'])),
+                    ('get_bgpvpns(networks)', 1,
+                     functools.partial(
+                         self.plugin_db.get_bgpvpns, self.ctx,
+                         filters={'networks': ['missing']}))):
+                self._assert_budget(budget, size, name, call)
+            for name, budget, func in (
+                    ('get_bgpvpn', 19, self.plugin_db.get_bgpvpn),
+                    ('get_net_assocs', 4, self.plugin_db.get_net_assocs),
+                    ('get_router_assocs', 6,
+                     self.plugin_db.get_router_assocs),
+                    ('get_port_assocs', 2, self.plugin_db.get_port_assocs)):
+                self._assert_budget(
+                    budget, size, name,
+                    functools.partial(func, self.ctx, self.bgpvpn_id))
+            self._assert_budget(
+                21, size, 'update_bgpvpn',
+                functools.partial(self.plugin_db.update_bgpvpn, self.ctx,
+                                  self.bgpvpn_id, {'name': 'foo'}))
+
+            # writes, on another BGPVPN: its associations to all the
+            # resources but one are created at once, with no other reads
+            # per association than the two done by neutron to refresh the
+            # standard attributes (revision number and tags) of each row
+            bgpvpn_id = self._create_bgpvpns(1)[0]
+            for name, budget, create_assocs in zip(
+                    ('create_net_assocs', 'create_router_assocs',
+                     'create_port_assocs'),
+                    (8, 10, 10),
+                    self._associate(bgpvpn_id, self.networks[1:])):
+                self._assert_budget(budget + 2 * (size - 1), size, name,
+                                    create_assocs, selects_only=True)
+            network_id = self.networks[0]
+            net_assoc = {'tenant_id': self._tenant_id,
+                         'network_id': network_id}
+            self._assert_budget(
+                11, size, 'create_net_assoc',
+                functools.partial(self.plugin_db.create_net_assoc, self.ctx,
+                                  bgpvpn_id, net_assoc))
+            assoc_id = self.plugin_db.get_net_assocs(
+                self.ctx, bgpvpn_id,
+                filters={'network_id': [network_id]})[0]['id']
+            self._assert_budget(
+                6, size, 'delete_net_assoc',
+                functools.partial(self.plugin_db.delete_net_assoc, self.ctx,
+                                  assoc_id, bgpvpn_id))
+            self._assert_budget(
+                27, size, 'delete_bgpvpn',
+                functools.partial(self.plugin_db.delete_bgpvpn, self.ctx,
+                                  bgpvpn_id))
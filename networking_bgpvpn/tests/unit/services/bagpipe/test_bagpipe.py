@@ -14,6 +14,7 @@
 #    under the License.
 
 import copy
+import time
 from unittest import mock
 
 import webob.exc
@@ -26,8 +27,10 @@ from neutron.db import db_base_plugin_v2
 from neutron.debug import debug_agent
 from neutron.plugins.ml2 import plugin as ml2_plugin
 from neutron.plugins.ml2 import rpc as ml2_rpc
+from neutron.tests import base
 from neutron.tests.common import helpers
 
+from neutron_lib.api.definitions import bgpvpn as bgpvpn_def
 from neutron_lib.api.definitions import portbindings
 from neutron_lib.callbacks import events
 from neutron_lib import constants as const
@@ -35,6 +38,8 @@ from neutron_lib import context as n_context
 from neutron_lib.plugins import directory
 
 from networking_bgpvpn.neutron.services.service_drivers.bagpipe import bagpipe
+from networking_bgpvpn.neutron.services.service_drivers.bagpipe \
+    import bagpipe_v2
 from networking_bgpvpn.tests.unit.services import test_plugin
 
 from networking_bagpipe.objects import bgpvpn as objs
@@ -277,6 +282,29 @@ class TestBagpipeOVOPushPullMixin(object):
                 ovos_in_call
                 )
 
+    @mock.patch.object(resources_rpc.ResourcesPushRpcApi, 'push')
+    def test_port_assoc_update_unchanged_not_pushed(self, mocked_push):
+        route = {'type': 'prefix', 'prefix': '12.1.0.0/16',
+                 'local_pref': 100}
+        with self.port() as port, \
+                self.bgpvpn() as bgpvpn, \
+                self.assoc_port(bgpvpn['bgpvpn']['id'],
+                                port['port']['id'],
+                                routes=[route]) as port_assoc:
+            path = ('bgpvpn/bgpvpns/%s/port_associations' %
+                    bgpvpn['bgpvpn']['id'])
+            mocked_push.reset_mock()
+            self._update(path, port_assoc['port_association']['id'],
+                         {'port_association': {'routes': [route]}})
+            mocked_push.assert_not_called()
+
+            self._update(path, port_assoc['port_association']['id'],
+                         {'port_association': {
+                             'routes': [dict(route, local_pref=200)]}})
+            mocked_push.assert_called_once_with(
+                mock.ANY, [AnyOfClass(objs.BGPVPNPortAssociation)],
+                'updated')
+
 
 class TestBagpipeServiceDriver(TestBagpipeCommon):
 
@@ -366,6 +394,44 @@ class TestBagpipeServiceDriver(TestBagpipeCommon):
                                     rt,
                                     itf_port['mac_address']))
 
+    def test_bagpipe_associate_disassociate_router_networks(self):
+        driver = self.bgpvpn_plugin.driver
+        with self.router(tenant_id=self._tenant_id) as router, \
+                self.network() as net1, self.network() as net2, \
+                self.subnet(network=net1) as subnet1, \
+                self.subnet(network=net2, cidr='10.0.1.0/24') as subnet2, \
+                self.port(subnet=subnet1), self.port(subnet=subnet2), \
+                self.bgpvpn() as bgpvpn:
+            router_id = router['router']['id']
+            gateway_macs = {}
+            for subnet in (subnet1, subnet2):
+                itf = self._router_interface_action(
+                    'add', router_id, subnet['subnet']['id'], None)
+                itf_port = self.plugin.get_port(self.ctxt, itf['port_id'])
+                gateway_macs[itf_port['network_id']] = itf_port['mac_address']
+            id = bgpvpn['bgpvpn']['id']
+            rt = bgpvpn['bgpvpn']['route_targets']
+            expected = [
+                mock.call(mock.ANY,
+                          _expected_formatted_bgpvpn(id, net_id, rt, mac))
+                for net_id, mac in gateway_macs.items()]
+
+            self.mock_update_rpc.reset_mock()
+            with self.assoc_router(id, router_id):
+                self.assertCountEqual(expected,
+                                      self.mock_update_rpc.call_args_list)
+                self.mock_delete_rpc.reset_mock()
+            self.assertCountEqual(expected,
+                                  self.mock_delete_rpc.call_args_list)
+
+            # the BGPVPN is retrieved once for all the networks
+            with mock.patch.object(driver, 'get_bgpvpn',
+                                   wraps=driver.get_bgpvpn) as get_bgpvpn:
+                driver.delete_router_assoc_postcommit(
+                    self.ctxt, {'id': None, 'router_id': router_id,
+                                'bgpvpn_id': id})
+            get_bgpvpn.assert_called_once_with(self.ctxt, id)
+
     def test_bagpipe_disassociate_net(self):
         mocked_delete = self.mocked_rpc.delete_bgpvpn
         with self.port() as port1:
@@ -492,6 +558,33 @@ class TestBagpipeServiceDriver(TestBagpipeCommon):
 
                 self.assertEqual(expected, actual)
 
+    def test_bagpipe_gateway_mac_cache(self):
+        cfg.CONF.set_override('gateway_mac_cache_ttl', 3600, 'bgpvpn')
+        driver = self.bgpvpn_plugin.driver
+        self.addCleanup(setattr, driver, '_gateway_mac_cache', None)
+        with self.network() as net, \
+                self.subnet(network=net) as subnet, \
+                self.router(tenant_id=self._tenant_id) as router:
+            net_id = net['network']['id']
+            with mock.patch.object(bagpipe, 'get_gateway_macs',
+                                   wraps=bagpipe.get_gateway_macs) as query:
+                for _i in range(2):
+                    self.assertEqual(
+                        {net_id: None},
+                        driver._get_gateway_macs(self.ctxt, [net_id]))
+                self.assertEqual(1, query.call_count)
+
+                # the addition of a router interface invalidates the cache
+                itf = self._router_interface_action('add',
+                                                    router['router']['id'],
+                                                    subnet['subnet']['id'],
+                                                    None)
+                itf_port = self.plugin.get_port(self.ctxt, itf['port_id'])
+                self.assertEqual(
+                    {net_id: itf_port['mac_address']},
+                    driver._get_gateway_macs(self.ctxt, [net_id]))
+                self.assertEqual(2, query.call_count)
+
     def test_bagpipe_get_network_info_for_port(self):
         with self.network() as net, \
                 self.subnet(network=net) as subnet, \
@@ -515,6 +608,78 @@ class TestBagpipeServiceDriver(TestBagpipeCommon):
                 'gateway_mac': itf_port['mac_address']
             }, r)
 
+    def test_bagpipe_networks_with_ports(self):
+        with self.network() as net_up, \
+                self.network() as net_down, \
+                self.network() as net_empty, \
+                self.subnet(network=net_up) as subnet_up, \
+                self.subnet(network=net_down) as subnet_down, \
+                self.port(subnet=subnet_up), \
+                self.port(subnet=subnet_down, admin_state_up=False):
+            net_ids = [net['network']['id']
+                       for net in (net_up, net_down, net_empty)]
+
+            self.assertTrue(bagpipe.network_has_ports(self.ctxt, net_ids[0]))
+            self.assertFalse(bagpipe.network_has_ports(self.ctxt, net_ids[1]))
+            self.assertFalse(bagpipe.network_has_ports(self.ctxt, net_ids[2]))
+            self.assertEqual({net_ids[0]},
+                             bagpipe.get_networks_with_ports(self.ctxt,
+                                                             net_ids))
+            self.assertEqual(set(),
+                             bagpipe.get_networks_with_ports(self.ctxt, []))
+
+    def test_bagpipe_get_networks_for_routers(self):
+        with self.network() as net1, \
+                self.network() as net2, \
+                self.subnet(network=net1, cidr='10.0.1.0/24') as subnet1, \
+                self.subnet(network=net2, cidr='10.0.2.0/24') as subnet2, \
+                self.router(tenant_id=self._tenant_id) as router1, \
+                self.router(tenant_id=self._tenant_id) as router2, \
+                self.router(tenant_id=self._tenant_id) as router3, \
+                self.port(subnet=subnet2) as port2:
+            router_ids = [router['router']['id']
+                          for router in (router1, router2, router3)]
+            for subnet in (subnet1, subnet2):
+                self._router_interface_action('add', router_ids[0],
+                                              subnet['subnet']['id'], None)
+            self._router_interface_action('add', router_ids[1], None,
+                                          port2['port']['id'])
+
+            self.assertEqual(
+                {router_ids[0]: {net1['network']['id'],
+                                 net2['network']['id']},
+                 router_ids[1]: {net2['network']['id']},
+                 router_ids[2]: set()},
+                bagpipe.get_networks_for_routers(self.ctxt, router_ids))
+            self.assertEqual({},
+                             bagpipe.get_networks_for_routers(self.ctxt, []))
+
+    def test_bagpipe_get_network_info_for_ports(self):
+        with self.network() as net, \
+                self.subnet(network=net) as subnet, \
+                self.router(tenant_id=self._tenant_id) as router, \
+                self.port(subnet=subnet) as port1, \
+                self.port(subnet=subnet) as port2:
+            itf = self._router_interface_action('add',
+                                                router['router']['id'],
+                                                subnet['subnet']['id'],
+                                                None)
+            itf_port = self.plugin.get_port(self.ctxt, itf['port_id'])
+            ports = [port1['port'], port2['port']]
+
+            r = bagpipe.get_network_info_for_ports(
+                self.ctxt, [port['id'] for port in ports] + ['unknown'])
+
+            self.assertEqual({
+                port['id']: {
+                    'mac_address': port['mac_address'],
+                    'ip_address': port['fixed_ips'][0]['ip_address'] + "/24",
+                    'gateway_ip': subnet['subnet']['gateway_ip'],
+                    'gateway_mac': itf_port['mac_address']}
+                for port in ports}, r)
+            self.assertEqual({},
+                             bagpipe.get_network_info_for_ports(self.ctxt, []))
+
 
 RT = '12345:1'
 
@@ -554,8 +719,9 @@ class TestBagpipeServiceDriverCallbacks(TestBagpipeCommon,
 
         self.patched_driver = mock.patch.object(
             self.bgpvpn_plugin.driver,
-            '_retrieve_bgpvpn_network_info_for_port',
-            return_value=BGPVPN_INFO)
+            '_retrieve_bgpvpn_network_info_for_ports',
+            side_effect=lambda context, ports: {port['id']: BGPVPN_INFO
+                                                for port in ports})
         self.patched_driver.start()
 
         # we choose an agent of type const.AGENT_TYPE_OFA
@@ -596,6 +762,47 @@ class TestBagpipeServiceDriverCallbacks(TestBagpipeCommon,
                 helpers.HOST)
             self.assertFalse(self.mock_detach_rpc.called)
 
+    def test_bagpipe_callback_to_rpc_update_batched(self):
+        cfg.CONF.set_override('port_batch_interval', 3600, 'bgpvpn')
+        self.addCleanup(setattr, self.bagpipe_driver, '_port_event_batcher',
+                        None)
+        with self.port(arg_list=(portbindings.HOST_ID,),
+                       **{portbindings.HOST_ID: helpers.HOST}) as port1, \
+                self.port(arg_list=(portbindings.HOST_ID,),
+                          **{portbindings.HOST_ID: helpers.HOST}) as port2, \
+                self.port(arg_list=(portbindings.HOST_ID,),
+                          **{portbindings.HOST_ID: helpers.HOST}) as port3:
+            for port in (port1, port2, port3):
+                self._update_port_status(port, const.PORT_STATUS_DOWN)
+            self.mock_attach_rpc.reset_mock()
+            self.mock_detach_rpc.reset_mock()
+            retrieve = (
+                self.bagpipe_driver._retrieve_bgpvpn_network_info_for_ports)
+            retrieve.reset_mock()
+
+            for port in (port1, port2, port3):
+                self._update_port_status(port, const.PORT_STATUS_ACTIVE)
+            # the third port goes down before the batch is flushed
+            self._update_port_status(port3, const.PORT_STATUS_DOWN)
+            self.assertFalse(self.mock_attach_rpc.called)
+            self.assertFalse(self.mock_detach_rpc.called)
+            self.bagpipe_driver.port_event_batcher.flush()
+
+            # the information of the ports is retrieved once
+            retrieve.assert_called_once_with(mock.ANY, [mock.ANY, mock.ANY])
+            self.assertEqual(
+                [mock.call(mock.ANY,
+                           self._build_expected_return_active(port['port']),
+                           helpers.HOST)
+                 for port in (port1, port2)],
+                self.mock_attach_rpc.call_args_list)
+            self.mock_detach_rpc.assert_called_once_with(
+                mock.ANY, self._build_expected_return_down(port3['port']),
+                helpers.HOST)
+            self.assertEqual({'pending': 0, 'batches': 1, 'attached': 2,
+                              'detached': 1, 'merged': 1},
+                             self.bagpipe_driver.port_event_batcher.stats)
+
     def test_bagpipe_callback_to_rpc_update_active2down(self):
         with self.port(arg_list=(portbindings.HOST_ID,),
                        **{portbindings.HOST_ID: helpers.HOST}) as port:
@@ -1053,6 +1260,24 @@ class TestBagpipeServiceDriverV2RPCs(TestBagpipeCommon,
             driver=('networking_bgpvpn.neutron.services.service_drivers.'
                     'bagpipe.bagpipe_v2.BaGPipeBGPVPNDriver'))
 
+    @mock.patch.object(resources_rpc.ResourcesPushRpcApi, 'push')
+    def test_net_assoc_create_bulk_single_push(self, mocked_push):
+        with self.network() as net1, \
+                self.network() as net2, \
+                self.bgpvpn() as bgpvpn:
+            mocked_push.reset_mock()
+            res = self.create_assocs_bulk(
+                bgpvpn['bgpvpn']['id'], 'network_association',
+                [{'network_id': net1['network']['id']},
+                 {'network_id': net2['network']['id']}])
+            self.assertEqual(201, res.status_int)
+
+            mocked_push.assert_called_once_with(
+                mock.ANY,
+                [AnyOfClass(objs.BGPVPNNetAssociation),
+                 AnyOfClass(objs.BGPVPNNetAssociation)],
+                'created')
+
     @mock.patch.object(resources_rpc.ResourcesPushRpcApi, 'push')
     def test_router_itf_event_router_assoc(self, mocked_push):
         with self.network() as net, \
@@ -1120,3 +1345,192 @@ class TestBagpipeServiceDriverV2RPCs(TestBagpipeCommon,
                     continue
                 for subnet in ovo.all_subnets(net['network']['id']):
                     self.assertIsNone(subnet['gateway_mac'])
+
+    @mock.patch.object(resources_rpc.ResourcesPushRpcApi, 'push')
+    def test_push_coalescing(self, mocked_push):
+        cfg.CONF.set_override('push_coalescing_interval', 3600, 'bgpvpn')
+        driver = directory.get_plugin(bgpvpn_def.ALIAS).driver
+        self.addCleanup(setattr, driver, '_push_coalescer', None)
+
+        def _assoc_pushes():
+            # leave the pushes of other resources out
+            return [call for call in mocked_push.call_args_list
+                    if isinstance(call[0][1][0], objs.BGPVPNNetAssociation)]
+
+        with self.network() as net, \
+                self.bgpvpn() as bgpvpn:
+            id = bgpvpn['bgpvpn']['id']
+            with self.assoc_net(id, net['network']['id']):
+                self._update('bgpvpn/bgpvpns', id,
+                             {'bgpvpn': {'route_targets': ['64512:2']}})
+                self._update('bgpvpn/bgpvpns', id,
+                             {'bgpvpn': {'route_targets': ['64512:3']}})
+                self.assertEqual([], _assoc_pushes())
+                driver.push_coalescer.flush()
+
+                # a single push, with the latest state
+                self.assertEqual(
+                    [mock.call(mock.ANY,
+                               [AnyOfClass(objs.BGPVPNNetAssociation)],
+                               'created')],
+                    _assoc_pushes())
+                assoc = _assoc_pushes()[0][0][1][0]
+                self.assertEqual(['64512:3'], assoc.bgpvpn.route_targets)
+                self.assertEqual({'pending': 0, 'merged': 2, 'dropped': 0,
+                                  'pushed': 1}, driver.push_coalescer.stats)
+            # the second association is created then deleted, only the
+            # deletion of the first one is pushed
+            with self.assoc_net(id, net['network']['id']):
+                pass
+            driver.push_coalescer.flush()
+            self.assertEqual(2, len(_assoc_pushes()))
+            self.assertEqual('deleted', _assoc_pushes()[1][0][2])
+            self.assertEqual(1, driver.push_coalescer.stats['dropped'])
+
+
+class TestGatewayMacCache(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestGatewayMacCache, self).setUp()
+        self.query = mock.patch.object(
+            bagpipe, 'get_gateway_macs',
+            side_effect=lambda context, network_ids: {
+                network_id: 'mac-' + network_id
+                for network_id in network_ids if network_id != 'c'}).start()
+        self.cache = bagpipe.GatewayMacCache(3600)
+
+    def test_cached(self):
+        self.assertEqual({'a': 'mac-a', 'c': None},
+                         self.cache.get('ctx', ['a', 'c']))
+        self.assertEqual({'a': 'mac-a', 'b': 'mac-b', 'c': None},
+                         self.cache.get('ctx', ['a', 'b', 'c']))
+        self.query.assert_called_with('ctx', ['b'])
+        self.assertEqual(2, self.query.call_count)
+        self.assertEqual({'size': 3, 'hits': 2, 'misses': 3,
+                          'hit_rate': 0.4, 'expirations': 0,
+                          'invalidations': 0}, self.cache.stats)
+
+    def test_invalidated(self):
+        self.cache.get('ctx', ['a', 'b'])
+        self.cache.invalidate('a')
+        self.cache.get('ctx', ['a', 'b'])
+        self.query.assert_called_with('ctx', ['a'])
+        self.assertEqual(1, self.cache.stats['invalidations'])
+
+    def test_not_cached_if_invalidated_while_querying(self):
+        def _query(context, network_ids):
+            self.cache.invalidate('a')
+            return {'a': 'old-mac'}
+        self.query.side_effect = _query
+        self.assertEqual({'a': 'old-mac'}, self.cache.get('ctx', ['a']))
+        self.assertEqual(0, self.cache.stats['size'])
+
+    def test_expired(self):
+        self.cache.ttl = 0
+        self.cache.get('ctx', ['a'])
+        self.cache.get('ctx', ['a'])
+        self.assertEqual(2, self.query.call_count)
+        self.assertEqual(1, self.cache.stats['expirations'])
+
+
+class TestPortEventBatcher(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestPortEventBatcher, self).setUp()
+        self.sent = []
+        self.batcher = bagpipe.PortEventBatcher(
+            self._sender('attach'), self._sender('detach'), 3600, 10)
+        self.addCleanup(self.batcher.flush)
+
+    def _sender(self, event):
+        def _send(context, ports, host):
+            self.assertTrue(context.is_admin)
+            self.sent.append((event, host, [port['id'] for port in ports]))
+        return _send
+
+    def test_batched_per_host(self):
+        for host, port_id, event in (('host1', 'a', 'attach'),
+                                     ('host2', 'b', 'attach'),
+                                     ('host1', 'c', 'detach'),
+                                     ('host1', 'd', 'attach'),
+                                     ('host1', 'd', 'detach'),
+                                     ('host1', 'e', 'detach'),
+                                     ('host1', 'e', 'attach')):
+            getattr(self.batcher, event)(host, {'id': port_id})
+        self.assertEqual([], self.sent)
+
+        self.batcher.flush('host1')
+        # detached then attached again, a port is sent both ways
+        self.assertEqual([('detach', 'host1', ['c', 'd', 'e']),
+                          ('attach', 'host1', ['a', 'e'])], self.sent)
+        self.batcher.flush()
+        self.assertEqual(('attach', 'host2', ['b']), self.sent[-1])
+        self.assertEqual({'pending': 0, 'batches': 2, 'attached': 3,
+                          'detached': 3, 'merged': 1}, self.batcher.stats)
+
+    def test_flushed_when_full(self):
+        self.batcher.size = 3
+        for port_id in ('a', 'b', 'a'):
+            self.batcher.attach('host1', {'id': port_id})
+        self.assertEqual([], self.sent)
+        self.batcher.detach('host1', {'id': 'c'})
+        self.assertEqual([('detach', 'host1', ['c']),
+                          ('attach', 'host1', ['a', 'b'])], self.sent)
+
+    def test_flushed_after_interval(self):
+        self.batcher.interval = 0.01
+        self.batcher.attach('host1', {'id': 'a'})
+        for _i in range(100):
+            if self.sent:
+                break
+            time.sleep(0.05)
+        self.assertEqual([('attach', 'host1', ['a'])], self.sent)
+
+
+class TestPushCoalescer(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestPushCoalescer, self).setUp()
+        self.push = mock.Mock()
+        self.coalescer = bagpipe_v2.PushCoalescer(self.push, 3600)
+        self.addCleanup(self.coalescer.flush)
+
+    @staticmethod
+    def _assoc(id, state=None):
+        return mock.Mock(id=id, state=state,
+                         obj_name=mock.Mock(return_value='Assoc'))
+
+    def test_event_types_merged(self):
+        for id, event_types, pushed_event_type in (
+                ('a', ['created', 'updated'], 'created'),
+                ('b', ['updated', 'updated'], 'updated'),
+                ('c', ['updated', 'deleted'], 'deleted'),
+                ('d', ['created', 'deleted'], None),
+                ('e', ['deleted'], 'deleted')):
+            for index, event_type in enumerate(event_types):
+                self.coalescer.add('ctx', [self._assoc(id, index)],
+                                   event_type)
+        self.assertFalse(self.push.called)
+        self.coalescer.flush()
+
+        pushed = {assoc.id: (event_type, assoc.state)
+                  for call in self.push.call_args_list
+                  for assoc, event_type in ((a, call[0][2])
+                                            for a in call[0][1])}
+        self.assertEqual({'a': ('created', 1),
+                          'b': ('updated', 1),
+                          'c': ('deleted', 1),
+                          'e': ('deleted', 0)}, pushed)
+        # one push per event type
+        self.assertEqual(3, self.push.call_count)
+        self.assertEqual({'pending': 0, 'merged': 4, 'dropped': 1,
+                          'pushed': 4}, self.coalescer.stats)
+
+    def test_flushed_after_interval(self):
+        self.coalescer.interval = 0.01
+        self.coalescer.add('ctx', [self._assoc('a')], 'updated')
+        for _i in range(100):
+            if self.push.called:
+                break
+            time.sleep(0.05)
+        self.push.assert_called_once_with('ctx', [mock.ANY], 'updated')
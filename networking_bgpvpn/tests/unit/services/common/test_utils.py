@@ -16,6 +16,7 @@
 from neutron.tests import base
 
 from networking_bgpvpn.neutron.services.common.utils import filter_resource
+from networking_bgpvpn.neutron.services.common.utils import RangeSet
 
 
 class TestFilterResource(base.BaseTestCase):
@@ -59,3 +60,43 @@ class TestFilterResource(base.BaseTestCase):
             'fake_attribute': ['wrong_fake_value1', 'fake_value2'],
         }
         self.assertFalse(filter_resource(self._fake_resource_list, filters))
+
+
+class TestRangeSet(base.BaseTestCase):
+
+    def test_from_string(self):
+        self.assertEqual([(1, 2), (5, 5), (8, 10)],
+                         RangeSet.from_string('8-10,1-2,5').ranges())
+
+    def test_overlapping_and_adjacent_ranges_merged(self):
+        self.assertEqual([(1, 10), (12, 12)],
+                         RangeSet.from_string('1-4,3-6,7-10,12').ranges())
+
+    def test_contains(self):
+        range_set = RangeSet.from_string('300-1000,1500,2000-4000000')
+        for value in (300, 1000, 1500, 2000, 123456, 4000000):
+            self.assertIn(value, range_set)
+        for value in (0, 299, 1001, 1499, 1501, 1999, 4000001):
+            self.assertNotIn(value, range_set)
+
+    def test_iter_and_len(self):
+        range_set = RangeSet.from_string('5,1-2,8')
+        self.assertEqual([1, 2, 5, 8], list(range_set))
+        self.assertEqual(4, len(range_set))
+        self.assertEqual(3999701,
+                         len(RangeSet.from_string('300-4000000')))
+
+    def test_next_after(self):
+        range_set = RangeSet.from_string('300-1000,1500')
+        self.assertEqual(300, range_set.next_after(0))
+        self.assertEqual(301, range_set.next_after(300))
+        self.assertEqual(1500, range_set.next_after(1000))
+        self.assertEqual(1500, range_set.next_after(1200))
+        self.assertIsNone(range_set.next_after(1500))
+
+    def test_empty(self):
+        range_set = RangeSet()
+        self.assertEqual([], list(range_set))
+        self.assertEqual(0, len(range_set))
+        self.assertNotIn(1, range_set)
+        self.assertIsNone(range_set.next_after(0))
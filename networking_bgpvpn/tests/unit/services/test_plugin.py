@@ -15,6 +15,7 @@
 
 import contextlib
 import copy
+import threading
 import unittest
 from unittest import mock
 
@@ -240,6 +241,31 @@ class BgpvpnTestCaseMixin(test_db_base_plugin_v2.NeutronDbPluginV2TestCase,
             if res.status_int >= 400:
                 raise http_client_error(del_req, res)
 
+    def create_bgpvpns_bulk(self, items):
+        """Create several BGPVPNs with a single request"""
+        data = {'bgpvpns': [{'bgpvpn': dict(self.bgpvpn_data['bgpvpn'],
+                                            **item)}
+                            for item in items]}
+        req = self.new_create_request('bgpvpn/bgpvpns', data, fmt='json')
+        return req.get_response(self.ext_api)
+
+    def create_assocs_bulk(self, bgpvpn_id, resource, items):
+        """Create several associations of a BGPVPN with a single request"""
+        collection = '%ss' % resource
+        data = {collection: [{resource: dict(item,
+                                             tenant_id=self._tenant_id)}
+                             for item in items]}
+        req = self.new_create_request(
+            'bgpvpn/bgpvpns',
+            data=data,
+            fmt='json',
+            id=bgpvpn_id,
+            subresource=collection)
+        return req.get_response(self.ext_api)
+
+    def show_bgpvpn(self, bgpvpn_id):
+        return self._show('bgpvpn/bgpvpns', bgpvpn_id)['bgpvpn']
+
     def show_port_assoc(self, bgpvpn_id, port_assoc_id):
         req = self.new_show_request("bgpvpn/bgpvpns", bgpvpn_id,
                                     subresource="port_associations",
@@ -252,17 +278,17 @@ class BgpvpnTestCaseMixin(test_db_base_plugin_v2.NeutronDbPluginV2TestCase,
 
 class TestBGPVPNServicePlugin(BgpvpnTestCaseMixin):
 
-    def test___available_targets_disabled_auto_alloc(self):
+    def test___available_target_ids_disabled_auto_alloc(self):
         with mock.patch.object(self.bgpvpn_plugin,
                                'bgpvpn_config') as config:
             config.region_asn = ''
             # to test exception message we have to use assertRaises from
             # unittest library instead of testtools
             with unittest.TestCase.assertRaises(self, ValueError) as cm:
-                self.bgpvpn_plugin._available_targets()
+                self.bgpvpn_plugin._available_target_ids()
             self.assertIn('is required for auto-allocation', str(cm.exception))
 
-    def test___available_targets_incorrect_asn_notation(self):
+    def test___available_target_ids_incorrect_asn_notation(self):
         # notation is not dotted
         with mock.patch.object(self.bgpvpn_plugin,
                                'bgpvpn_config') as config:
@@ -270,7 +296,7 @@ class TestBGPVPNServicePlugin(BgpvpnTestCaseMixin):
             # to test exception message we have to use assertRaises from
             # unittest library instead of testtools
             with unittest.TestCase.assertRaises(self, ValueError) as cm:
-                self.bgpvpn_plugin._available_targets()
+                self.bgpvpn_plugin._available_target_ids()
             self.assertIn('4-byte dotted notation', str(cm.exception))
         # ASn out of private range
         with mock.patch.object(self.bgpvpn_plugin,
@@ -279,17 +305,17 @@ class TestBGPVPNServicePlugin(BgpvpnTestCaseMixin):
             # to test exception message we have to use assertRaises from
             # unittest library instead of testtools
             with unittest.TestCase.assertRaises(self, ValueError) as cm:
-                self.bgpvpn_plugin._available_targets()
+                self.bgpvpn_plugin._available_target_ids()
             self.assertIn('private range', str(cm.exception))
 
-    def test___available_targets(self):
+    def test___available_target_ids(self):
         with mock.patch.object(self.bgpvpn_plugin,
                                'bgpvpn_config') as config:
             config.region_asn = '65130.4'
             config.target_id_range = '1-2,5,8'
-            self.assertEqual(['4268359684:1', '4268359684:2', '4268359684:5',
-                              '4268359684:8'],
-                             self.bgpvpn_plugin._available_targets())
+            asn, target_ids = self.bgpvpn_plugin._available_target_ids()
+            self.assertEqual(4268359684, asn)
+            self.assertEqual([1, 2, 5, 8], list(target_ids))
 
     def test_bgpvpn_auto_allocation_targets(self):
         with self.bgpvpn(export_targets=['4268359684:300'],
@@ -324,6 +350,133 @@ class TestBGPVPNServicePlugin(BgpvpnTestCaseMixin):
             self.assertEqual(['4268359684:303'],
                              bgpvpn_3['bgpvpn']['export_targets'])
 
+    def test_bgpvpn_auto_allocation_targets_released(self):
+        with self.bgpvpn(export_targets=[],
+                         import_targets=[],
+                         route_targets=[]) as bgpvpn_1:
+            self.assertEqual(['4268359684:300'],
+                             bgpvpn_1['bgpvpn']['route_targets'])
+            with self.bgpvpn(export_targets=[],
+                             import_targets=[],
+                             route_targets=[]) as bgpvpn_2:
+                self.assertEqual(['4268359684:301'],
+                                 bgpvpn_2['bgpvpn']['route_targets'])
+            # the target of the deleted bgpvpn_2 can be allocated again
+            with self.bgpvpn(export_targets=[],
+                             import_targets=[],
+                             route_targets=[]) as bgpvpn_3:
+                self.assertEqual(['4268359684:301'],
+                                 bgpvpn_3['bgpvpn']['route_targets'])
+
+                # the auto-allocated target of bgpvpn_1 is released when no
+                # longer used, but not the one still used by bgpvpn_3
+                data = {'bgpvpn': {'route_targets': ['4268359684:301'],
+                                   'import_targets': ['64512:1'],
+                                   'export_targets': ['64512:1']}}
+                self._update('bgpvpn/bgpvpns', bgpvpn_1['bgpvpn']['id'],
+                             data)
+                with self.bgpvpn(export_targets=[],
+                                 import_targets=[],
+                                 route_targets=[]) as bgpvpn_4:
+                    self.assertEqual(['4268359684:300'],
+                                     bgpvpn_4['bgpvpn']['route_targets'])
+                    with self.bgpvpn(export_targets=[],
+                                     import_targets=[],
+                                     route_targets=[]) as bgpvpn_5:
+                        self.assertEqual(['4268359684:302'],
+                                         bgpvpn_5['bgpvpn']['route_targets'])
+
+    def test_bgpvpn_auto_allocation_target_released_on_failure(self):
+        with mock.patch.object(self.bgpvpn_plugin.driver, 'create_bgpvpn',
+                               side_effect=RuntimeError):
+            req_data = {
+                'bgpvpn': {
+                    'tenant_id': self._tenant_id,
+                    'export_targets': [],
+                    'import_targets': [],
+                    'route_targets': [],
+                },
+            }
+            req = self.new_create_request(
+                'bgpvpn/bgpvpns', req_data, fmt='json')
+            res = req.get_response(self.ext_api)
+            self.assertEqual(500, res.status_int)
+        with self.bgpvpn(export_targets=[],
+                         import_targets=[],
+                         route_targets=[]) as bgpvpn_1:
+            self.assertEqual(['4268359684:300'],
+                             bgpvpn_1['bgpvpn']['route_targets'])
+
+    def test_bgpvpn_create_bulk_auto_allocation_targets(self):
+        bgpvpn_db = self.bgpvpn_plugin.driver.bgpvpn_db
+        with self.bgpvpn(export_targets=['4268359684:300'],
+                         import_targets=[],
+                         route_targets=[]), \
+                mock.patch.object(
+                    bgpvpn_db, 'allocate_target_ids',
+                    wraps=bgpvpn_db.allocate_target_ids) as mock_allocate:
+            res = self.create_bgpvpns_bulk([
+                {'name': 'vpn-a', 'export_targets': [],
+                 'import_targets': [], 'route_targets': []},
+                {'name': 'vpn-b', 'export_targets': [],
+                 'import_targets': ['4268359684:302'], 'route_targets': []},
+                {'name': 'vpn-c', 'export_targets': [],
+                 'import_targets': [], 'route_targets': []}])
+            self.assertEqual(201, res.status_int)
+            bgpvpns = self.deserialize('json', res)['bgpvpns']
+            # 300 is already used, 302 is set manually in the batch
+            self.assertEqual(
+                [['4268359684:301'], [], ['4268359684:303']],
+                [bgpvpn['route_targets'] for bgpvpn in bgpvpns])
+            self.assertEqual(
+                [['4268359684:301'], ['4268359684:302'],
+                 ['4268359684:303']],
+                [bgpvpn['import_targets'] for bgpvpn in bgpvpns])
+            # a single allocation for the batch, then one per target found
+            # to be set manually
+            self.assertEqual([mock.call(mock.ANY, 2), mock.call(mock.ANY, 1),
+                              mock.call(mock.ANY, 1)],
+                             mock_allocate.call_args_list)
+
+    def test_bgpvpn_create_bulk_target_released_on_failure(self):
+        with mock.patch.object(self.bgpvpn_plugin.driver.bgpvpn_db,
+                               'create_bgpvpns', side_effect=RuntimeError):
+            res = self.create_bgpvpns_bulk([
+                {'export_targets': [], 'import_targets': [],
+                 'route_targets': []}] * 2)
+            self.assertEqual(500, res.status_int)
+        self.assertEqual([], self._list('bgpvpn/bgpvpns')['bgpvpns'])
+        with self.bgpvpn(export_targets=[],
+                         import_targets=[],
+                         route_targets=[]) as bgpvpn_1:
+            self.assertEqual(['4268359684:300'],
+                             bgpvpn_1['bgpvpn']['route_targets'])
+
+    def test_bgpvpn_create_bulk_manual_target_released_on_failure(self):
+        bgpvpn_db = self.bgpvpn_plugin.driver.bgpvpn_db
+        with self.bgpvpn(export_targets=['4268359684:300'],
+                         import_targets=[],
+                         route_targets=[]):
+            with mock.patch.object(bgpvpn_db, 'create_bgpvpns',
+                                   side_effect=RuntimeError):
+                # 300 is reserved for the existing BGPVPN, 301 for the
+                # target set manually in the batch, and 302 is allocated
+                res = self.create_bgpvpns_bulk([
+                    {'export_targets': [], 'import_targets': [],
+                     'route_targets': []},
+                    {'export_targets': [],
+                     'import_targets': ['4268359684:301'],
+                     'route_targets': []}])
+                self.assertEqual(500, res.status_int)
+            # only the target of the existing BGPVPN remains reserved
+            res = self.create_bgpvpns_bulk([
+                {'export_targets': [], 'import_targets': [],
+                 'route_targets': []}] * 2)
+            self.assertEqual(
+                [['4268359684:301'], ['4268359684:302']],
+                [bgpvpn['route_targets']
+                 for bgpvpn in self.deserialize('json', res)['bgpvpns']])
+
     def test_bgpvpn_create_without_targets(self):
         with mock.patch.object(self.bgpvpn_plugin,
                                'bgpvpn_config') as config:
@@ -346,6 +499,121 @@ class TestBGPVPNServicePlugin(BgpvpnTestCaseMixin):
                           self.deserialize('json',
                                            res)['NeutronError']['message'])
 
+    def test_bgpvpn_list_paginated_and_sorted(self):
+        with self.bgpvpn(name='vpn-c'), \
+                self.bgpvpn(name='vpn-a'), \
+                self.bgpvpn(name='vpn-b'), \
+                mock.patch.object(bgpvpn_db.BGPVPNPluginDb,
+                                  '_get_bgpvpn',
+                                  wraps=self.bgpvpn_plugin.driver.bgpvpn_db.
+                                  _get_bgpvpn) as mock_get_marker:
+            params = 'limit=2&sort_key=name&sort_dir=desc'
+            page = self._list('bgpvpn/bgpvpns', query_params=params)
+            self.assertEqual(['vpn-c', 'vpn-b'],
+                             [b['name'] for b in page['bgpvpns']])
+            mock_get_marker.assert_not_called()
+
+            marker = page['bgpvpns'][-1]['id']
+            params += '&marker=%s' % marker
+            page = self._list('bgpvpn/bgpvpns', query_params=params)
+            self.assertEqual(['vpn-a'], [b['name'] for b in page['bgpvpns']])
+            mock_get_marker.assert_called_once_with(mock.ANY, marker)
+
+    def test_bgpvpn_list_invalid_sort_key(self):
+        with self.bgpvpn():
+            self._list('bgpvpn/bgpvpns',
+                       query_params='sort_key=route_targets&sort_dir=asc',
+                       expected_code=webob.exc.HTTPBadRequest.code)
+
+    def test_bgpvpn_net_assoc_list_paginated(self):
+        with self.bgpvpn() as bgpvpn, \
+                self.network() as net1, \
+                self.network() as net2, \
+                self.network() as net3:
+            bgpvpn_id = bgpvpn['bgpvpn']['id']
+            with self.assoc_net(bgpvpn_id, net1['network']['id']), \
+                    self.assoc_net(bgpvpn_id, net2['network']['id']), \
+                    self.assoc_net(bgpvpn_id, net3['network']['id']):
+                res = 'bgpvpn/bgpvpns/%s/network_associations' % bgpvpn_id
+                assocs = []
+                marker = None
+                for _ in range(3):
+                    params = 'limit=1&sort_key=network_id&sort_dir=asc'
+                    if marker:
+                        params += '&marker=%s' % marker
+                    page = self._list(res, query_params=params)
+                    self.assertEqual(1, len(page['network_associations']))
+                    marker = page['network_associations'][0]['id']
+                    assocs.extend(page['network_associations'])
+                self.assertEqual(
+                    sorted(net['network']['id']
+                           for net in (net1, net2, net3)),
+                    [assoc['network_id'] for assoc in assocs])
+
+    def test_bgpvpn_net_assoc_create_bulk(self):
+        with self.bgpvpn() as bgpvpn, \
+                self.network() as net1, \
+                self.network() as net2, \
+                mock.patch.object(self.bgpvpn_plugin.driver,
+                                  'create_net_assocs_postcommit') as \
+                mock_postcommit:
+            bgpvpn_id = bgpvpn['bgpvpn']['id']
+            net_ids = [net1['network']['id'], net2['network']['id']]
+            res = self.create_assocs_bulk(
+                bgpvpn_id, 'network_association',
+                [{'network_id': net_id} for net_id in net_ids])
+            self.assertEqual(webob.exc.HTTPCreated.code, res.status_int)
+            assocs = self.deserialize('json', res)['network_associations']
+            self.assertEqual(net_ids,
+                             [assoc['network_id'] for assoc in assocs])
+            mock_postcommit.assert_called_once_with(mock.ANY, mock.ANY)
+            self.assertEqual(
+                [assoc['id'] for assoc in assocs],
+                [assoc['id'] for assoc in mock_postcommit.call_args[0][1]])
+            self.assertEqual(sorted(net_ids),
+                             sorted(self.show_bgpvpn(bgpvpn_id)['networks']))
+
+    def test_bgpvpn_net_assoc_create_bulk_already_associated(self):
+        with self.bgpvpn() as bgpvpn, \
+                self.network() as net1, \
+                self.network() as net2:
+            bgpvpn_id = bgpvpn['bgpvpn']['id']
+            with self.assoc_net(bgpvpn_id, net2['network']['id']):
+                res = self.create_assocs_bulk(
+                    bgpvpn_id, 'network_association',
+                    [{'network_id': net1['network']['id']},
+                     {'network_id': net2['network']['id']}])
+                self.assertEqual(webob.exc.HTTPBadRequest.code,
+                                 res.status_int)
+                # nothing was created
+                self.assertEqual([net2['network']['id']],
+                                 self.show_bgpvpn(bgpvpn_id)['networks'])
+
+    def test_bgpvpn_net_assoc_create_bulk_unknown_network(self):
+        with self.bgpvpn() as bgpvpn, \
+                self.network() as net:
+            bgpvpn_id = bgpvpn['bgpvpn']['id']
+            res = self.create_assocs_bulk(
+                bgpvpn_id, 'network_association',
+                [{'network_id': net['network']['id']},
+                 {'network_id': _uuid()}])
+            self.assertEqual(webob.exc.HTTPNotFound.code, res.status_int)
+            self.assertEqual([], self.show_bgpvpn(bgpvpn_id)['networks'])
+
+    def test_bgpvpn_router_assoc_create_bulk(self):
+        with self.bgpvpn() as bgpvpn, \
+                self.router(tenant_id=self._tenant_id) as router1, \
+                self.router(tenant_id=self._tenant_id) as router2:
+            bgpvpn_id = bgpvpn['bgpvpn']['id']
+            router_ids = [router1['router']['id'], router2['router']['id']]
+            res = self.create_assocs_bulk(
+                bgpvpn_id, 'router_association',
+                [{'router_id': router_id} for router_id in router_ids])
+            self.assertEqual(webob.exc.HTTPCreated.code, res.status_int)
+            assocs = self.deserialize('json', res)['router_associations']
+            self.assertEqual(router_ids,
+                             [assoc['router_id'] for assoc in assocs])
+
     def test_bgpvpn_net_assoc_create(self):
         with self.network() as net, \
                 self.bgpvpn() as bgpvpn, \
@@ -938,6 +1206,46 @@ class TestBGPVPNServicePlugin(BgpvpnTestCaseMixin):
             self.assertIn("differing from type of associated BGPVPN",
                           str(res.body))
 
+    def test_bgpvpn_port_assoc_create_bulk_bgpvpn_routes(self):
+        with self.port() as port1, \
+                self.port() as port2, \
+                self.bgpvpn() as bgpvpn, \
+                self.bgpvpn() as bgpvpn_a, \
+                self.bgpvpn() as bgpvpn_b, \
+                self.bgpvpn(type='l2') as bgpvpn_l2:
+            bgpvpn_id = bgpvpn['bgpvpn']['id']
+            routes = [{'type': 'bgpvpn', 'bgpvpn_id': route_bgpvpn['id']}
+                      for route_bgpvpn in (bgpvpn_a['bgpvpn'],
+                                           bgpvpn_b['bgpvpn'])]
+            with mock.patch.object(
+                    self.bgpvpn_plugin, 'get_bgpvpns',
+                    wraps=self.bgpvpn_plugin.get_bgpvpns) as mock_list, \
+                    mock.patch.object(
+                        self.bgpvpn_plugin, 'get_bgpvpn',
+                        wraps=self.bgpvpn_plugin.get_bgpvpn) as mock_get:
+                res = self.create_assocs_bulk(
+                    bgpvpn_id, 'port_association',
+                    [{'port_id': port['port']['id'], 'routes': routes}
+                     for port in (port1, port2)])
+                self.assertEqual(webob.exc.HTTPCreated.code, res.status_int)
+                # the BGPVPNs of all the routes are retrieved at once
+                mock_list.assert_called_once_with(
+                    mock.ANY, filters={'id': mock.ANY},
+                    fields=['id', 'type', 'tenant_id'])
+                self.assertCountEqual(
+                    [bgpvpn_a['bgpvpn']['id'], bgpvpn_b['bgpvpn']['id']],
+                    mock_list.call_args[1]['filters']['id'])
+                mock_get.assert_called_once_with(mock.ANY, bgpvpn_id)
+
+            res = self.create_assocs_bulk(
+                bgpvpn_id, 'port_association',
+                [{'port_id': port1['port']['id'],
+                  'routes': [{'type': 'bgpvpn',
+                              'bgpvpn_id': bgpvpn_l2['bgpvpn']['id']}]}])
+            self.assertEqual(webob.exc.HTTPBadRequest.code, res.status_int)
+            self.assertIn("differing from type of associated BGPVPN",
+                          str(res.body))
+
 
 class TestBGPVPNServiceDriverDB(BgpvpnTestCaseMixin):
 
@@ -955,16 +1263,77 @@ class TestBGPVPNServiceDriverDB(BgpvpnTestCaseMixin):
     def test_create_bgpvpn(self, mock_create_db,
                            mock_create_precommit,
                            mock_create_postcommit):
-        mock_create_db.return_value = self.converted_data['bgpvpn']
+        db_bgpvpn = dict(self.converted_data['bgpvpn'],
+                         id=uuidutils.generate_uuid())
+        mock_create_db.return_value = db_bgpvpn
         with self.bgpvpn(do_delete=False):
             self.assertTrue(mock_create_db.called)
             self.assertDictSupersetOf(
                 self.converted_data['bgpvpn'],
                 mock_create_db.call_args[0][1])
             mock_create_precommit.assert_called_once_with(
-                mock.ANY, self.converted_data['bgpvpn'])
+                mock.ANY, db_bgpvpn)
             mock_create_postcommit.assert_called_once_with(
-                mock.ANY, self.converted_data['bgpvpn'])
+                mock.ANY, db_bgpvpn)
+
+    @mock.patch.object(driver_api.BGPVPNDriver,
+                       'create_bgpvpn_postcommit')
+    @mock.patch.object(driver_api.BGPVPNDriver,
+                       'create_bgpvpn_precommit')
+    def test_create_bgpvpn_bulk(self, mock_create_precommit,
+                                mock_create_postcommit):
+        res = self.create_bgpvpns_bulk([{'name': 'vpn-a'},
+                                        {'name': 'vpn-b'}])
+        self.assertEqual(201, res.status_int)
+        bgpvpns = self.deserialize('json', res)['bgpvpns']
+        self.assertEqual(
+            [mock.call(mock.ANY, bgpvpn) for bgpvpn in bgpvpns],
+            mock_create_precommit.call_args_list)
+        self.assertEqual(
+            [mock.call(mock.ANY, bgpvpn) for bgpvpn in bgpvpns],
+            mock_create_postcommit.call_args_list)
+
+    @mock.patch.object(driver_api.BGPVPNDriver,
+                       'update_bgpvpn_postcommit')
+    @mock.patch.object(driver_api.BGPVPNDriver,
+                       'create_bgpvpn_postcommit')
+    def test_async_postcommit(self, mock_create_postcommit,
+                              mock_update_postcommit):
+        cfg.CONF.set_override('postcommit_workers', 2, 'bgpvpn')
+        blocked = threading.Event()
+        mock_create_postcommit.side_effect = lambda *args: blocked.wait()
+        driver = directory.get_plugin(bgpvpn_def.ALIAS).driver
+        self.addCleanup(setattr, driver, '_postcommit_pool', None)
+        with self.bgpvpn() as bgpvpn:
+            # the API request did not wait for the postcommit
+            self.assertFalse(blocked.is_set())
+            id = bgpvpn['bgpvpn']['id']
+            self._update('bgpvpn/bgpvpns', id,
+                         {'bgpvpn': {'name': 'foo'}})
+            # the update waits for the creation of the BGPVPN
+            self.assertFalse(mock_update_postcommit.called)
+            blocked.set()
+            driver.postcommit_pool.shutdown()
+        mock_create_postcommit.assert_called_once_with(mock.ANY,
+                                                       mock.ANY)
+        self.assertEqual(id, mock_create_postcommit.call_args[0][1]['id'])
+        self.assertEqual(
+            'foo', mock_update_postcommit.call_args[0][2]['name'])
+        self.assertEqual(2, driver.postcommit_pool.stats['processed'])
+
+    def test_create_bgpvpn_bulk_precommit_fails(self):
+        with mock.patch.object(driver_api.BGPVPNDriver,
+                               'create_bgpvpn_precommit',
+                               side_effect=[None, extensions.bgpvpn.
+                                            BGPVPNDriverError(
+                                                method='precommit method')]):
+            res = self.create_bgpvpns_bulk([{'name': 'vpn-a'},
+                                            {'name': 'vpn-b'}])
+            self.assertEqual(webob.exc.HTTPError.code, res.status_int)
+
+            # Assert that none of the bgpvpns has been created
+            list = self._list('bgpvpn/bgpvpns', fmt='json')
+            self.assertEqual([], list['bgpvpns'])
 
     def test_create_bgpvpn_precommit_fails(self):
         with mock.patch.object(driver_api.BGPVPNDriver,
@@ -1175,7 +1544,9 @@ class TestBGPVPNServiceDriverDB(BgpvpnTestCaseMixin):
                     self._list(res)
                     mock_get_db.assert_called_once_with(mock.ANY,
                                                         bgpvpn_id,
-                                                        mock.ANY, mock.ANY)
+                                                        mock.ANY, mock.ANY,
+                                                        [('id', True)], None,
+                                                        None, False)
 
     @mock.patch.object(driver_api.BGPVPNDriver,
                        'delete_net_assoc_precommit')
@@ -1304,7 +1675,9 @@ class TestBGPVPNServiceDriverDB(BgpvpnTestCaseMixin):
                     self._list(res)
                     mock_get_db.assert_called_once_with(mock.ANY,
                                                         bgpvpn_id,
-                                                        mock.ANY, mock.ANY)
+                                                        mock.ANY, mock.ANY,
+                                                        [('id', True)], None,
+                                                        None, False)
 
     @mock.patch.object(driver_api.BGPVPNDriver,
                        'delete_router_assoc_precommit')
@@ -1440,7 +1813,9 @@ class TestBGPVPNServiceDriverDB(BgpvpnTestCaseMixin):
             self._list(res)
             mock_get_db.assert_called_once_with(mock.ANY,
                                                 bgpvpn_id,
-                                                mock.ANY, mock.ANY)
+                                                mock.ANY, mock.ANY,
+                                                [('id', True)], None,
+                                                None, False)
 
     @mock.patch.object(driver_api.BGPVPNDriverRC,
                        'delete_port_assoc_precommit')
@@ -1505,7 +1880,8 @@ class TestBGPVPNServiceDriverDB(BgpvpnTestCaseMixin):
             mock_postcommit.assert_called_once_with(
                 mock.ANY,
                 assoc['port_association'],
-                new_port_assoc['port_association']
+                new_port_assoc['port_association'],
+                routes_delta=bgpvpn_db.RoutesDelta([], [], [])
                 )
 
     @mock.patch.object(driver_api.BGPVPNDriverRC,
@@ -0,0 +1,83 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+from unittest import mock
+
+from neutron.tests import base
+from neutron_lib import context
+
+from networking_bgpvpn.neutron.services.service_drivers import postcommit
+
+
+class TestPostcommitPool(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestPostcommitPool, self).setUp()
+        self.pool = postcommit.PostcommitPool(workers=3, queue_size=100)
+        self.addCleanup(self.pool.shutdown)
+        self.ctx = context.Context(user_id='fake_user',
+                                   tenant_id='fake_project')
+
+    def test_ordered_per_bgpvpn(self):
+        done = []
+        blocked = threading.Event()
+
+        def _op(context, bgpvpn_id, index):
+            if bgpvpn_id == 'vpn-a' and index == 0:
+                blocked.wait()
+            done.append((bgpvpn_id, index))
+
+        for index in range(20):
+            for bgpvpn_id in ('vpn-a', 'vpn-b'):
+                self.pool.submit(bgpvpn_id, _op, self.ctx, bgpvpn_id, index)
+        blocked.set()
+        self.pool.shutdown()
+
+        for bgpvpn_id in ('vpn-a', 'vpn-b'):
+            self.assertEqual(list(range(20)),
+                             [index for id, index in done if id == bgpvpn_id])
+        stats = self.pool.stats
+        self.assertEqual(0, stats['depth'])
+        self.assertEqual(40, stats['processed'])
+        self.assertEqual(0, stats['failed'])
+        self.assertGreaterEqual(stats['max_latency'],
+                                stats['average_latency'])
+
+    def test_context_copied(self):
+        op = mock.Mock(__name__='op')
+        self.pool.submit('vpn-a', op, self.ctx, 'arg', key='value')
+        self.pool.shutdown()
+
+        op.assert_called_once_with(mock.ANY, 'arg', key='value')
+        op_context = op.call_args[0][0]
+        self.assertIsNot(self.ctx, op_context)
+        self.assertEqual(self.ctx.project_id, op_context.project_id)
+        self.assertEqual(self.ctx.user_id, op_context.user_id)
+
+    def test_failure_logged(self):
+        op = mock.Mock(__name__='op', side_effect=[ValueError, None])
+        with mock.patch.object(postcommit.LOG, 'exception') as log:
+            self.pool.submit('vpn-a', op, self.ctx)
+            self.pool.submit('vpn-a', op, self.ctx)
+            self.pool.shutdown()
+
+        self.assertEqual(2, op.call_count)
+        self.assertTrue(log.called)
+        self.assertEqual(1, self.pool.stats['failed'])
+        self.assertEqual(2, self.pool.stats['processed'])
+
+    def test_run_inline_once_shut_down(self):
+        self.pool.shutdown()
+        op = mock.Mock(__name__='op')
+        self.pool.submit('vpn-a', op, self.ctx, 'arg')
+        op.assert_called_once_with(self.ctx, 'arg')
@@ -0,0 +1,81 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import fixtures
+from neutron_lib.db import api as db_api
+from oslo_log import log as logging
+from sqlalchemy import event
+
+LOG = logging.getLogger(__name__)
+
+# connection checks and transaction control are not queries
+IGNORED_STATEMENTS = ('SELECT 1', 'BEGIN')
+
+
+class SQLStatements(fixtures.Fixture):
+    """Record the SQL statements emitted while the fixture is in use
+
+    Can be used with useFixture, or as a context manager around the calls
+    to measure:
+
+        with sql_fixtures.SQLStatements() as sql:
+            plugin_db.get_bgpvpns(context)
+        self.assertEqual(4, sql.count)
+
+    If 'log' is True, each statement is also logged, with its parameters,
+    at debug level.
+    """
+
+    def __init__(self, log=False):
+        super(SQLStatements, self).__init__()
+        self.log = log
+        self.statements = []
+
+    def _setUp(self):
+        self.statements = []
+        engine = db_api.get_context_manager().writer.get_engine()
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        self.addCleanup(event.remove, engine, 'before_cursor_execute',
+                        self._before_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context,
+                        executemany):
+        if statement in IGNORED_STATEMENTS:
+            return
+        self.statements.append(statement)
+        if self.log:
+            LOG.debug("SQL statement %(index)d: %(statement)s %(params)s",
+                      {'index': len(self.statements),
+                       'statement': statement,
+                       'params': parameters})
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    @property
+    def selects(self):
+        """The statements which only read"""
+        return [statement for statement in self.statements
+                if statement.lstrip().upper().startswith('SELECT')]
+
+    def __str__(self):
+        return '\n'.join("%d: %s" % (index, statement)
+                         for index, statement in enumerate(self.statements,
+                                                           1))
+
+
+def count_queries(func, *args, **kwargs):
+    """Return the number of SQL statements emitted by a call"""
+    with SQLStatements() as sql:
+        func(*args, **kwargs)
+    return sql.count
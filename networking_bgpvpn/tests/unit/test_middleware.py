@@ -0,0 +1,117 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from unittest import mock
+
+from neutron.services.revisions import revision_plugin
+from neutron_lib import context
+from neutron_lib.plugins import directory
+
+from networking_bgpvpn.neutron import middleware
+from networking_bgpvpn.neutron.services.common import constants
+from networking_bgpvpn.tests.unit.services import test_plugin
+
+
+class ConditionalGetTestCase(test_plugin.BgpvpnTestCaseMixin):
+
+    def setUp(self):
+        super(ConditionalGetTestCase, self).setUp()
+        directory.add_plugin(constants.REVISION_PLUGIN,
+                             revision_plugin.RevisionPlugin())
+        self.app = middleware.ConditionalGet(self.ext_api)
+
+    def _get(self, etag=None, **kwargs):
+        req = self.new_show_request('bgpvpn/bgpvpns', **kwargs)
+        if etag:
+            req.if_none_match = etag
+        return req.get_response(self.app)
+
+    def _list(self, etag=None, context=None):
+        req = self.new_list_request('bgpvpn/bgpvpns')
+        if context:
+            req.environ['neutron.context'] = context
+        if etag:
+            req.if_none_match = etag
+        return req.get_response(self.app)
+
+    def test_bgpvpn_not_modified(self):
+        with self.bgpvpn() as bgpvpn:
+            id = bgpvpn['bgpvpn']['id']
+            res = self._get(id=id)
+            self.assertEqual(200, res.status_int)
+            etag = res.etag
+            self.assertIsNotNone(etag)
+
+            with mock.patch.object(self.ext_api, '__call__') as api:
+                res = self._get(etag=etag, id=id)
+                self.assertFalse(api.called)
+            self.assertEqual(304, res.status_int)
+            self.assertEqual(etag, res.etag)
+            self.assertEqual(b'', res.body)
+
+            # the representation depends on the requested fields
+            res = self._get(etag=etag, id=id, fields=['id'])
+            self.assertEqual(200, res.status_int)
+            self.assertNotEqual(etag, res.etag)
+
+            self._update('bgpvpn/bgpvpns', id,
+                         {'bgpvpn': {'route_targets': ['64512:2']}})
+            res = self._get(etag=etag, id=id)
+            self.assertEqual(200, res.status_int)
+            self.assertEqual(['64512:2'],
+                             self.deserialize('json',
+                                              res)['bgpvpn']['route_targets'])
+
+    def test_bgpvpn_modified_by_association(self):
+        with self.network() as net, self.bgpvpn() as bgpvpn:
+            id = bgpvpn['bgpvpn']['id']
+            etag = self._get(id=id).etag
+            res = self._get(id=id, subresource='network_associations')
+            assocs_etag = res.etag
+            self.assertEqual(
+                304, self._get(etag=assocs_etag, id=id,
+                               subresource='network_associations').status_int)
+            with self.assoc_net(id, net['network']['id']):
+                self.assertEqual(200, self._get(etag=etag, id=id).status_int)
+                self.assertEqual(
+                    200, self._get(etag=assocs_etag, id=id,
+                                   subresource='network_associations'
+                                   ).status_int)
+
+    def test_bgpvpn_not_found(self):
+        res = self._get(etag='foo', id='11111111-2222-3333-4444-555555555555')
+        self.assertEqual(404, res.status_int)
+        self.assertIsNone(res.etag)
+
+    def test_bgpvpn_list_not_modified(self):
+        with self.bgpvpn():
+            res = self._list()
+            self.assertEqual(200, res.status_int)
+            etag = res.etag
+            self.assertEqual(304, self._list(etag=etag).status_int)
+            # the ETag depends on the credentials
+            other = context.Context(user_id='fake_user',
+                                    tenant_id='other_tenant')
+            self.assertEqual(200,
+                             self._list(etag=etag, context=other).status_int)
+            with self.bgpvpn():
+                self.assertEqual(200, self._list(etag=etag).status_int)
+        # the list is back to its initial content, but the ETag must not
+        # come back with it
+        self.assertEqual(200, self._list(etag=etag).status_int)
+
+    def test_other_resources_ignored(self):
+        with self.network() as net:
+            req = self.new_show_request('networks', net['network']['id'])
+            res = req.get_response(middleware.ConditionalGet(self.api))
+            self.assertEqual(200, res.status_int)
+            self.assertIsNone(res.etag)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Benchmark of the auto-allocation of BGPVPN targets
+
+Compares, for an increasing number of already allocated targets, the
+latency of the creation of a BGPVPN with an auto-allocated target when:
+
+- 'scan': all the allocated targets are loaded and the configured range is
+  walked until a free one is found (previous behavior)
+- 'free-list': the lowest free ID is reserved in bgpvpn_target_allocations
+
+Usage: benchmark_target_allocation.py [--connection URL] [SIZE ...]
+
+The default database is an in-memory SQLite one.
+"""
+
+import argparse
+import time
+
+from neutron.db.migration.models import head  # noqa
+from neutron_lib.api.definitions import bgpvpn as bgpvpn_def
+from neutron_lib import context
+from neutron_lib.db import api as db_api
+from neutron_lib.db import model_base
+from neutron_lib.plugins import directory
+from oslo_config import cfg
+from oslo_db import options as db_options
+from oslo_utils import uuidutils
+
+from networking_bgpvpn.neutron.db import bgpvpn_db
+from networking_bgpvpn.neutron.services.common import utils
+
+ASN = 4268359684
+CREATES = 20
+
+
+class _Plugin(object):
+    # needed by BGPVPNPluginDb to know which extensions are supported
+    supported_extension_aliases = []
+
+
+def _populate(ctx, plugin_db, size, range_size):
+    """Create 'size' BGPVPNs using the first 'size' target IDs"""
+    plugin_db.sync_target_allocations(
+        ctx, utils.RangeSet([(0, range_size - 1)]))
+    with db_api.CONTEXT_WRITER.using(ctx):
+        engine = ctx.session.get_bind()
+    std_attrs = model_base.BASEV2.metadata.tables['standardattributes']
+    with engine.begin() as conn:
+        first_std_attr_id = conn.execute(
+            std_attrs.insert(),
+            [{'resource_type': 'bgpvpns'}]).inserted_primary_key[0]
+        conn.execute(std_attrs.insert(),
+                     [{'resource_type': 'bgpvpns'}] * (size - 1))
+        bgpvpn_ids = [uuidutils.generate_uuid() for _ in range(size)]
+        conn.execute(bgpvpn_db.BGPVPN.__table__.insert(),
+                     [{'id': bgpvpn_id, 'project_id': 'bench', 'type': 'l3',
+                       'standard_attr_id': first_std_attr_id + i}
+                      for i, bgpvpn_id in enumerate(bgpvpn_ids)])
+        conn.execute(bgpvpn_db.BGPVPNTarget.__table__.insert(),
+                     [{'bgpvpn_id': bgpvpn_id, 'kind': kind, 'position': 0,
+                       'value': '%s:%s' % (ASN, i)}
+                      for i, bgpvpn_id in enumerate(bgpvpn_ids)
+                      for kind in (bgpvpn_db.IMPORT_TARGET,
+                                   bgpvpn_db.EXPORT_TARGET)])
+        conn.execute(
+            bgpvpn_db.BGPVPNTargetAllocation.__table__.update().where(
+                bgpvpn_db.BGPVPNTargetAllocation.target_id < size).values(
+                    allocated=True))
+
+
+def _create(ctx, plugin_db, target):
+    plugin_db.create_bgpvpn(ctx, {'tenant_id': 'bench',
+                                  'name': '',
+                                  'type': 'l3',
+                                  'route_targets': [],
+                                  'import_targets': [target],
+                                  'export_targets': [target]})
+
+
+def _scan_create(ctx, plugin_db, available_targets):
+    allocated = plugin_db.get_allocated_targets(ctx)
+    for target in available_targets:
+        if target not in allocated:
+            _create(ctx, plugin_db, target)
+            return
+
+
+def _free_list_create(ctx, plugin_db):
+    while True:
+        target = '%s:%s' % (ASN, plugin_db.allocate_target_id(ctx))
+        if not plugin_db.get_allocated_targets(ctx, targets=[target]):
+            _create(ctx, plugin_db, target)
+            return
+
+
+def _measure(func, *args):
+    latencies = []
+    for _ in range(CREATES):
+        start = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies[len(latencies) // 2] * 1000
+
+
+def _run(connection, size):
+    cfg.CONF.set_override('connection', connection, group='database')
+    engine = db_api.get_context_manager().writer.get_engine()
+    model_base.BASEV2.metadata.create_all(engine)
+    try:
+        ctx = context.get_admin_context()
+        plugin_db = bgpvpn_db.BGPVPNPluginDb()
+        range_size = size + 2 * CREATES
+        available_targets = ['%s:%s' % (ASN, i) for i in range(range_size)]
+        _populate(ctx, plugin_db, size, range_size)
+        free_list = _measure(_free_list_create, ctx, plugin_db)
+        scan = _measure(_scan_create, ctx, plugin_db, available_targets)
+    finally:
+        model_base.BASEV2.metadata.drop_all(engine)
+    return scan, free_list
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connection', default='sqlite://')
+    parser.add_argument('sizes', nargs='*', type=int,
+                        default=[100, 1000, 10000, 50000])
+    args = parser.parse_args()
+
+    db_options.set_defaults(cfg.CONF)
+    directory.add_plugin(bgpvpn_def.ALIAS, _Plugin())
+    print('%12s %14s %14s' % ('allocated', 'scan (ms)', 'free-list (ms)'))
+    for size in args.sizes:
+        scan, free_list = _run(args.connection, size)
+        print('%12d %14.2f %14.2f' % (size, scan, free_list))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Benchmark of the representation of [bgpvpn] target_id_range
+
+Compares the time and memory needed when the plugin starts to represent
+the auto-allocatable targets:
+
+- 'list': one formatted target string per ID (previous behavior)
+- 'range-set': a utils.RangeSet of the IDs
+
+as well as the cost of a membership test, and the time and memory needed
+by the synchronization of the bgpvpn_target_allocations table with the
+range done when the server starts:
+
+- 'first': on an empty table
+- 'restart': with the same range, already complete in the table
+- 'extended': with the range extended by one ID
+
+Usage: benchmark_target_id_range.py [--connection URL] [TARGET_ID_RANGE ...]
+
+The default database is an in-memory SQLite one.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from neutron.db.migration.models import head  # noqa
+from neutron_lib import context
+from neutron_lib.db import api as db_api
+from neutron_lib.db import model_base
+from oslo_config import cfg
+from oslo_db import options as db_options
+
+from networking_bgpvpn.neutron.db import bgpvpn_db
+from networking_bgpvpn.neutron.services.common import utils
+
+ASN = 4268359684
+LOOKUPS = 1000
+
+
+def _targets_list(target_id_range):
+    res = []
+    for rng in target_id_range.split(','):
+        if '-' in rng:
+            values = rng.split('-')
+            res.extend(list(range(int(values[0]), int(values[1]) + 1)))
+        else:
+            res.append(int(rng))
+    return ['%s:%s' % (ASN, r) for r in res]
+
+
+def _range_set(target_id_range):
+    return utils.RangeSet.from_string(target_id_range)
+
+
+def _measure(func, target_id_range):
+    start = time.perf_counter()
+    result = func(target_id_range)
+    duration = time.perf_counter() - start
+    del result
+    # memory is measured separately, tracemalloc slowing down allocations
+    tracemalloc.start()
+    result = func(target_id_range)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, duration * 1000, peak / 2 ** 20
+
+
+def _lookup_duration(collection, value):
+    start = time.perf_counter()
+    for _ in range(LOOKUPS):
+        value in collection  # pylint: disable=pointless-statement
+    return (time.perf_counter() - start) / LOOKUPS * 10 ** 6
+
+
+def _sync(connection, target_id_range, trace):
+    """Return the time or the memory peak of each synchronization"""
+    cfg.CONF.set_override('connection', connection, group='database')
+    engine = db_api.get_context_manager().writer.get_engine()
+    model_base.BASEV2.metadata.create_all(engine)
+    try:
+        ctx = context.get_admin_context()
+        plugin_db = bgpvpn_db.BGPVPNPluginDb()
+        range_set = _range_set(target_id_range)
+        extended = utils.RangeSet(
+            range_set.ranges() + [(range_set.ranges()[-1][1] + 1,) * 2])
+        results = []
+        for target_ids in (range_set, range_set, extended):
+            if trace:
+                tracemalloc.start()
+            start = time.perf_counter()
+            plugin_db.sync_target_allocations(ctx, target_ids)
+            if trace:
+                _current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                results.append(peak / 2 ** 20)
+            else:
+                results.append((time.perf_counter() - start) * 1000)
+        return results
+    finally:
+        model_base.BASEV2.metadata.drop_all(engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connection', default='sqlite://')
+    parser.add_argument('ranges', nargs='*',
+                        default=['300-1000', '1-100000', '1-4000000'])
+    args = parser.parse_args()
+
+    print('%-12s %-10s %12s %12s %14s' % ('range', 'structure', 'build (ms)',
+                                          'peak (MiB)', 'lookup (us)'))
+    for target_id_range in args.ranges:
+        targets, duration, peak = _measure(_targets_list, target_id_range)
+        # worst case of the previous membership tests: the last target
+        lookup = _lookup_duration(targets, targets[-1])
+        print('%-12s %-10s %12.1f %12.1f %14.2f' % (
+            target_id_range, 'list', duration, peak, lookup))
+        del targets
+
+        range_set, duration, peak = _measure(_range_set, target_id_range)
+        lookup = _lookup_duration(range_set, range_set.ranges()[-1][1])
+        print('%-12s %-10s %12.1f %12.1f %14.2f' % (
+            target_id_range, 'range-set', duration, peak, lookup))
+
+    db_options.set_defaults(cfg.CONF)
+    print()
+    print('%-12s %-10s %12s %12s' % ('range', 'sync', 'time (ms)',
+                                     'peak (MiB)'))
+    for target_id_range in args.ranges:
+        # memory is measured separately, tracemalloc slowing down
+        # allocations
+        durations = _sync(args.connection, target_id_range, False)
+        peaks = _sync(args.connection, target_id_range, True)
+        for sync, duration, peak in zip(('first', 'restart', 'extended'),
+                                        durations, peaks):
+            print('%-12s %-10s %12.1f %12.1f' % (target_id_range, sync,
+                                                 duration, peak))
+
+
+if __name__ == '__main__':
+    main()